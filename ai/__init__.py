@@ -3,6 +3,12 @@ AI Module for Marine Seguros
 Handles AI-powered features including chat, analysis, and insights
 """
 
-from .chat_assistant import AIChatAssistant
+from utils.lazy_import import lazy_exports
 
-__all__ = ['AIChatAssistant']
\ No newline at end of file
+_EXPORTS = {
+    'AIChatAssistant': '.chat_assistant',
+}
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = list(_EXPORTS)
@@ -1,28 +1,40 @@
 import streamlit as st
-import google.generativeai as genai
+from contextlib import closing
 from typing import Dict, List, Optional, Tuple
 import json
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import re
 import numpy as np
+from ai.chat_history import ChatHistoryStore
+from ai.models.registry import get_model_client
+from ai.utils.chart_intent import (
+    MIN_CONFIDENCE as CHART_INTENT_MIN_CONFIDENCE,
+    filter_hint,
+    get_chart_intent_stats,
+    needs_chart,
+    parse_chart_intent,
+    record_chart_intent
+)
+from ai.utils.context_builder import build_chat_context, estimate_tokens
+from ai.utils.retrieval import build_retrieval_context, load_financial_notes
+from core.artifact_store import session_data_version
+from utils.tracing import traced
+from visualizations.figure_cache import get_figure_cache
 
 class AIChatAssistant:
     """AI-powered chat assistant for financial data Q&A with filter awareness"""
     
     def __init__(self, api_key: str):
         self.api_key = api_key
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = get_model_client(api_key, 'gemini-1.5-flash')
         
-        # Test API key on initialization
+        # Test API key on initialization (cached per key by the shared client)
         self.api_key_valid = self._test_api_key()
         
-        # Initialize chat history in session state
-        if 'chat_history' not in st.session_state:
-            st.session_state.chat_history = []
+        # Bounded chat history (older messages spill to the database)
+        self.history = ChatHistoryStore()
         
         # Track last processed message to prevent duplicates
         if 'last_processed_message' not in st.session_state:
@@ -67,6 +79,14 @@ class AIChatAssistant:
             st.warning("⚠️ API do Gemini não está funcionando corretamente. Verifique sua chave API.")
         else:
             st.success("✅ Conexão com Gemini OK - Pode fazer perguntas e solicitar gráficos!")
+            client_stats = self.model.stats()
+            if client_stats.get('requests'):
+                st.caption(
+                    f"⏱️ Latência da IA: p50 {client_stats['latency_p50_ms'] or 0:,.0f} ms | "
+                    f"p95 {client_stats['latency_p95_ms'] or 0:,.0f} ms | "
+                    f"Erros: {client_stats['error_rate']:.0%} | "
+                    f"Em uso: {client_stats['in_flight']}/{client_stats['max_concurrent']}"
+                )
         
         # Show data availability
         if data:
@@ -86,9 +106,15 @@ class AIChatAssistant:
         chat_container = st.container()
         
         with chat_container:
-            # Display chat history
-            for message in st.session_state.chat_history:
-                self._render_message(message)
+            # Display the most recent messages; older ones are loaded on request
+            if self.history.has_earlier():
+                if st.button("⬆️ Carregar mensagens anteriores", key="chat_load_earlier"):
+                    self.history.load_earlier()
+            messages = self.history.window()
+            if len(self.history) > len(messages):
+                st.caption(f"Mostrando as últimas {len(messages)} de {len(self.history)} mensagens")
+            for message in messages:
+                self._render_message(message, data)
         
         # Input area
         with st.form(key="chat_form", clear_on_submit=True):
@@ -109,7 +135,7 @@ class AIChatAssistant:
                 self._process_user_message(user_input, data, filter_context)
         
         # Export chat button
-        if st.session_state.chat_history:
+        if len(self.history):
             if st.button("📥 Exportar conversa", key="export_chat"):
                 self._export_chat()
     
@@ -143,24 +169,33 @@ class AIChatAssistant:
                         # Process the suggested question directly
                         self._process_user_message(question, data, filter_context)
     
-    def _render_message(self, message: Dict):
+    def _render_message(self, message: Dict, data: Dict):
         """Render a single chat message"""
         if message['role'] == 'user':
             st.markdown(f"**🧑 Você:** {message['content']}")
         else:
             # AI message might contain charts
-            if 'chart' in message:
+            chart = self._chart_from_spec(message['chart_spec'], data) if message.get('chart_spec') else None
+            if chart is not None:
                 col1, col2 = st.columns([2, 1])
                 with col1:
                     # Display AI label and content separately for better formatting
                     st.markdown("**🤖 IA:**")
                     st.markdown(message['content'])
                 with col2:
-                    st.plotly_chart(message['chart'], use_container_width=True)
+                    st.plotly_chart(chart, use_container_width=True)
             else:
                 # Display AI label and content separately for better formatting
                 st.markdown("**🤖 IA:**")
                 st.markdown(message['content'])
+            
+            latency = message.get('latency')
+            if latency and latency.get('total_ms') is not None:
+                if latency.get('cached'):
+                    st.caption("♻️ Resposta do cache")
+                else:
+                    st.caption(f"⏱️ Primeira resposta em {(latency.get('ttft_ms') or 0) / 1000:.1f}s | "
+                               f"Total: {latency['total_ms'] / 1000:.1f}s")
         
         st.markdown("---")
     
@@ -186,7 +221,7 @@ class AIChatAssistant:
             return
         
         # Add user message to history
-        st.session_state.chat_history.append({
+        self.history.append({
             'role': 'user',
             'content': user_input,
             'timestamp': current_time
@@ -208,7 +243,17 @@ class AIChatAssistant:
             # Prepare context for AI
             with st.status("Preparando contexto dos dados...", expanded=False):
                 context = self._prepare_context(data, filter_context)
-                st.write(f"✅ Contexto preparado: {len(str(context))} caracteres")
+                st.write(f"✅ Contexto preparado: {len(context)} caracteres (~{estimate_tokens(context)} tokens)")
+                relevant_rows = self._retrieve_relevant_rows(user_input, data)
+                if relevant_rows:
+                    st.write(f"🔎 {len(relevant_rows.splitlines())} linhas relevantes encontradas para a pergunta")
+            
+            relevant_section = ""
+            if relevant_rows:
+                relevant_section = f"""
+            Linhas dos dados mais relevantes para a pergunta (itens, categorias, meses e notas):
+            {relevant_rows}
+            """
             
             # Generate AI response
             prompt = f"""
@@ -218,7 +263,7 @@ class AIChatAssistant:
             
             Dados financeiros disponíveis para análise:
             {context}
-            
+            {relevant_section}
             Pergunta do usuário: {user_input}
             
             Instruções CRÍTICAS para sua resposta:
@@ -236,31 +281,48 @@ class AIChatAssistant:
             """
             
             try:
-                # Generate AI response with status
-                with st.status("Consultando Gemini AI...", expanded=False):
-                    response = self.model.generate_content(prompt)
-                    ai_response = response.text
-                    st.write(f"✅ Resposta recebida: {len(ai_response)} caracteres")
+                # Stream the AI response into the chat as it is generated
+                st.markdown(f"**🧑 Você:** {user_input}")
+                st.markdown("**🤖 IA:**")
+                response = self.model.stream_content(
+                    prompt, data_version=st.session_state.get('data_version')
+                )
+                with closing(response):
+                    st.write_stream(response)
+                ai_response = response.text
                 
                 # Create response message
                 response_message = {
                     'role': 'assistant',
                     'content': ai_response,
-                    'timestamp': datetime.now()
+                    'timestamp': datetime.now(),
+                    'latency': {
+                        'ttft_ms': response.ttft_ms,
+                        'total_ms': response.total_ms,
+                        'cached': response.cached
+                    }
                 }
                 
                 # Generate chart if needed
                 if needs_chart:
                     with st.status("Gerando gráfico...", expanded=False):
-                        chart = self._generate_chart_from_query(user_input, data)
+                        chart_spec = {
+                            'query': user_input,
+                            'requirements': self._parse_chart_requirements(user_input, data)
+                        }
+                        chart = self._chart_from_spec(chart_spec, data)
                         if chart:
-                            response_message['chart'] = chart
+                            # Only the spec is kept; the figure is rebuilt when rendered
+                            response_message['chart_spec'] = chart_spec
                             st.write("📊 Gráfico gerado com sucesso")
                         else:
                             st.write("⚠️ Não foi possível gerar o gráfico")
+                        intent_stats = get_chart_intent_stats()
+                        st.write(f"🧭 Pedidos de gráfico resolvidos localmente: {intent_stats['hit_rate']:.0%} "
+                                 f"({intent_stats['local']} local / {intent_stats['model']} via IA)")
                 
                 # Add to history
-                st.session_state.chat_history.append(response_message)
+                self.history.append(response_message)
                 
                 # Handle filter requests
                 if filter_request:
@@ -278,7 +340,7 @@ class AIChatAssistant:
                 st.error(error_msg)
                 
                 # Add error message to chat history for visibility
-                st.session_state.chat_history.append({
+                self.history.append({
                     'role': 'assistant',
                     'content': f"❌ **Erro**: {str(e)}\n\nPor favor, verifique sua chave API do Gemini e tente novamente.",
                     'timestamp': current_time,
@@ -289,67 +351,57 @@ class AIChatAssistant:
                 st.rerun()
     
     def _test_api_key(self) -> bool:
-        """Test if the Gemini API key is valid"""
-        try:
-            # Simple test query to validate API key
-            test_response = self.model.generate_content("Hello")
-            return test_response.text is not None
-        except Exception as e:
-            print(f"API key validation failed: {e}")
-            return False
+        """Test if the Gemini API key is valid (result shared and cached for a while)"""
+        return self.model.check_health()
     
     def _check_if_needs_chart(self, query: str) -> bool:
         """Check if user query requires a chart"""
-        chart_keywords = [
-            'mostre', 'gráfico', 'visualize', 'compare visualmente',
-            'evolução', 'tendência', 'progressão', 'histórico',
-            'show me', 'chart', 'graph', 'plot', 'desenhe', 'crie um gráfico',
-            'pizza', 'pie', 'barra', 'bar', 'linha', 'line', 'cascata', 'waterfall',
-            'heatmap', 'mapa de calor', 'dispersão', 'scatter', 'empilhado', 'stacked'
-        ]
-        
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in chart_keywords)
+        return needs_chart(query)
     
     def _extract_filter_request(self, query: str) -> Optional[str]:
         """Extract filter change requests from query"""
-        # Patterns for filter requests
-        patterns = {
-            r'mostre.*(2\d{3})': 'year',
-            r'compare.*(2\d{3}).*(2\d{3})': 'year_comparison',
-            r'(janeiro|fevereiro|março|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro)': 'month',
-            r'(jan|fev|mar|abr|mai|jun|jul|ago|set|out|nov|dez)': 'month',
-            r'(q1|q2|q3|q4|trimestre)': 'quarter',
-            r'(melhores|piores|top|bottom).*(meses)': 'performance'
-        }
-        
-        query_lower = query.lower()
-        for pattern, filter_type in patterns.items():
-            if re.search(pattern, query_lower):
-                return f"filtrar por {filter_type}"
-        
-        return None
+        return filter_hint(query)
     
     def _parse_chart_requirements(self, query: str, data: Dict) -> Dict:
-        """Use AI to parse chart requirements from natural language query"""
+        """Parse chart requirements locally, asking the AI only for ambiguous queries"""
         # Prepare context about available data
         available_years = sorted(data.keys())
         available_metrics = set()
         
         # Collect all available metrics from the data
         for year_data in data.values():
-            if 'revenue' in year_data:
-                available_metrics.add('revenue')
-            if 'costs' in year_data:
-                available_metrics.add('costs')
-            if 'margins' in year_data:
-                available_metrics.add('margins')
-            if 'profits' in year_data:
-                available_metrics.add('profits')
+            for key, value in year_data.items():
+                if key != 'line_items' and isinstance(value, (dict, int, float)):
+                    available_metrics.add(key)
             if 'line_items' in year_data:  # For flexible data
                 for item_key in year_data['line_items'].keys():
                     available_metrics.add(item_key)
         
+        requirements, confidence = parse_chart_intent(query, available_metrics, available_years)
+        if confidence >= CHART_INTENT_MIN_CONFIDENCE:
+            record_chart_intent('local')
+            requirements['source'] = 'local'
+        else:
+            record_chart_intent('model')
+            requirements = self._parse_chart_requirements_with_ai(query, available_years, available_metrics)
+            requirements['source'] = 'model'
+        
+        # Auto-select chart type if needed
+        if requirements.get('chart_type') == 'auto':
+            requirements['chart_type'] = self._auto_select_chart_type(
+                requirements['metrics'],
+                requirements.get('comparison_type', 'none'),
+                requirements.get('grouping', 'none')
+            )
+        if not requirements.get('title'):
+            requirements['title'] = ' e '.join(self._translate_metric_name(m) for m in requirements['metrics'])
+            years = requirements['time_period'].get('years')
+            if years:
+                requirements['title'] += f" ({', '.join(str(y) for y in years)})"
+        return requirements
+    
+    def _parse_chart_requirements_with_ai(self, query: str, available_years: List, available_metrics: set) -> Dict:
+        """Use AI to parse chart requirements from natural language query"""
         prompt = f"""
         Analyze this chart request and extract the requirements:
         Query: {query}
@@ -389,18 +441,8 @@ class AIChatAssistant:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            requirements = json.loads(response.text)
-            
-            # Auto-select chart type if needed
-            if requirements.get('chart_type') == 'auto':
-                requirements['chart_type'] = self._auto_select_chart_type(
-                    requirements['metrics'],
-                    requirements.get('comparison_type', 'none'),
-                    requirements.get('grouping', 'none')
-                )
-            
-            return requirements
+            response = self.model.generate_content(prompt, data_version=st.session_state.get('data_version'))
+            return json.loads(response.text)
         except Exception as e:
             # Fallback to basic parsing
             print(f"Error parsing chart requirements: {e}")
@@ -449,106 +491,51 @@ class AIChatAssistant:
         return 'bar'
     
     def _prepare_context(self, data: Dict, filter_context: str) -> str:
-        """Prepare data context for AI"""
-        context_parts = []
-        
-        # Define months list universally for this function
-        months = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 
-                  'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
-        
-        # Define months list universally for this function
-        months = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 
-                  'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
-
-        # Summarize available data
-        years = sorted(data.keys())
-        context_parts.append(f"Anos disponíveis: {years}")
-        
-        # Revenue summary
-        total_revenue_by_year = {}
-        for year, year_data in data.items():
-            revenue = year_data.get('revenue', {})
-            total = sum(v for k, v in revenue.items() if k != 'ANNUAL' and isinstance(v, (int, float)))
-            # Ensure year is a regular int, not numpy int64
-            total_revenue_by_year[int(year)] = float(total)
-            if year == '2025':
-                print(f"DEBUG: Extracted data for 2025: {year_data}")
-        
-        context_parts.append(f"Receita por ano: {json.dumps(total_revenue_by_year, indent=2)}")
-        
-        # Growth rates
-        if len(years) > 1:
-            growth_rates = []
-            sorted_years = sorted(total_revenue_by_year.keys())
-            for i in range(1, len(sorted_years)):
-                prev_year = sorted_years[i-1]
-                curr_year = sorted_years[i]
-                if total_revenue_by_year[prev_year] > 0:
-                    growth = ((total_revenue_by_year[curr_year] - total_revenue_by_year[prev_year]) 
-                             / total_revenue_by_year[prev_year] * 100)
-                    growth_rates.append(f"{prev_year}-{curr_year}: {growth:.1f}%")
-            
-            context_parts.append(f"Crescimento anual: {', '.join(growth_rates)}")
-        
-        # Month performance if not filtered
-        if 'filter_state' not in st.session_state or not hasattr(st.session_state.filter_state, 'months') or not st.session_state.filter_state.months:
-            month_totals = {}
-            month_revenues = {month: [] for month in months}
-            month_variable_costs = {month: [] for month in months}
-            month_fixed_costs = {month: [] for month in months}
-            month_net_profits = {month: [] for month in months}
-
-            for year_data in data.values():
-                for month in months:
-                    if month in year_data.get('revenue', {}):
-                        month_revenues[month].append(year_data['revenue'][month])
-                        month_variable_costs[month].append(year_data.get('costs', {}).get(month, 0))
-                        month_fixed_costs[month].append(year_data.get('fixed_costs', {}).get(month, 0))
-                        
-                        # Calculate monthly net profit if possible
-                        monthly_revenue = year_data.get('revenue', {}).get(month, 0)
-                        monthly_variable_costs = year_data.get('costs', {}).get(month, 0)
-                        monthly_fixed_costs = year_data.get('fixed_costs', {}).get(month, 0)
-                        monthly_net_profit = monthly_revenue - monthly_variable_costs - monthly_fixed_costs
-                        month_net_profits[month].append(monthly_net_profit)
-
-            for month in months:
-                if month_revenues[month]:
-                    month_totals[month] = sum(month_revenues[month]) / len(month_revenues[month])
+        """Prepare data context for AI (cached per data version, bounded by a token budget)"""
+        filter_state = st.session_state.get('filter_state')
+        include_monthly = not (filter_state is not None and getattr(filter_state, 'months', None))
+        return build_chat_context(
+            data,
+            filter_context,
+            data_version=st.session_state.get('data_version'),
+            include_monthly=include_monthly
+        )
+    
+    def _retrieve_relevant_rows(self, query: str, data: Dict) -> str:
+        """Top rows of the local retrieval index for the question ('' when nothing matches)"""
+        try:
+            file_paths = [
+                file_info.get('caminho', '')
+                for file_info in (st.session_state.get('uploaded_files_info') or [])
+            ]
+            return build_retrieval_context(
+                query,
+                data,
+                data_version=st.session_state.get('data_version'),
+                notes=load_financial_notes(file_paths)
+            )
+        except Exception as e:
+            print(f"Error retrieving relevant rows: {e}")
+            return ""
+    
+    def _chart_from_spec(self, chart_spec: Dict, data: Dict) -> Optional[go.Figure]:
+        """Figure for a stored chart spec, built once per data version and spec
 
-            best_months = sorted(month_totals.items(), key=lambda x: x[1], reverse=True)[:3]
-            worst_months = sorted(month_totals.items(), key=lambda x: x[1])[:3]
-            
-            context_parts.append(f"Melhores meses (Receita Média): {[m[0] for m in best_months]}")
-            context_parts.append(f"Piores meses (Receita Média): {[m[0] for m in worst_months]}")
+        Goes through the figure cache, so every render gets its own Figure
+        rebuilt from the cached spec rather than a shared, mutable object.
+        """
+        def build():
+            return self._build_chart(chart_spec['query'], chart_spec['requirements'], data)
 
-            # Add detailed monthly data
-            detailed_monthly_data = []
-            for year in sorted(data.keys()):
-                year_data = data[year]
-                for month in months:
-                    monthly_revenue = year_data.get('revenue', {}).get(month, 0)
-                    monthly_variable_costs = year_data.get('costs', {}).get(month, 0)
-                    monthly_fixed_costs = year_data.get('fixed_costs', {}).get(month, 0)
-                    monthly_net_profit = monthly_revenue - monthly_variable_costs - monthly_fixed_costs
-                    
-                    detailed_monthly_data.append({
-                        "Ano": year,
-                        "Mês": month,
-                        "Receita": monthly_revenue,
-                        "Custos Variáveis": monthly_variable_costs,
-                        "Custos Fixos": monthly_fixed_costs,
-                        "Lucro Líquido": monthly_net_profit
-                    })
-            context_parts.append("\nDados Mensais Detalhados:\n" + pd.DataFrame(detailed_monthly_data).to_string(index=False))
-        
-        return "\n".join(context_parts)
+        data_version = session_data_version(st.session_state)
+        if data_version is None:
+            return build()
+        cache = get_figure_cache()
+        return cache.get_or_build(cache.make_key(f'{__name__}.chat_figure', (data_version,), chart_spec), build)
     
-    def _generate_chart_from_query(self, query: str, data: Dict) -> Optional[go.Figure]:
+    @traced()
+    def _build_chart(self, query: str, requirements: Dict, data: Dict) -> Optional[go.Figure]:
         """Generate appropriate chart based on parsed requirements"""
-        # Parse requirements using AI
-        requirements = self._parse_chart_requirements(query, data)
-        
         # Route to appropriate chart generator
         chart_type = requirements['chart_type']
         
@@ -1237,7 +1224,7 @@ class AIChatAssistant:
         chat_text = "# Conversa com IA - Marine Seguros\n\n"
         chat_text += f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n\n"
         
-        for message in st.session_state.chat_history:
+        for message in self.history.all_messages():
             timestamp = message['timestamp'].strftime('%H:%M')
             role = "Você" if message['role'] == 'user' else "IA"
             chat_text += f"**[{timestamp}] {role}:** {message['content']}\n\n"
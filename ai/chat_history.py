@@ -0,0 +1,116 @@
+"""
+Chat history store
+Keeps the newest AI_CHAT_MAX_MESSAGES chat messages of a session in
+``st.session_state.chat_history`` and spills older ones to SQLite, so long
+conversations do not grow session memory. Messages are plain JSON-friendly
+dicts: charts are kept as specs (query + parsed requirements) and rebuilt
+when rendered. Only the newest AI_CHAT_RENDER_WINDOW messages are rendered;
+"load earlier" widens the window page by page.
+"""
+
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+
+CHAT_MAX_MESSAGES = int(os.environ.get('AI_CHAT_MAX_MESSAGES', '40'))
+CHAT_RENDER_WINDOW = int(os.environ.get('AI_CHAT_RENDER_WINDOW', '10'))
+
+
+def _restore(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Message loaded from the database, with its timestamp parsed back"""
+    timestamp = message.get('timestamp')
+    if isinstance(timestamp, str):
+        try:
+            message['timestamp'] = datetime.fromisoformat(timestamp)
+        except ValueError:
+            message['timestamp'] = datetime.now()
+    return message
+
+
+class ChatHistoryStore:
+    """Bounded chat history of the current session with spill-over to SQLite"""
+
+    def __init__(self, db=None, max_messages: int = CHAT_MAX_MESSAGES,
+                 window_size: int = CHAT_RENDER_WINDOW):
+        self._db = db
+        self.max_messages = max(1, max_messages)
+        self.window_size = max(1, window_size)
+
+        if 'chat_history' not in st.session_state:
+            st.session_state.chat_history = []
+        if 'chat_session_id' not in st.session_state:
+            st.session_state.chat_session_id = uuid.uuid4().hex
+            st.session_state.chat_spilled = 0
+            st.session_state.chat_next_seq = len(st.session_state.chat_history)
+            st.session_state.chat_window = self.window_size
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database_manager import DatabaseManager
+            self._db = DatabaseManager()
+        return self._db
+
+    def __len__(self) -> int:
+        return st.session_state.chat_spilled + len(st.session_state.chat_history)
+
+    def append(self, message: Dict[str, Any]) -> None:
+        """Add a message, spilling the oldest in-memory ones beyond the cap"""
+        message['seq'] = st.session_state.chat_next_seq
+        st.session_state.chat_next_seq += 1
+        history = st.session_state.chat_history
+        history.append(message)
+
+        self._spill(len(history) - self.max_messages)
+
+    def _spill(self, count: int) -> int:
+        """Move the ``count`` oldest in-memory messages to the database"""
+        history = st.session_state.chat_history
+        count = min(count, len(history))
+        if count <= 0:
+            return 0
+        if not self.db.save_chat_messages(st.session_state.chat_session_id, history[:count]):
+            return 0
+        del history[:count]
+        st.session_state.chat_spilled += count
+        return count
+
+    def compact(self, keep: int) -> int:
+        """Spill all but the newest ``keep`` in-memory messages; returns how many moved"""
+        return self._spill(len(st.session_state.chat_history) - max(0, keep))
+
+    def _earlier(self, limit: Optional[int]) -> List[Dict[str, Any]]:
+        """Spilled messages just before the in-memory ones (all when limit is None)"""
+        if not st.session_state.chat_spilled:
+            return []
+        history = st.session_state.chat_history
+        before_seq = history[0]['seq'] if history else st.session_state.chat_next_seq
+        messages = self.db.load_chat_messages(st.session_state.chat_session_id, before_seq, limit)
+        return [_restore(message) for message in messages]
+
+    def window(self) -> List[Dict[str, Any]]:
+        """Messages to render: the newest ``chat_window``, oldest first"""
+        size = st.session_state.chat_window
+        recent = st.session_state.chat_history[-size:]
+        missing = size - len(recent)
+        return (self._earlier(missing) if missing > 0 else []) + recent
+
+    def has_earlier(self) -> bool:
+        return len(self) > st.session_state.chat_window
+
+    def load_earlier(self) -> None:
+        st.session_state.chat_window += self.window_size
+
+    def all_messages(self) -> List[Dict[str, Any]]:
+        """Every message of the session, spilled ones included (for export)"""
+        return self._earlier(None) + list(st.session_state.chat_history)
+
+    def clear(self) -> None:
+        self.db.delete_chat_messages(st.session_state.chat_session_id)
+        st.session_state.chat_history = []
+        st.session_state.chat_spilled = 0
+        st.session_state.chat_window = self.window_size
@@ -1,4 +1,25 @@
 """
 AI Models Module
-Future home for different AI model implementations
-"""
\ No newline at end of file
+Model clients (Gemini and a deterministic local stub), the shared client
+registry and the response cache
+"""
+
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    'ModelClient': '.client',
+    'ModelResponse': '.client',
+    'GeminiClient': '.client',
+    'StubModelClient': '.client',
+    'CachedModelClient': '.client',
+    'LimitedModelClient': '.registry',
+    'ModelBusyError': '.registry',
+    'get_model_client': '.registry',
+    'get_model_client_stats': '.registry',
+    'ResponseCache': '.response_cache',
+    'get_response_cache': '.response_cache',
+}
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = list(_EXPORTS)
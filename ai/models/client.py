@@ -0,0 +1,307 @@
+"""
+Model clients
+Every AI feature talks to the model through ``ModelClient.generate_content``,
+which returns an object with a ``.text`` attribute like the Gemini SDK does.
+``stream_content`` returns the answer incrementally as a ``StreamingResponse``
+(an iterable of text chunks, usable with ``st.write_stream``). Time to first
+token and total latency of every request are kept in a small in-process log.
+Clients are obtained through ``ai.models.registry.get_model_client``.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from utils.lazy_import import lazy_module
+from ai.models.response_cache import ResponseCache
+from utils.tracing import record_span, traced
+
+glm = lazy_module('google.ai.generativelanguage')
+
+
+DEFAULT_MODEL = 'gemini-1.5-flash'
+STUB_BACKEND = 'stub'
+LATENCY_LOG_SIZE = 200
+
+_latency_log: deque = deque(maxlen=LATENCY_LOG_SIZE)
+_latency_lock = threading.Lock()
+
+
+def record_latency(model: str, ttft_ms: Optional[float], total_ms: float,
+                   cached: bool, streamed: bool, chars: int) -> None:
+    with _latency_lock:
+        _latency_log.append({
+            'model': model,
+            'ttft_ms': None if ttft_ms is None else round(ttft_ms, 1),
+            'total_ms': round(total_ms, 1),
+            'cached': cached,
+            'streamed': streamed,
+            'chars': chars,
+            'at': datetime.now().isoformat(timespec='seconds'),
+        })
+
+
+def get_latency_log() -> List[Dict[str, Any]]:
+    """Latency records of the most recent model requests, oldest first"""
+    with _latency_lock:
+        return list(_latency_log)
+
+
+@dataclass
+class ModelResponse:
+    """Model answer; ``cached`` is True when it came from the response cache"""
+    text: str
+    model: str
+    cached: bool = False
+    ttft_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+
+
+class StreamingResponse:
+    """Text chunks of an answer as the model produces them
+
+    Iterate it (or pass it to ``st.write_stream``) once; ``text``, ``ttft_ms``
+    and ``total_ms`` are set when the stream is exhausted. Consume it inside
+    ``contextlib.closing(response)``: a rerun or ``st.stop`` interrupts the
+    reader, and ``close`` then ends the model request right away instead of
+    when the stream is garbage-collected.
+    """
+
+    def __init__(self, chunks: Iterable[str], model: str, cached: bool = False,
+                 on_complete: Optional[Callable[[str], None]] = None):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self.model = model
+        self.cached = cached
+        self.text = ''
+        self.ttft_ms: Optional[float] = None
+        self.total_ms: Optional[float] = None
+        self.done = False
+
+    def __iter__(self) -> Iterator[str]:
+        started = time.perf_counter()
+        parts = []
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            if self.ttft_ms is None:
+                self.ttft_ms = (time.perf_counter() - started) * 1000
+            parts.append(chunk)
+            yield chunk
+
+        self.total_ms = (time.perf_counter() - started) * 1000
+        self.text = ''.join(parts)
+        self.done = True
+        record_latency(self.model, self.ttft_ms, self.total_ms, self.cached, True, len(self.text))
+        record_span('StreamingResponse', self.total_ms)
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+    def close(self) -> None:
+        """End the underlying model request if the stream was not read to the end"""
+        if not self.done:
+            close = getattr(self._chunks, 'close', None)
+            if close is not None:
+                close()
+
+
+class ModelClient(ABC):
+    """Interface of a text generation model"""
+
+    model_name: str = ''
+
+    @abstractmethod
+    def generate_content(self, prompt: str, data_version: Optional[str] = None,
+                         use_cache: bool = True, timeout: Optional[float] = None) -> ModelResponse:
+        """Answer ``prompt``; ``timeout`` bounds the request in seconds"""
+
+    def stream_chunks(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Raw text chunks; clients without native streaming yield one chunk"""
+        yield self.generate_content(prompt, timeout=timeout).text
+
+    def stream_content(self, prompt: str, data_version: Optional[str] = None,
+                       use_cache: bool = True, timeout: Optional[float] = None) -> StreamingResponse:
+        return StreamingResponse(self.stream_chunks(prompt, timeout=timeout), self.model_name)
+
+    def check_health(self, force: bool = False) -> bool:
+        """True when the model answers a trivial prompt"""
+        try:
+            return self.generate_content("Hello", use_cache=False).text is not None
+        except Exception as e:
+            print(f"API key validation failed: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters (empty for clients that do not track them)"""
+        return {}
+
+
+class GeminiClient(ModelClient):
+    """Google Gemini through google.ai.generativelanguage's GenerativeServiceClient
+
+    Each client owns a service client bound to its API key through the public
+    ``client_options``. ``genai.configure`` would set one key for the whole
+    process, so sessions using different keys would silently share whichever
+    key was configured last; ``genai.GenerativeModel`` has no public way to
+    take a key of its own.
+    """
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        self._model_path = model_name if model_name.startswith('models/') else f'models/{model_name}'
+        self._service = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+
+    def generate_content(self, prompt: str, data_version: Optional[str] = None,
+                         use_cache: bool = True, timeout: Optional[float] = None) -> ModelResponse:
+        response = self._service.generate_content(self._request(prompt), **self._call_options(timeout))
+        return ModelResponse(text=self._response_text(response), model=self.model_name)
+
+    def stream_chunks(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        stream = self._service.stream_generate_content(self._request(prompt), **self._call_options(timeout))
+        finished = False
+        try:
+            for chunk in stream:
+                text = self._response_text(chunk, allow_empty=True)
+                if text:
+                    yield text
+            finished = True
+        finally:
+            # An abandoned stream would otherwise keep the model generating
+            if not finished and hasattr(stream, 'cancel'):
+                stream.cancel()
+
+    def _request(self, prompt: str):
+        return glm.GenerateContentRequest(
+            model=self._model_path,
+            contents=[glm.Content(role='user', parts=[glm.Part(text=prompt)])]
+        )
+
+    @staticmethod
+    def _call_options(timeout: Optional[float]) -> Dict[str, Any]:
+        return {'timeout': timeout} if timeout else {}
+
+    @staticmethod
+    def _response_text(response, allow_empty: bool = False) -> str:
+        """Text of the first candidate; raises like the SDK's ``response.text`` when there is none"""
+        if not response.candidates:
+            raise ValueError(f"Gemini returned no answer (prompt feedback: {response.prompt_feedback})")
+        candidate = response.candidates[0]
+        text = ''.join(part.text for part in candidate.content.parts)
+        if not text and not allow_empty:
+            raise ValueError(f"Gemini returned no text (finish reason: {candidate.finish_reason.name})")
+        return text
+
+
+class StubModelClient(ModelClient):
+    """Deterministic offline stand-in for load tests and benchmarks
+
+    The same prompt always yields the same answer. Prompts asking for JSON get
+    a valid JSON object. AI_STUB_LATENCY_MS simulates the delay before the
+    first token and AI_STUB_CHUNK_MS the delay between streamed chunks.
+    """
+
+    def __init__(self, model_name: str = f'{STUB_BACKEND}-{DEFAULT_MODEL}', latency_ms: float = None,
+                 chunk_ms: float = None):
+        self.model_name = model_name
+        if latency_ms is None:
+            latency_ms = float(os.environ.get('AI_STUB_LATENCY_MS', '0'))
+        if chunk_ms is None:
+            chunk_ms = float(os.environ.get('AI_STUB_CHUNK_MS', '0'))
+        self.latency_ms = latency_ms
+        self.chunk_ms = chunk_ms
+
+    def generate_content(self, prompt: str, data_version: Optional[str] = None,
+                         use_cache: bool = True, timeout: Optional[float] = None) -> ModelResponse:
+        self._wait(timeout)
+        return ModelResponse(text=self._answer(prompt), model=self.model_name)
+
+    def stream_chunks(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        self._wait(timeout)
+        words = self._answer(prompt).split(' ')
+        for i in range(0, len(words), 4):
+            if i and self.chunk_ms:
+                time.sleep(self.chunk_ms / 1000)
+            yield ' '.join(words[i:i + 4]) + (' ' if i + 4 < len(words) else '')
+
+    def _wait(self, timeout: Optional[float]) -> None:
+        """Simulated time to first token, honouring the request timeout"""
+        if not self.latency_ms:
+            return
+        if timeout is not None and self.latency_ms / 1000 > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Stub model did not answer within {timeout:g}s")
+        time.sleep(self.latency_ms / 1000)
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha256((prompt or '').encode('utf-8')).hexdigest()[:12]
+
+        if 'JSON' in (prompt or '')[-400:]:
+            text = json.dumps({
+                'chart_type': 'line',
+                'metrics': ['revenue'],
+                'time_period': {'type': 'all', 'years': None, 'months': None},
+                'grouping': 'year',
+                'comparison_type': 'time_series',
+                'title': 'Visão Geral Financeira',
+                'format_options': {'show_values': True, 'show_percentages': False, 'currency': True},
+            }, ensure_ascii=False)
+        else:
+            text = (
+                f"**Resposta simulada ({self.model_name})**\n\n"
+                f"Prompt com {len(prompt or '')} caracteres (ref. {digest}). "
+                "Este texto é gerado localmente, sem chamar o modelo."
+            )
+        return text
+
+
+class CachedModelClient(ModelClient):
+    """Serves repeated (model, prompt, data version) requests from the response cache"""
+
+    def __init__(self, client: ModelClient, cache: ResponseCache):
+        self.client = client
+        self.cache = cache
+        self.model_name = client.model_name
+
+    @traced()
+    def generate_content(self, prompt: str, data_version: Optional[str] = None,
+                         use_cache: bool = True, timeout: Optional[float] = None) -> ModelResponse:
+        started = time.perf_counter()
+        cached = self.cache.get(self.model_name, prompt, data_version) if use_cache else None
+        if cached is not None:
+            response = ModelResponse(text=cached, model=self.model_name, cached=True)
+        else:
+            response = self.client.generate_content(prompt, data_version=data_version, timeout=timeout)
+            if use_cache:
+                self.cache.put(self.model_name, prompt, data_version, response.text)
+
+        # Without streaming the first token arrives with the whole answer
+        response.total_ms = response.ttft_ms = (time.perf_counter() - started) * 1000
+        record_latency(self.model_name, response.ttft_ms, response.total_ms,
+                       response.cached, False, len(response.text or ''))
+        return response
+
+    def stream_content(self, prompt: str, data_version: Optional[str] = None,
+                       use_cache: bool = True, timeout: Optional[float] = None) -> StreamingResponse:
+        cached = self.cache.get(self.model_name, prompt, data_version) if use_cache else None
+        if cached is not None:
+            return StreamingResponse([cached], self.model_name, cached=True)
+
+        def store(text: str) -> None:
+            self.cache.put(self.model_name, prompt, data_version, text)
+
+        return StreamingResponse(self.client.stream_chunks(prompt, timeout=timeout), self.model_name,
+                                 on_complete=store if use_cache else None)
+
+    def check_health(self, force: bool = False) -> bool:
+        return self.client.check_health(force=force)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.client.stats()
+
@@ -0,0 +1,212 @@
+"""
+Shared model clients
+One client per (API key, model, backend) for the whole process, so sessions
+and reruns reuse the configured SDK model instead of rebuilding it. Each
+shared client
+- caps concurrent model requests with a semaphore; extra requests queue up
+  to AI_QUEUE_TIMEOUT_SECONDS and then fail with ModelBusyError
+- passes a per-request timeout (AI_REQUEST_TIMEOUT_SECONDS) to the model
+- caches the API key health check for AI_HEALTH_TTL_SECONDS
+- counts requests, errors, timeouts, abandoned streams and latency percentiles
+Cache hits are answered before the limiter and do not count as requests.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ai.models.client import (
+    DEFAULT_MODEL, STUB_BACKEND, CachedModelClient, GeminiClient, ModelClient,
+    ModelResponse, StubModelClient
+)
+from ai.models.response_cache import ResponseCache, get_response_cache
+
+
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('AI_MAX_CONCURRENT_REQUESTS', '4'))
+QUEUE_TIMEOUT_SECONDS = float(os.environ.get('AI_QUEUE_TIMEOUT_SECONDS', '30'))
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get('AI_REQUEST_TIMEOUT_SECONDS', '90'))
+HEALTH_TTL_SECONDS = float(os.environ.get('AI_HEALTH_TTL_SECONDS', '600'))
+LATENCY_WINDOW = 200
+
+
+class ModelBusyError(TimeoutError):
+    """Raised when a request waited too long for a free model slot"""
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 1)
+
+
+def _is_timeout(error: BaseException) -> bool:
+    """True for request timeouts, including Gemini's DeadlineExceeded"""
+    if isinstance(error, TimeoutError):
+        return True
+    # Looked up rather than imported: while google.api_core is not loaded no
+    # request can have raised one of its exceptions
+    api_exceptions = sys.modules.get('google.api_core.exceptions')
+    return api_exceptions is not None and isinstance(error, api_exceptions.DeadlineExceeded)
+
+
+class LimitedModelClient(ModelClient):
+    """Concurrency cap, timeouts, health-check TTL and counters around a client"""
+
+    def __init__(self, client: ModelClient, max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+                 queue_timeout: float = QUEUE_TIMEOUT_SECONDS,
+                 request_timeout: float = REQUEST_TIMEOUT_SECONDS,
+                 health_ttl: float = HEALTH_TTL_SECONDS):
+        self.client = client
+        self.model_name = client.model_name
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.health_ttl = health_ttl
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._health: Optional[Tuple[bool, float]] = None
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.abandoned = 0
+        self.rejected = 0
+        self.waiting = 0
+        self.in_flight = 0
+
+    def _acquire(self) -> None:
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+                self.requests += 1
+        if not acquired:
+            raise ModelBusyError(
+                f"IA ocupada: {self.max_concurrent} requisições em andamento. Tente novamente em instantes."
+            )
+
+    def _release(self, started: float, error: Optional[BaseException], abandoned: bool = False) -> None:
+        self._slots.release()
+        with self._lock:
+            self.in_flight -= 1
+            if abandoned:
+                # The reader stopped (rerun, st.stop): neither a success nor a model error
+                self.abandoned += 1
+            elif error is None:
+                self._latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                self.errors += 1
+                if _is_timeout(error):
+                    self.timeouts += 1
+
+    def generate_content(self, prompt: str, data_version: Optional[str] = None,
+                         use_cache: bool = True, timeout: Optional[float] = None) -> ModelResponse:
+        self._acquire()
+        started = time.perf_counter()
+        error = None
+        try:
+            return self.client.generate_content(prompt, data_version=data_version,
+                                                timeout=timeout or self.request_timeout)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(started, error)
+
+    def stream_chunks(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        # The slot is held from the first chunk request until the stream ends
+        # or is closed (StreamingResponse.close)
+        self._acquire()
+        started = time.perf_counter()
+        error = None
+        abandoned = False
+        try:
+            yield from self.client.stream_chunks(prompt, timeout=timeout or self.request_timeout)
+        except GeneratorExit:
+            abandoned = True
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._release(started, error, abandoned)
+
+    def check_health(self, force: bool = False) -> bool:
+        """API key check, answered from the last result while it is younger than the TTL"""
+        with self._lock:
+            health = self._health
+        if not force and health is not None and time.monotonic() - health[1] < self.health_ttl:
+            return health[0]
+        try:
+            ok = self.generate_content("Hello", use_cache=False).text is not None
+        except Exception as e:
+            print(f"API key validation failed: {e}")
+            ok = False
+        with self._lock:
+            self._health = (ok, time.monotonic())
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            finished = self.requests - self.in_flight
+            return {
+                'model': self.model_name,
+                'requests': self.requests,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'abandoned': self.abandoned,
+                'rejected': self.rejected,
+                'error_rate': self.errors / finished if finished else 0.0,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'max_concurrent': self.max_concurrent,
+                'latency_p50_ms': _percentile(latencies, 0.5),
+                'latency_p95_ms': _percentile(latencies, 0.95),
+                'healthy': None if self._health is None else self._health[0],
+            }
+
+
+_registry: Dict[Tuple[str, str, str], CachedModelClient] = {}
+_registry_lock = threading.Lock()
+
+
+def _registry_key(api_key: Optional[str], model_name: str, backend: str) -> Tuple[str, str, str]:
+    # Keyed by a digest so the registry never needs the raw key for lookups
+    key_digest = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+    return (key_digest, model_name, backend)
+
+
+def get_model_client(api_key: Optional[str], model_name: str = DEFAULT_MODEL,
+                     cache: Optional[ResponseCache] = None) -> CachedModelClient:
+    """Shared, cached and rate-limited client (the local stub when AI_MODEL_BACKEND=stub)"""
+    backend = 'stub' if os.environ.get('AI_MODEL_BACKEND', '').lower() == STUB_BACKEND else 'gemini'
+    key = _registry_key(api_key, model_name, backend)
+    with _registry_lock:
+        client = _registry.get(key)
+        if client is None:
+            if backend == 'stub':
+                base = StubModelClient(f'{STUB_BACKEND}-{model_name}')
+            else:
+                base = GeminiClient(api_key, model_name)
+            client = CachedModelClient(LimitedModelClient(base), cache or get_response_cache())
+            _registry[key] = client
+        return client
+
+
+def get_model_client_stats() -> List[Dict[str, Any]]:
+    """Counters of every shared client"""
+    with _registry_lock:
+        clients = list(_registry.values())
+    return [client.stats() for client in clients]
@@ -0,0 +1,99 @@
+"""
+Persistent cache of AI model responses
+Responses are keyed by (model, normalized prompt, data version) and stored in
+SQLite through DatabaseManager, so identical questions over unchanged data are
+answered without calling the model again, across sessions and restarts.
+Entries expire after a TTL and the table is capped by entry count and size.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
+
+
+DEFAULT_TTL_SECONDS = float(os.environ.get('AI_CACHE_TTL_HOURS', '24')) * 3600
+DEFAULT_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', '500'))
+DEFAULT_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_MB', '20')) * 1024 * 1024
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes in prompt templates still hit"""
+    return _WHITESPACE.sub(' ', prompt or '').strip()
+
+
+def make_cache_key(model: str, prompt: str, data_version: Optional[str]) -> str:
+    payload = '\x1f'.join([model or '', data_version or '', normalize_prompt(prompt)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """TTL- and size-capped response cache backed by the ai_response_cache table"""
+
+    def __init__(self, db, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, model: str, prompt: str, data_version: Optional[str]) -> Optional[str]:
+        response = self.db.get_ai_response(make_cache_key(model, prompt, data_version), self.ttl_seconds)
+        with self._lock:
+            if response is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return response
+
+    def put(self, model: str, prompt: str, data_version: Optional[str], response: str) -> None:
+        if not response:
+            return
+        self.db.save_ai_response(
+            make_cache_key(model, prompt, data_version), model, data_version, response,
+            self.max_entries, self.max_bytes, self.ttl_seconds
+        )
+
+    def clear(self) -> None:
+        self.db.clear_ai_response_cache()
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            stats = {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+        stored = self.db.get_ai_response_cache_stats()
+        stats.update({
+            'entries': stored['entries'],
+            'size_mb': round(stored['size_bytes'] / (1024 * 1024), 2),
+            'stored_hits': stored['hits'],
+        })
+        return stats
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache(db=None) -> ResponseCache:
+    """Process-wide response cache (uses the default database unless one is given)"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            if db is None:
+                from core.database_manager import DatabaseManager
+                db = DatabaseManager()
+            _response_cache = ResponseCache(db)
+        return _response_cache
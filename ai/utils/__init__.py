@@ -1,4 +1,20 @@
 """
 AI Utilities Module
-Future home for AI helper functions and context builders
-"""
\ No newline at end of file
+AI helper functions and prompt context builders
+"""
+
+from utils.lazy_import import lazy_exports
+
+_EXPORTS = {
+    'build_chat_context': '.context_builder',
+    'build_line_item_context': '.context_builder',
+    'estimate_tokens': '.context_builder',
+    'parse_chart_intent': '.chart_intent',
+    'get_chart_intent_stats': '.chart_intent',
+    'build_retrieval_context': '.retrieval',
+    'get_retrieval_index': '.retrieval',
+}
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = list(_EXPORTS)
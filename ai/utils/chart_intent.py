@@ -0,0 +1,265 @@
+"""
+Local chart intent parser
+Turns chat requests such as "mostre a evolução da receita 2022 vs 2024" into
+the chart requirements dict used by AIChatAssistant (chart type, metrics,
+time period, grouping) with keyword tables and the metric vocabulary of the
+loaded data. A confidence score tells the caller when the request is
+ambiguous enough to ask the model instead.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Requests containing any of these ask for a chart
+CHART_KEYWORDS = [
+    'mostre', 'gráfico', 'visualize', 'compare visualmente',
+    'evolução', 'tendência', 'progressão', 'histórico',
+    'show me', 'chart', 'graph', 'plot', 'desenhe', 'crie um gráfico',
+    'pizza', 'pie', 'barra', 'bar', 'linha', 'line', 'cascata', 'waterfall',
+    'heatmap', 'mapa de calor', 'dispersão', 'scatter', 'empilhado', 'stacked'
+]
+
+# Checked in order: the first chart type with a matching keyword wins.
+# Named chart types take precedence over types implied by the wording.
+CHART_TYPE_KEYWORDS = [
+    ('pie', ['pizza', 'pie']),
+    ('waterfall', ['cascata', 'waterfall']),
+    ('heatmap', ['heatmap', 'mapa de calor']),
+    ('scatter', ['dispersao', 'scatter']),
+    ('stacked_bar', ['empilhad', 'stacked']),
+    ('box', ['boxplot', 'box plot']),
+    ('area', ['grafico de area', 'area']),
+    ('bar', ['barra', ' bar ', ' bars ']),
+    ('line', ['linha', ' line ']),
+]
+IMPLIED_CHART_TYPE_KEYWORDS = [
+    ('line', ['evolucao', 'tendencia', 'progressao', 'historico', 'ao longo']),
+    ('pie', ['proporcao', 'participacao', 'composicao']),
+    ('waterfall', ['fluxo de resultado']),
+    ('heatmap', ['sazonalidade']),
+    ('scatter', ['correlacao']),
+    ('box', ['distribuicao']),
+    ('area', ['acumulad']),
+    ('bar', ['compare', 'comparar', 'comparacao', ' vs ', 'versus', 'ranking']),
+]
+
+# Canonical metric -> phrases (accent-folded, most specific first)
+METRIC_SYNONYMS = {
+    'contribution_margin': ['margem de contribuicao'],
+    'profit_margin': ['margem de lucro', 'margem liquida', 'margem'],
+    'variable_costs': ['custos variaveis', 'custo variavel', 'variaveis'],
+    'fixed_costs': ['custos fixos', 'custo fixo', 'fixos'],
+    'operational_costs': ['custos operacionais', 'custo operacional'],
+    'non_operational_costs': ['custos nao operacionais', 'nao operacional'],
+    'administrative_expenses': ['despesas administrativas', 'administrativ'],
+    'marketing_expenses': ['marketing'],
+    'financial_expenses': ['despesas financeiras'],
+    'taxes': ['impostos', 'tributos'],
+    'commissions': ['comissoes', 'comissao'],
+    'net_profit': ['lucro liquido', 'lucro', 'resultado'],
+    'revenue': ['receita', 'faturamento', 'vendas'],
+    'costs': ['custos', 'custo', 'despesas', 'gastos'],
+}
+
+MONTH_NAMES = {
+    'janeiro': 'JAN', 'fevereiro': 'FEV', 'marco': 'MAR', 'abril': 'ABR',
+    'maio': 'MAI', 'junho': 'JUN', 'julho': 'JUL', 'agosto': 'AGO',
+    'setembro': 'SET', 'outubro': 'OUT', 'novembro': 'NOV', 'dezembro': 'DEZ',
+}
+_MONTH_PATTERN = re.compile(
+    r'\b(' + '|'.join(list(MONTH_NAMES) + [abbr.lower() for abbr in MONTH_NAMES.values()]) + r')\b'
+)
+_YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+_LAST_N_YEARS_PATTERN = re.compile(r'ultimos (\d+) anos')
+_YEAR_RANGE_PATTERN = re.compile(r'\b(20\d{2})\s*(?:a|ate|-)\s*(20\d{2})\b')
+
+# Below this the caller should fall back to the model
+MIN_CONFIDENCE = 0.6
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents ("Evolução" -> "evolucao")"""
+    normalized = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in normalized if not unicodedata.combining(c)).lower()
+
+
+_FOLDED_CHART_KEYWORDS = [fold(keyword) for keyword in CHART_KEYWORDS]
+
+
+def needs_chart(query: str) -> bool:
+    """True when the request asks for a chart"""
+    query_folded = fold(query)
+    return any(keyword in query_folded for keyword in _FOLDED_CHART_KEYWORDS)
+
+
+def _metric_vocabulary(available_metrics: Iterable[str]) -> List[Tuple[str, str]]:
+    """(phrase, metric) pairs, longest phrase first, including line item names"""
+    available_metrics = set(available_metrics)
+    vocabulary = [
+        (phrase, metric) for metric, phrases in METRIC_SYNONYMS.items() for phrase in phrases
+        if metric in available_metrics or metric in ('revenue', 'costs')
+    ]
+    known = set(METRIC_SYNONYMS)
+    for metric in available_metrics:
+        if metric in known:
+            continue
+        phrase = fold(str(metric)).replace('_', ' ').strip()
+        if len(phrase) >= 4:
+            vocabulary.append((phrase, metric))
+    return sorted(vocabulary, key=lambda pair: -len(pair[0]))
+
+
+def _match_metrics(query_folded: str, available_metrics: Iterable[str]) -> List[str]:
+    available = set(available_metrics)
+    matched: List[str] = []
+    remaining = query_folded
+    for phrase, metric in _metric_vocabulary(available):
+        if phrase in remaining:
+            # Consume the phrase so "margem de lucro" does not also match "lucro"
+            remaining = remaining.replace(phrase, ' ')
+            if metric in matched:
+                continue
+            if metric == 'costs' and 'costs' not in available and 'variable_costs' in available:
+                metric = 'variable_costs'
+            matched.append(metric)
+    return matched
+
+
+def parse_chart_intent(query: str, available_metrics: Iterable[str],
+                       available_years: Iterable) -> Tuple[Dict, float]:
+    """Chart requirements for ``query`` and a confidence between 0 and 1
+
+    Confidence adds up what was resolved explicitly: chart type (0.3),
+    metrics (0.4) and time period or grouping (0.3). Chart type 'auto' is
+    returned when only metrics and period were understood.
+    """
+    query_folded = f" {fold(query)} "
+    available_metrics = list(available_metrics)
+    years_available = sorted(int(y) for y in available_years if str(y).isdigit())
+    confidence = 0.0
+
+    chart_type = 'auto'
+    for candidate, keywords in CHART_TYPE_KEYWORDS + IMPLIED_CHART_TYPE_KEYWORDS:
+        if any(keyword in query_folded for keyword in keywords):
+            chart_type = candidate
+            confidence += 0.3
+            break
+
+    metrics = _match_metrics(query_folded, available_metrics)
+    if metrics:
+        confidence += 0.4
+
+    years = [int(y) for y in _YEAR_PATTERN.findall(query_folded) if int(y) in years_available]
+    months = [MONTH_NAMES.get(m, m.upper()) for m in _MONTH_PATTERN.findall(query_folded)]
+    last_n = _LAST_N_YEARS_PATTERN.search(query_folded)
+
+    year_range = _YEAR_RANGE_PATTERN.search(query_folded)
+    if year_range:
+        # "de 2020 a 2024" is a range
+        start, end = sorted((int(year_range.group(1)), int(year_range.group(2))))
+        years = [y for y in years_available if start <= y <= end]
+    if last_n:
+        years = years_available[-int(last_n.group(1)):]
+
+    if months:
+        time_period = {'type': 'specific_months', 'years': years or None, 'months': months}
+    elif last_n:
+        time_period = {'type': 'last_n_years', 'years': years, 'months': None}
+    elif years:
+        time_period = {'type': 'specific_years', 'years': sorted(set(years)), 'months': None}
+    else:
+        time_period = {'type': 'all', 'years': None, 'months': None}
+
+    if months or any(word in query_folded for word in ('mensal', ' mes ', ' meses', 'por mes')):
+        grouping = 'month'
+    elif any(word in query_folded for word in ('trimestr', ' q1', ' q2', ' q3', ' q4')):
+        grouping = 'quarter'
+    elif any(word in query_folded for word in ('categoria', 'composicao', 'breakdown')):
+        grouping = 'category'
+    else:
+        grouping = 'year'
+
+    if time_period['type'] != 'all' or grouping != 'year' or ' todos ' in query_folded \
+            or 'historico' in query_folded or 'evolucao' in query_folded:
+        confidence += 0.3
+
+    if chart_type == 'pie' or grouping == 'category':
+        comparison_type = 'proportion'
+    elif chart_type == 'scatter':
+        comparison_type = 'correlation'
+    elif chart_type == 'bar' or (years and len(years) <= 3 and time_period['type'] == 'specific_years'):
+        comparison_type = 'side_by_side'
+    else:
+        comparison_type = 'time_series'
+
+    requirements = {
+        'chart_type': chart_type,
+        'metrics': metrics or ['revenue'],
+        'time_period': time_period,
+        'grouping': grouping,
+        'comparison_type': comparison_type,
+        'title': '',
+        'format_options': {
+            'show_values': chart_type in ('bar', 'waterfall', 'stacked_bar'),
+            'show_percentages': chart_type == 'pie' or metrics == ['profit_margin'],
+            'currency': metrics != ['profit_margin'],
+        }
+    }
+    return requirements, round(min(confidence, 1.0), 2)
+
+
+class ChartIntentStats:
+    """Counts how chart requests were resolved (locally or by the model)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.model = 0
+
+    def record(self, source: str) -> None:
+        with self._lock:
+            if source == 'local':
+                self.local += 1
+            else:
+                self.model += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.local + self.model
+            return {
+                'local': self.local,
+                'model': self.model,
+                'hit_rate': self.local / total if total else 0.0,
+            }
+
+
+_stats = ChartIntentStats()
+
+
+def get_chart_intent_stats() -> Dict[str, float]:
+    """Requests resolved locally vs by the model, and the local hit rate"""
+    return _stats.snapshot()
+
+
+def record_chart_intent(source: str) -> None:
+    _stats.record(source)
+
+
+def filter_hint(query: str) -> Optional[str]:
+    """Kind of filter a request refers to ("filtrar por year", ...), if any"""
+    patterns = {
+        r'mostre.*(2\d{3})': 'year',
+        r'compare.*(2\d{3}).*(2\d{3})': 'year_comparison',
+        r'(janeiro|fevereiro|março|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro)': 'month',
+        r'(jan|fev|mar|abr|mai|jun|jul|ago|set|out|nov|dez)': 'month',
+        r'(q1|q2|q3|q4|trimestre)': 'quarter',
+        r'(melhores|piores|top|bottom).*(meses)': 'performance'
+    }
+    query_lower = query.lower()
+    for pattern, filter_type in patterns.items():
+        if re.search(pattern, query_lower):
+            return f"filtrar por {filter_type}"
+    return None
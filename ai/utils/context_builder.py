@@ -0,0 +1,201 @@
+"""
+Prompt context builder
+Compact data summaries for AI prompts, computed once per (data version,
+filter context, budget) through the shared artifact store and bounded by a
+token budget:
+- chat context: annual totals, growth and seasonality always; monthly detail
+  for the most recent years while the budget allows, older years as one
+  aggregated row each
+- line items: ranked by absolute value; the Pareto head (items making up
+  PARETO_SHARE of the total) and further top items while the budget allows,
+  the remaining tail aggregated per category
+"""
+
+import math
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from core.artifact_store import compute_data_version, frame_fingerprint, get_artifact_store
+from utils.tracing import traced
+
+
+CHAT_CONTEXT_TOKENS = int(os.environ.get('AI_CONTEXT_TOKEN_BUDGET', '6000'))
+LINE_ITEM_CONTEXT_TOKENS = int(os.environ.get('AI_LINE_ITEM_TOKEN_BUDGET', '4000'))
+PARETO_SHARE = 0.8
+# Rough size of a token for Portuguese text with numbers
+CHARS_PER_TOKEN = 4
+
+MONTHS = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN',
+          'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of ``text`` (no tokenizer round trip)"""
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def monthly_values(year_data: Dict, *keys: str) -> Dict:
+    """Monthly values of the first present key (flat or nested under 'monthly')"""
+    for key in keys:
+        values = year_data.get(key)
+        if isinstance(values, dict):
+            monthly = values.get('monthly', values)
+            return monthly if isinstance(monthly, dict) else {}
+    return {}
+
+
+def _monthly_frame(data: Dict) -> pd.DataFrame:
+    """One row per (year, month) with revenue, variable/fixed costs and net profit"""
+    rows = []
+    for year, year_data in data.items():
+        try:
+            year = int(year)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(year_data, dict):
+            continue
+        revenue = monthly_values(year_data, 'revenue')
+        costs = monthly_values(year_data, 'costs', 'variable_costs')
+        fixed_costs = monthly_values(year_data, 'fixed_costs')
+        for month_index, month in enumerate(MONTHS):
+            if not isinstance(revenue.get(month), (int, float)):
+                continue
+            rows.append({
+                'Ano': year,
+                'month_index': month_index,
+                'Mês': month,
+                'Receita': float(revenue.get(month) or 0),
+                'Custos Variáveis': float(costs.get(month) or 0),
+                'Custos Fixos': float(fixed_costs.get(month) or 0),
+            })
+    frame = pd.DataFrame(rows, columns=['Ano', 'month_index', 'Mês', 'Receita', 'Custos Variáveis', 'Custos Fixos'])
+    frame['Lucro Líquido'] = frame['Receita'] - frame['Custos Variáveis'] - frame['Custos Fixos']
+    return frame.sort_values(['Ano', 'month_index']).reset_index(drop=True)
+
+
+def format_value(value: float) -> str:
+    """Whole reais with dots as thousands separators (1.234.567)"""
+    return f"{value:,.0f}".replace(',', '.')
+
+
+def _compute_chat_context(data: Dict, include_monthly: bool, token_budget: int) -> str:
+    monthly = _monthly_frame(data)
+    years = sorted(int(y) for y in monthly['Ano'].unique())
+    annual = monthly.groupby('Ano')[['Receita', 'Custos Variáveis', 'Custos Fixos', 'Lucro Líquido']].sum()
+
+    parts = [f"Anos disponíveis: {years}"]
+    parts.append("Receita por ano: " + "; ".join(
+        f"{year}: R$ {format_value(value)}" for year, value in annual['Receita'].items()
+    ))
+
+    if len(annual) > 1:
+        previous = annual['Receita'].shift(1)
+        growth = ((annual['Receita'] - previous) / previous * 100).where(previous > 0)
+        parts.append("Crescimento anual: " + ", ".join(
+            f"{int(prev_year)}-{int(year)}: {rate:.1f}%"
+            for (year, rate), prev_year in zip(growth.items(), annual.index.to_series().shift(1))
+            if pd.notna(rate)
+        ))
+
+    if include_monthly and not monthly.empty:
+        month_means = monthly.groupby('month_index')['Receita'].mean().sort_values()
+        parts.append(f"Melhores meses (Receita Média): {[MONTHS[i] for i in month_means.index[::-1][:3]]}")
+        parts.append(f"Piores meses (Receita Média): {[MONTHS[i] for i in month_means.index[:3]]}")
+
+        # Reserve room for the aggregated-years table (at most one row per year)
+        header = "\n".join(parts)
+        remaining = token_budget - estimate_tokens(header) - estimate_tokens(annual.to_string()) - 40
+        columns = ['Ano', 'Mês', 'Receita', 'Custos Variáveis', 'Custos Fixos', 'Lucro Líquido']
+
+        # Most recent years first, in full, while they fit the budget
+        detailed_years: List[int] = []
+        for year in reversed(years):
+            block = monthly.loc[monthly['Ano'] == year, columns].to_string(index=False)
+            cost = estimate_tokens(block)
+            if cost > remaining and detailed_years:
+                break
+            detailed_years.insert(0, year)
+            remaining -= cost
+
+        detail = monthly[monthly['Ano'].isin(detailed_years)][columns]
+        section = "\nDados Mensais Detalhados:\n" + detail.to_string(index=False)
+        older = [year for year in years if year not in detailed_years]
+        if older:
+            aggregated = annual.loc[older].reset_index()
+            section += (
+                f"\n\nAnos anteriores agregados (totais anuais, {len(older)} anos sem detalhe mensal):\n"
+                + aggregated.to_string(index=False)
+            )
+        parts.append(section)
+
+    return "\n".join(parts)
+
+
+@traced()
+def build_chat_context(data: Dict, filter_context: str = '', data_version: Optional[str] = None,
+                       include_monthly: bool = True, token_budget: int = CHAT_CONTEXT_TOKENS) -> str:
+    """Data context for chat prompts, cached per data version, filter context and budget"""
+    if not data:
+        return "Nenhum dado financeiro disponível."
+    if data_version is None:
+        data_version = compute_data_version(data)
+    return get_artifact_store().get_or_compute(
+        'chat_context',
+        data_version,
+        lambda: _compute_chat_context(data, include_monthly, token_budget),
+        params={'filter': filter_context, 'monthly': include_monthly, 'budget': token_budget}
+    )
+
+
+def _compute_line_item_context(df: pd.DataFrame, value_column: str, group_column: Optional[str],
+                               token_budget: int) -> str:
+    ranked = df.assign(_abs=df[value_column].abs()).sort_values('_abs', ascending=False)
+    total = ranked['_abs'].sum()
+    shares = ranked['_abs'].cumsum() / total if total else pd.Series(1.0, index=ranked.index)
+    pareto_count = int((shares < PARETO_SHARE).sum()) + 1
+
+    columns = [c for c in df.columns if c != '_abs']
+    row_tokens = max(1, estimate_tokens(ranked[columns].head(20).to_string(index=False)) // max(1, min(20, len(ranked))))
+    fit_count = max(1, (token_budget - 200) // row_tokens)
+    # Top items in rank order while they fit: the Pareto head first, then the
+    # next largest; everything after the budget is aggregated
+    head_count = min(len(ranked), fit_count)
+    head = ranked.head(head_count)
+    tail = ranked.iloc[head_count:]
+
+    head_share = head['_abs'].sum() / total * 100 if total else 100.0
+    parts = [
+        f"Itens: {len(ranked)} | Total: R$ {format_value(ranked[value_column].sum())}",
+        f"{pareto_count} itens concentram {PARETO_SHARE * 100:.0f}% do valor absoluto (Pareto).",
+        f"\nPrincipais itens ({len(head)}, {head_share:.1f}% do total), em ordem decrescente:",
+        head[columns].to_string(index=False),
+    ]
+    if not tail.empty:
+        if group_column and group_column in tail.columns:
+            aggregated = (
+                tail.groupby(group_column)[value_column].agg(['count', 'sum'])
+                .sort_values('sum', key=lambda s: s.abs(), ascending=False)
+                .rename(columns={'count': 'Itens', 'sum': value_column})
+                .reset_index()
+            )
+            parts.append(f"\nDemais {len(tail)} itens agregados por {group_column}:")
+            parts.append(aggregated.to_string(index=False))
+        else:
+            parts.append(f"\nDemais {len(tail)} itens: R$ {format_value(tail[value_column].sum())}")
+    return "\n".join(parts)
+
+
+@traced()
+def build_line_item_context(df: pd.DataFrame, value_column: str, group_column: Optional[str] = None,
+                            token_budget: int = LINE_ITEM_CONTEXT_TOKENS) -> str:
+    """Ranked, budgeted table of line items (Pareto head + aggregated tail), cached per frame"""
+    if df is None or df.empty:
+        return "Nenhum item disponível."
+    return get_artifact_store().get_or_compute(
+        'line_item_context',
+        frame_fingerprint(df),
+        lambda: _compute_line_item_context(df, value_column, group_column, token_budget),
+        params={'value': value_column, 'group': group_column, 'budget': token_budget}
+    )
@@ -0,0 +1,277 @@
+"""
+Local retrieval index for chat
+An in-process BM25 index over the financial data so chat prompts carry the
+few rows relevant to the question ("quanto gastamos com telefone em 2023?")
+instead of everything. Documents are:
+- line items (label, category, annual and monthly values)
+- category totals per year
+- the monthly values table (one row per year and month)
+- financial notes extracted from the spreadsheets (FinancialAnalysisExtractor)
+Tokens are accent-folded and lowercased. One index is built per data version
+(and notes version) and shared through the artifact store, so sessions on
+different versions each search their own index and a version is indexed once.
+"""
+
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.artifact_store import compute_data_version, get_artifact_store
+from ai.utils.chart_intent import METRIC_SYNONYMS, fold
+from ai.utils.context_builder import MONTHS, format_value, monthly_values
+from utils.tracing import traced
+
+
+RETRIEVAL_TOP_K = int(os.environ.get('AI_RETRIEVAL_TOP_K', '8'))
+BM25_K1 = 1.5
+BM25_B = 0.75
+NOTE_CHUNK_CHARS = 600
+
+METRIC_LABELS = {
+    'revenue': 'Receita',
+    'variable_costs': 'Custos Variáveis',
+    'fixed_costs': 'Custos Fixos',
+    'operational_costs': 'Custos Operacionais',
+    'non_operational_costs': 'Custos Não Operacionais',
+    'administrative_expenses': 'Despesas Administrativas',
+    'admin_expenses': 'Despesas Administrativas',
+    'operational_expenses': 'Despesas Operacionais',
+    'marketing_expenses': 'Despesas de Marketing',
+    'financial_expenses': 'Despesas Financeiras',
+    'tax_expenses': 'Impostos',
+    'taxes': 'Impostos',
+    'commissions': 'Comissões',
+    'other_expenses': 'Outras Despesas',
+    'other_costs': 'Outros Custos',
+    'net_profit': 'Lucro Líquido',
+    'contribution_margin': 'Margem de Contribuição',
+    'profit_margin': 'Margem de Lucro',
+}
+
+MONTH_FULL_NAMES = {
+    'JAN': 'janeiro', 'FEV': 'fevereiro', 'MAR': 'marco', 'ABR': 'abril',
+    'MAI': 'maio', 'JUN': 'junho', 'JUL': 'julho', 'AGO': 'agosto',
+    'SET': 'setembro', 'OUT': 'outubro', 'NOV': 'novembro', 'DEZ': 'dezembro',
+}
+
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na',
+    'nos', 'nas', 'com', 'por', 'para', 'um', 'uma', 'que', 'qual', 'quais',
+    'quanto', 'quanta', 'quantos', 'como', 'foi', 'foram', 'ao', 'aos', 'se',
+    'mais', 'menos', 'nosso', 'nossa', 'nossos', 'nossas', 'me', 'mostre',
+    'the', 'of', 'in', 'and', 'what', 'how',
+}
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded tokens without stopwords; plural 's' dropped from longer words"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(fold(text)):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        if len(token) > 4 and token.endswith('s') and not token.isdigit():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _metric_label(metric: str) -> str:
+    return METRIC_LABELS.get(metric, str(metric).replace('_', ' ').title())
+
+
+def _metric_terms(metric: str) -> str:
+    """Label plus the chat synonyms of a metric, so "gastos" finds costs rows"""
+    terms = [_metric_label(metric)] + METRIC_SYNONYMS.get(metric, [])
+    if metric.endswith('costs') or metric.endswith('expenses'):
+        terms += METRIC_SYNONYMS['costs']
+    return ' '.join(terms)
+
+
+def _monthly_text(monthly: Dict) -> str:
+    return ', '.join(
+        f"{month}: {format_value(monthly[month])}"
+        for month in MONTHS if isinstance(monthly.get(month), (int, float))
+    )
+
+
+def _year_documents(year: int, year_data: Dict) -> List[Dict[str, Any]]:
+    """Line item, category total and monthly table documents of one year"""
+    documents = []
+
+    def add(kind: str, text: str, terms: str) -> None:
+        documents.append({'kind': kind, 'year': year, 'text': text, 'tokens': tokenize(f"{terms} {year}")})
+
+    # Flexible data keeps line items at the top level with their category
+    line_items = year_data.get('line_items') if isinstance(year_data.get('line_items'), dict) else {}
+    for item in line_items.values():
+        if not isinstance(item, dict) or not item.get('label'):
+            continue
+        category = item.get('category', '')
+        add('line_item',
+            f"{year} | {_metric_label(category)} | {item['label']} | Anual: R$ {format_value(item.get('annual') or 0)}"
+            f" | {_monthly_text(item.get('monthly') or {})}",
+            f"{item['label']} {_metric_terms(category) if category else ''}")
+
+    for metric, values in year_data.items():
+        if metric == 'line_items' or not isinstance(values, dict):
+            continue
+        annual = values.get('annual')
+        if isinstance(annual, (int, float)):
+            suffix = '%' if metric == 'profit_margin' else ''
+            prefix = '' if suffix else 'R$ '
+            add('category',
+                f"{year} | {_metric_label(metric)} (total) | Anual: {prefix}{format_value(annual)}{suffix}"
+                f" | {_monthly_text(values.get('monthly') or {})}",
+                _metric_terms(metric))
+        for item in (values.get('line_items') or {}).values():
+            if not isinstance(item, dict) or not item.get('label'):
+                continue
+            add('line_item',
+                f"{year} | {_metric_label(metric)} | {item['label']} | Anual: R$ {format_value(item.get('annual') or 0)}"
+                f" | {_monthly_text(item.get('monthly') or {})}",
+                f"{item['label']} {_metric_terms(metric)}")
+
+    revenue = monthly_values(year_data, 'revenue')
+    costs = monthly_values(year_data, 'costs', 'variable_costs')
+    fixed_costs = monthly_values(year_data, 'fixed_costs')
+    net_profit = monthly_values(year_data, 'net_profit')
+    for month in MONTHS:
+        if not isinstance(revenue.get(month), (int, float)):
+            continue
+        columns = [('revenue', revenue), ('variable_costs', costs), ('fixed_costs', fixed_costs),
+                   ('net_profit', net_profit)]
+        add('monthly',
+            f"{year} {month} | " + ' | '.join(
+                f"{_metric_label(metric)}: R$ {format_value(values.get(month) or 0)}"
+                for metric, values in columns if isinstance(values.get(month), (int, float))
+            ),
+            f"{month} {MONTH_FULL_NAMES[month]} mensal mes " + ' '.join(_metric_label(metric) for metric, _ in columns))
+    return documents
+
+
+def _note_documents(year: int, text: str) -> List[Dict[str, Any]]:
+    """Financial notes of one year, split in paragraphs of up to NOTE_CHUNK_CHARS"""
+    documents, chunk = [], ''
+    for paragraph in [p.strip() for p in re.split(r'\n\s*\n|\n', text or '') if p.strip()]:
+        if chunk and len(chunk) + len(paragraph) > NOTE_CHUNK_CHARS:
+            documents.append(chunk)
+            chunk = ''
+        chunk = f"{chunk}\n{paragraph}" if chunk else paragraph
+    if chunk:
+        documents.append(chunk)
+    return [
+        {'kind': 'note', 'year': year, 'text': f"{year} | Nota: {' '.join(chunk[:NOTE_CHUNK_CHARS].split())}",
+         'tokens': tokenize(f"{chunk} {year} nota analise comentario")}
+        for chunk in documents
+    ]
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring; read-only once its documents are added"""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._documents: Dict[int, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, documents: Iterable[Dict[str, Any]]) -> None:
+        """Index documents ({'text', 'tokens', ...}); call before sharing the index"""
+        for document in documents:
+            doc_id = len(self._documents)
+            document['length'] = len(document['tokens'])
+            self._documents[doc_id] = document
+            self._total_length += document['length']
+            for token, count in Counter(document['tokens']).items():
+                self._postings[token][doc_id] = count
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top ``k`` (score, document) pairs for ``query``, best first"""
+        if not self._documents:
+            return []
+        total = len(self._documents)
+        average_length = self._total_length / total or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, count in postings.items():
+                length = self._documents[doc_id]['length']
+                norm = count + self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] += idf * count * (self.k1 + 1) / norm
+        best = sorted(scores.items(), key=lambda pair: -pair[1])[:k]
+        return [(round(score, 3), self._documents[doc_id]) for doc_id, score in best]
+
+
+def build_index(data: Dict, notes: Optional[Dict[int, str]] = None) -> BM25Index:
+    """Index of the documents of every year of ``data`` and of the notes"""
+    index = BM25Index()
+    for year, year_data in data.items():
+        try:
+            year = int(year)
+        except (TypeError, ValueError):
+            continue
+        if isinstance(year_data, dict):
+            index.add(_year_documents(year, year_data))
+    for year, text in (notes or {}).items():
+        index.add(_note_documents(int(year), text))
+    return index
+
+
+def get_retrieval_index(data: Dict, data_version: Optional[str] = None,
+                        notes: Optional[Dict[int, str]] = None) -> BM25Index:
+    """Index of ``data`` (and notes), built once per data and notes version"""
+    if data_version is None:
+        data_version = compute_data_version(data)
+    notes_version = compute_data_version(notes) if notes else ''
+    return get_artifact_store().get_or_compute(
+        'retrieval_index',
+        data_version,
+        lambda: build_index(data, notes),
+        params={'notes': notes_version}
+    )
+
+
+def retrieve(query: str, data: Dict, data_version: Optional[str] = None,
+             notes: Optional[Dict[int, str]] = None, k: int = RETRIEVAL_TOP_K) -> List[Tuple[float, Dict[str, Any]]]:
+    """Top ``k`` documents of the financial data for a chat question"""
+    if not data or not query:
+        return []
+    return get_retrieval_index(data, data_version, notes).search(query, k)
+
+
+@traced()
+def build_retrieval_context(query: str, data: Dict, data_version: Optional[str] = None,
+                            notes: Optional[Dict[int, str]] = None, k: int = RETRIEVAL_TOP_K) -> str:
+    """Prompt section with the rows most relevant to ``query`` ('' when nothing matches)"""
+    results = retrieve(query, data, data_version, notes, k)
+    if not results:
+        return ''
+    return "\n".join(document['text'] for _, document in results)
+
+
+def load_financial_notes(file_paths: Iterable[str]) -> Dict[int, str]:
+    """Financial notes per year from the uploaded spreadsheets, cached per file and mtime"""
+    from core.extractors.financial_analysis_extractor import FinancialAnalysisExtractor
+
+    notes: Dict[int, str] = {}
+    for path in file_paths:
+        if not path or not os.path.exists(path):
+            continue
+        file_version = f"{path}:{os.path.getmtime(path)}"
+        notes.update(get_artifact_store().get_or_compute(
+            'financial_notes',
+            file_version,
+            lambda path=path: FinancialAnalysisExtractor().extract_from_excel(path)
+        ))
+    return notes
@@ -4,11 +4,10 @@ Refactored version using modular architecture
 """
 
 import streamlit as st
-import pandas as pd
 import os
 import sys
+import uuid
 from dotenv import load_dotenv
-import google.generativeai as genai
 from datetime import datetime
 from typing import Dict
 
@@ -24,23 +23,6 @@ from auth import init_auth, require_auth, show_login_page, show_user_menu, show_
 # Import database manager
 from core.database_manager import DatabaseManager
 
-# Import utilities
-from utils.legacy_helpers import (
-    initialize_session_state,
-    generate_monthly_data_from_extracted,
-    convert_extracted_to_processed
-)
-from utils.formatters import format_time_difference
-
-# Import tab modules
-from ui.tabs.upload_legacy_tab import render_upload_tab
-from ui.tabs.dashboard_legacy_tab import render_dashboard_tab
-from ui.tabs.micro_analysis import render_micro_analysis_tab
-from ui.tabs.ai_insights_legacy_tab import render_ai_insights_tab
-from ui.tabs.ai_chat_legacy_tab import render_ai_chat_tab
-from ui.tabs.auth_management_tab_simple import render_auth_management_tab
-from ui.tabs.debug_extractors_tab import render_debug_extractors_tab
-
 # Load environment variables
 load_dotenv()
 
@@ -116,6 +98,33 @@ if not st.session_state.get('user'):
     show_login_page()
     st.stop()
 
+# Time this rerun: spans opened below are collected into one trace (Debug tab)
+from utils.tracing import begin_trace, finish_trace
+if 'perf_trace_key' not in st.session_state:
+    st.session_state.perf_trace_key = uuid.uuid4().hex
+begin_trace('rerun', st.session_state.perf_trace_key)
+
+# Analytics, chart and AI modules are imported only past the login gate so the
+# login form renders without loading pandas, plotly or google.generativeai
+from core.artifact_store import get_artifact_store, session_data_version
+from core.monthly_artifact import get_monthly_artifact
+
+# Import utilities
+from utils.legacy_helpers import (
+    initialize_session_state,
+    convert_extracted_to_processed
+)
+from utils.formatters import format_time_difference
+
+# Import tab modules
+from ui.tabs.upload_legacy_tab import render_upload_tab
+from ui.tabs.dashboard_legacy_tab import render_dashboard_tab
+from ui.tabs.micro_analysis import render_micro_analysis_tab
+from ui.tabs.ai_insights_legacy_tab import render_ai_insights_tab
+from ui.tabs.ai_chat_legacy_tab import render_ai_chat_tab
+from ui.tabs.auth_management_tab_simple import render_auth_management_tab
+from ui.tabs.debug_extractors_tab import render_debug_extractors_tab
+
 # Main app header
 col1, col2 = st.columns([4, 1])
 with col1:
@@ -150,7 +159,7 @@ with st.sidebar:
     gemini_api_key = st.text_input(
         "🔑 Chave API Gemini",
         type="password",
-        value=os.getenv("GEMINI_API_KEY", ""),
+        value=os.getenv("GEMINI_API_KEY", "stub" if os.getenv("AI_MODEL_BACKEND", "").lower() == "stub" else ""),
         help="Obtenha sua chave API no Google AI Studio"
     )
     
@@ -211,16 +220,36 @@ if data_loaded:
 # Convert extracted data to processed format if needed
 # This block should always regenerate processed_data from extracted_data
 # if extracted_data is present, to ensure consistency.
+# Derived frames are shared across sessions through the artifact store, keyed
+# by the content version of extracted_data, so only the first session computes them.
+# The version is stored with the shared data, so reruns do not rehash extracted_data.
 if hasattr(st.session_state, 'extracted_data') and st.session_state.extracted_data:
-    st.session_state.processed_data = convert_extracted_to_processed(st.session_state.extracted_data)
+    artifact_store = get_artifact_store()
+    extracted_data = st.session_state.extracted_data
+    session_data_version(st.session_state)
+
+    processed_data = artifact_store.get_or_compute(
+        'processed_data',
+        st.session_state.data_version,
+        lambda: convert_extracted_to_processed(extracted_data)
+    )
+    if processed_data:
+        # Keep raw_data pointing at this session's own extracted_data
+        processed_data['raw_data'] = extracted_data
+    st.session_state.processed_data = processed_data
 
-    # Always regenerate monthly data from extracted data to ensure it's up to date
+    # Monthly data is a persisted artifact of the data version; a missing one
+    # is rebuilt in the background instead of during this render
     try:
-        st.session_state.monthly_data = generate_monthly_data_from_extracted(st.session_state.extracted_data)
+        st.session_state.monthly_data = get_monthly_artifact(
+            db,
+            extracted_data,
+            st.session_state.data_version,
+            requested_by=st.session_state.user.get('username')
+        )
     except Exception as e:
-        print(f"Error generating monthly data: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error loading monthly data: {e}")
+        st.session_state.monthly_data = None
 
 # Main content - Tabs
 tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = st.tabs([
@@ -302,4 +331,10 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# Account this session's memory and drop recomputable data over the soft limits
+from utils.session_memory import enforce_session_memory
+enforce_session_memory()
+
+finish_trace()
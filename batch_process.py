@@ -0,0 +1,164 @@
+"""
+Run the financial analysis pipeline headless and publish the results.
+
+Does what "Analisar Dados Financeiros" in the upload tab does, without
+Streamlit, so a nightly refresh can run from cron. Input files are the ones
+in GerenciadorArquivos' registry under DATA_PATH (same as the upload tab),
+or every Excel file of --dir. Files are extracted in parallel worker
+processes and the results seed the extraction cache, so consolidation and
+the monthly frame do not parse any workbook again. The results are
+published to dashboard.db in one transaction, with the monthly frame of the
+new data version persisted for the dashboards.
+
+Nothing is published unless every file yields data: a partial data set
+would replace the complete one sessions currently see.
+
+Usage: python batch_process.py [--dir PATH] [--register] [--workers N]
+                               [--username NAME] [--no-anomalies] [--dry-run]
+Exits with status 1 when there are no input files, a file yields no data,
+the pipeline fails or publishing fails.
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+EXCEL_PATTERNS = ('*.xlsx', '*.xls')
+
+
+def log(message: str) -> None:
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}", flush=True)
+
+
+def _extract(path: str) -> Tuple[str, Dict[int, Dict], float]:
+    """Worker: UnifiedFinancialExtractor output for one file and its duration in ms"""
+    from core.unified_extractor import UnifiedFinancialExtractor
+
+    started = time.perf_counter()
+    data = UnifiedFinancialExtractor().extract_from_excel(path)
+    return path, data, (time.perf_counter() - started) * 1000
+
+
+def extract_files(paths: List[str], workers: int) -> Dict[str, Dict[int, Dict]]:
+    """Extract every file, in ``workers`` processes when there is more than one file"""
+    if workers <= 1 or len(paths) <= 1:
+        outputs = [_extract(path) for path in paths]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            outputs = list(pool.map(_extract, paths))
+
+    extracted = {}
+    for path, data, elapsed_ms in outputs:
+        log(f"  {os.path.basename(path)}: {len(data)} year(s) in {elapsed_ms:,.0f} ms")
+        extracted[path] = data
+    return extracted
+
+
+def registry_files(register_dir: str = None) -> Tuple[Any, List[str]]:
+    """File manager set up as the app does it, and the paths of its registered files"""
+    from core.database_manager import DatabaseManager
+    from core.gerenciador_arquivos import GerenciadorArquivos
+
+    file_manager = GerenciadorArquivos()
+    file_manager.set_database_manager(DatabaseManager())
+    if file_manager.is_production or file_manager.is_staging:
+        file_manager.sync_from_database()
+    else:
+        file_manager.sincronizar_arquivos_existentes()
+    if register_dir:
+        for path in directory_files(register_dir):
+            if not file_manager.registrar_arquivo(path):
+                raise RuntimeError(f"could not register {path}")
+    return file_manager, file_manager.obter_caminhos_arquivos()
+
+
+def directory_files(directory: str) -> List[str]:
+    paths = set()
+    for pattern in EXCEL_PATTERNS:
+        paths.update(glob.glob(os.path.join(directory, pattern)))
+    # Skip Excel lock files of workbooks open in Excel
+    return sorted(path for path in paths if not os.path.basename(path).startswith('~$'))
+
+
+def run(args) -> Dict[str, Any]:
+    """Extract, run the pipeline and publish; raises on any failure"""
+    from core.analysis_pipeline import publish_analysis, run_analysis_pipeline
+    from core.artifact_store import get_artifact_store
+    from core.database_manager import DatabaseManager
+    from core.financial_processor import EXTRACTION_ARTIFACT, extraction_version
+
+    file_manager = None
+    if args.dir and not args.register:
+        paths = directory_files(args.dir)
+    else:
+        file_manager, paths = registry_files(args.dir)
+    try:
+        if not paths:
+            raise RuntimeError("no Excel files to process")
+        file_names = [os.path.basename(path) for path in paths]
+
+        workers = args.workers or min(len(paths), os.cpu_count() or 1)
+        log(f"Extracting {len(paths)} file(s) with {workers} worker(s)")
+        extracted = extract_files(paths, workers)
+        empty = [os.path.basename(path) for path, data in extracted.items() if not data]
+        if empty:
+            raise RuntimeError(f"no data extracted from {', '.join(empty)}")
+
+        store = get_artifact_store()
+        for path, data in extracted.items():
+            store.put(EXTRACTION_ARTIFACT, extraction_version(path), data)
+
+        def progress(stage, percent, message):
+            log(f"[{stage} {percent:.0f}%] {message}")
+
+        results = run_analysis_pipeline(paths, not args.no_anomalies, progress=progress)
+        if args.dry_run:
+            log("Dry run: nothing published")
+            return results
+
+        progress('publish', 85, "Publicando dados para todos os usuários...")
+        return publish_analysis(DatabaseManager(), results, args.username, '', file_names, progress=progress)
+    finally:
+        if file_manager is not None:
+            file_manager.cleanup_temp_files()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dir', help="process the Excel files of this directory instead of the registry")
+    parser.add_argument('--register', action='store_true',
+                        help="with --dir: add the files to the registry and process the whole registry")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="extraction processes (default: one per file, up to the CPU count)")
+    parser.add_argument('--username', default='batch', help="recorded as the uploader in the upload history")
+    parser.add_argument('--no-anomalies', action='store_true', help="skip anomaly detection")
+    parser.add_argument('--dry-run', action='store_true', help="run the pipeline but do not publish")
+    args = parser.parse_args()
+    if args.register and not args.dir:
+        parser.error("--register requires --dir")
+
+    started = time.perf_counter()
+    try:
+        results = run(args)
+    except Exception as e:
+        log(f"❌ Batch processing failed: {e}")
+        sys.exit(1)
+
+    years = sorted(results['unified_data'])
+    log(f"✅ {len(years)} year(s) ({years[0]}–{years[-1]}) processed in {time.perf_counter() - started:,.1f}s"
+        + (f", data version {results['data_version']}" if results.get('data_version') else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark the Plotly figure cache against the chart builders it wraps and
+verify a cache hit returns the same figure as the builder.
+
+For every @cached_figure builder it reports, in ms (best of --repeat):
+- build:     the undecorated builder
+- miss:      decorated call on an empty cache (builder plus storing the spec)
+- hit:       decorated call on a warm cache
+- from_json: rebuilding the figure from its JSON, as the cache did before
+- encode:    what st.plotly_chart does with the returned figure on every rerun
+
+Usage: python benchmark_figure_cache.py [--years N] [--repeat N]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import plotly.tools
+
+from components.charts.receita_chart import create_receita_chart
+from components.charts.resultado_chart import create_resultado_chart
+from visualizations.charts import create_pnl_waterfall_chart, create_revenue_cost_chart
+from visualizations.client_filters import create_client_filtered_chart
+from visualizations.figure_cache import get_figure_cache
+
+MONTHS = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+COST_COLUMNS = ['variable_costs', 'fixed_costs', 'operational_costs', 'non_operational_costs', 'taxes',
+                'commissions', 'administrative_expenses', 'marketing_expenses', 'financial_expenses']
+
+
+def make_frames(years, seed=42):
+    """Synthetic (annual, monthly) frames with the columns the builders read"""
+    rng = np.random.default_rng(seed)
+    monthly = pd.DataFrame({
+        'year': np.repeat(np.arange(2025 - years + 1, 2026), 12),
+        'month': MONTHS * years,
+        'month_num': list(range(1, 13)) * years,
+    })
+    monthly['month_year'] = monthly['month'] + '/' + monthly['year'].astype(str)
+    monthly['revenue'] = rng.normal(1_000_000, 200_000, len(monthly))
+    for col in COST_COLUMNS:
+        monthly[col] = monthly['revenue'] * rng.uniform(0.01, 0.1, len(monthly))
+    monthly['net_profit'] = monthly['revenue'] - monthly[COST_COLUMNS].sum(axis=1)
+    monthly['profit_margin'] = monthly['net_profit'] / monthly['revenue'] * 100
+    annual = monthly.groupby('year', as_index=False)[['revenue', 'net_profit'] + COST_COLUMNS].sum()
+    return annual, monthly
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def streamlit_encode(fig):
+    """The conversion st.plotly_chart applies to the figure it receives"""
+    return pio.to_json(plotly.tools.return_figure_from_figure_or_data(fig, validate_figure=True), validate=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=int, default=8, help="years of monthly data (default 8)")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    annual, monthly = make_frames(args.years)
+    cases = [
+        ('create_receita_chart', create_receita_chart, (monthly, 'Mensal')),
+        ('create_resultado_chart', create_resultado_chart, (monthly, 'Mensal')),
+        ('create_revenue_cost_chart', create_revenue_cost_chart, (annual,)),
+        ('create_pnl_waterfall_chart', create_pnl_waterfall_chart, (annual,)),
+        ('create_client_filtered_chart', create_client_filtered_chart,
+         (monthly, ['revenue', 'net_profit'], 'Receita e Resultado')),
+    ]
+    cache = get_figure_cache()
+
+    print(f"{'builder':<30} {'build':>8} {'miss':>8} {'hit':>8} {'from_json':>10} {'encode':>8} {'speedup':>8}")
+    for name, builder, builder_args in cases:
+        try:
+            build_ms, built = timed(lambda: builder.uncached(*builder_args), args.repeat)
+        except Exception as e:
+            # e.g. properties the installed plotly no longer accepts
+            print(f"{name:<30} skipped: {str(e).splitlines()[0]}")
+            continue
+
+        def miss():
+            cache.clear()
+            return builder(*builder_args)
+
+        miss_ms, _ = timed(miss, args.repeat)
+        hit_ms, hit = timed(lambda: builder(*builder_args), args.repeat)
+        payload = built.to_json()
+        from_json_ms, _ = timed(lambda: pio.from_json(payload), args.repeat)
+        encode_ms, _ = timed(lambda: streamlit_encode(hit), args.repeat)
+        assert json.loads(hit.to_json()) == json.loads(payload), f"{name}: cached figure differs from the builder's"
+        print(f"{name:<30} {build_ms:>8.2f} {miss_ms:>8.2f} {hit_ms:>8.2f} {from_json_ms:>10.2f} "
+              f"{encode_ms:>8.2f} {build_ms / max(hit_ms, 1e-9):>7.1f}x")
+
+    stats = cache.stats()
+    print(f"\nCache: {stats['entries']} entries, {stats['bytes'] / 1024:,.0f} KB, hit rate {stats['hit_rate']:.0%}")
+    print("Every cached figure matches its builder's output.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark the vectorized MetricsEngine against the legacy row-by-row loops
+and verify both produce identical numbers.
+
+Usage: python benchmark_metrics_engine.py [rows]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.financial_processor import FinancialProcessor
+from core.metrics_engine import MetricsEngine
+
+
+def legacy_calculate_growth_metrics(df):
+    """Original FinancialProcessor.calculate_growth_metrics implementation"""
+    df = df.sort_values('year').copy()
+    for col in ['revenue', 'variable_costs', 'net_profit']:
+        if col in df.columns:
+            df[f'{col}_growth'] = 0.0
+            for i in range(1, len(df)):
+                prev_val = df[col].iloc[i-1]
+                curr_val = df[col].iloc[i]
+                if pd.isna(prev_val) or pd.isna(curr_val):
+                    df.loc[df.index[i], f'{col}_growth'] = np.nan
+                elif abs(prev_val) < 0.01:
+                    if abs(curr_val) < 0.01:
+                        df.loc[df.index[i], f'{col}_growth'] = 0
+                    else:
+                        df.loc[df.index[i], f'{col}_growth'] = min(1000, abs(curr_val) * 100)
+                else:
+                    growth = ((curr_val - prev_val) / abs(prev_val)) * 100
+                    df.loc[df.index[i], f'{col}_growth'] = max(-100, min(1000, growth))
+    if 'revenue' in df.columns and 'net_profit' in df.columns:
+        df['profit_margin'] = df.apply(
+            lambda row: (row['net_profit'] / row['revenue'] * 100) if row['revenue'] > 0 else 0,
+            axis=1
+        )
+    if 'operational_expenses' in df.columns and 'revenue' in df.columns:
+        df['operational_efficiency'] = (df['operational_expenses'] / df['revenue']) * 100
+    return df
+
+
+def legacy_calculate_cagr(df, metric):
+    """Original FinancialProcessor.calculate_cagr implementation"""
+    if metric not in df.columns or len(df) < 2:
+        return 0
+    df_sorted = df.sort_values('year')
+    start_value = df_sorted[metric].iloc[0]
+    end_value = df_sorted[metric].iloc[-1]
+    years = df_sorted['year'].iloc[-1] - df_sorted['year'].iloc[0]
+    if start_value > 0 and years > 0:
+        return round((pow(end_value / start_value, 1/years) - 1) * 100, 2)
+    return 0
+
+
+def legacy_detect_anomalies(df):
+    """Original FinancialProcessor.detect_anomalies implementation"""
+    anomalies = []
+    for col in [c for c in df.columns if '_growth' in c]:
+        mean_growth = df[col].mean()
+        std_growth = df[col].std()
+        for idx, row in df.iterrows():
+            if pd.notna(row[col]) and abs(row[col] - mean_growth) > 2 * std_growth:
+                anomalies.append({'year': row['year'], 'metric': col, 'value': row[col],
+                                  'type': 'Extreme growth rate'})
+    return anomalies
+
+
+def make_frame(rows, seed=42):
+    """Synthetic consolidated frame including zeros, NaNs and sign changes"""
+    rng = np.random.default_rng(seed)
+    revenue = rng.normal(1_000_000, 400_000, rows)
+    revenue[rng.choice(rows, max(1, rows // 20), replace=False)] = 0
+    net_profit = revenue * rng.uniform(-0.3, 0.3, rows)
+    variable_costs = revenue * rng.uniform(0.2, 0.6, rows)
+    variable_costs[rng.choice(rows, max(1, rows // 25), replace=False)] = np.nan
+    return pd.DataFrame({
+        'year': np.arange(2000, 2000 + rows),
+        'revenue': revenue,
+        'variable_costs': variable_costs,
+        'net_profit': net_profit,
+        'operational_expenses': revenue * 0.1,
+    })
+
+
+def timed(fn, *args, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    df = make_frame(rows)
+    processor = FinancialProcessor()
+    engine = MetricsEngine()
+
+    legacy_time, legacy_df = timed(legacy_calculate_growth_metrics, df)
+    new_time, new_df = timed(processor.calculate_growth_metrics, df)
+    pd.testing.assert_frame_equal(legacy_df, new_df, check_dtype=False)
+    print(f"calculate_growth_metrics: legacy {legacy_time*1000:.1f}ms | vectorized {new_time*1000:.1f}ms "
+          f"| speedup {legacy_time / max(new_time, 1e-9):.1f}x")
+
+    metrics = ['revenue', 'variable_costs', 'net_profit']
+    positive = new_df.copy()
+    positive[metrics] = positive[metrics].abs().fillna(1) + 1
+    legacy_time, legacy_cagr = timed(lambda d: {m: legacy_calculate_cagr(d, m) for m in metrics}, positive)
+    new_time, new_cagr = timed(engine.cagr, positive, metrics)
+    assert legacy_cagr == new_cagr, (legacy_cagr, new_cagr)
+    print(f"calculate_cagr:           legacy {legacy_time*1000:.1f}ms | vectorized {new_time*1000:.1f}ms")
+
+    legacy_time, legacy_anomalies = timed(legacy_detect_anomalies, new_df)
+    new_time, new_anomalies = timed(engine.detect_anomalies, new_df)
+    assert len(legacy_anomalies) == len(new_anomalies)
+    for old, new in zip(legacy_anomalies, new_anomalies):
+        assert old['metric'] == new['metric'] and old['year'] == new['year'] and old['value'] == new['value']
+    print(f"detect_anomalies:         legacy {legacy_time*1000:.1f}ms | vectorized {new_time*1000:.1f}ms "
+          f"| {len(new_anomalies)} anomalies")
+
+    monthly = pd.DataFrame({
+        'year': np.repeat(np.arange(2018, 2025), 12),
+        'month': ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN',
+                  'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ'] * 7,
+    })
+    sample = make_frame(len(monthly))
+    for col in ['revenue', 'variable_costs', 'net_profit']:
+        monthly[col] = sample[col].to_numpy()
+    for granularity in ['monthly', 'quarterly', 'semester', 'annual']:
+        elapsed, result = timed(engine.compute, monthly, None, granularity)
+        print(f"compute[{granularity}]: {elapsed*1000:.1f}ms, {len(result['data'])} periods, "
+              f"CAGR {result['cagr']}")
+
+    print("\nAll results match the legacy implementation.")
+
+
+if __name__ == "__main__":
+    main()
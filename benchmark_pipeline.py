@@ -0,0 +1,310 @@
+"""
+Benchmark the full data path on synthetic workbooks of increasing size and
+check it against a stored baseline.
+
+For every size (line items per section of the synthetic workbook) the
+production path runs in a fresh temporary DATA_PATH:
+- register:        GerenciadorArquivos.registrar_arquivo
+- extraction:      FinancialProcessor.load_excel_files
+- consolidation:   FinancialProcessor.consolidate_all_years
+- monthly:         FinancialProcessor.get_monthly_data
+- auto_save:       DatabaseManager.auto_save_state
+- monthly_persist: the monthly frame of the saved data version, as
+                   publish_analysis / the background rebuild persist it
+- auto_load:       DatabaseManager.auto_load_state into a new session
+- reload:          what app_refactored.py derives on a reload (data version,
+                   processed_data and the persisted monthly frame) with a
+                   cold artifact store
+
+An untimed warm-up run comes first. Time is the best of --repeat runs.
+Peak memory (Python allocations above the stage's starting point, via
+tracemalloc) comes from a separate run so tracing does not inflate the
+timings.
+
+A stage regresses when it is more than --tolerance slower (or uses more
+than --memory-tolerance more memory) than the baseline and the difference
+is above a small absolute floor, so sub-millisecond noise is ignored. The
+baseline is machine specific: refresh it with --update-baseline on the
+machine that runs the comparison.
+
+Usage: python benchmark_pipeline.py [--sizes 10,25,50] [--repeat N] [--baseline PATH]
+                                    [--tolerance F] [--memory-tolerance F] [--update-baseline]
+                                    [--json PATH]
+Exits with status 1 when a stage regresses or the pipeline fails.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, 'benchmark_pipeline_baseline.json')
+
+STAGES = ['register', 'extraction', 'consolidation', 'monthly', 'auto_save',
+          'monthly_persist', 'auto_load', 'reload']
+
+MB = 1024 * 1024
+DEFAULT_SIZES = [10, 25, 50]
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.10
+# Differences below these are noise, whatever the ratio
+TIME_FLOOR_MS = 20
+MEMORY_FLOOR_MB = 1
+
+
+def _run_path(items: int, measure: Callable[[str, Callable[[], Any]], Any]) -> Dict[str, Any]:
+    """Run every stage once in a fresh DATA_PATH; ``measure(stage, fn)`` wraps each stage"""
+    data_dir = tempfile.mkdtemp(prefix='benchmark_pipeline_')
+    os.environ['DATA_PATH'] = data_dir
+    try:
+        from core.analysis_pipeline import build_processed_data
+        from core.artifact_store import get_artifact_store, session_data_version
+        from core.database_manager import DatabaseManager
+        from core.financial_processor import FinancialProcessor
+        from core.gerenciador_arquivos import GerenciadorArquivos
+        from core.monthly_artifact import build_monthly_artifact, get_monthly_artifact
+        from utils.legacy_helpers import convert_extracted_to_processed
+        from utils.synthetic_workbook import write_synthetic_workbook
+
+        source, rows = write_synthetic_workbook(os.path.join(data_dir, 'sintetico_2018_2025.xlsx'), items=items)
+        store = get_artifact_store()
+        store.clear()
+        processor = FinancialProcessor()
+        db = DatabaseManager()
+        gerenciador = GerenciadorArquivos()
+
+        def register():
+            if not gerenciador.registrar_arquivo(source):
+                raise RuntimeError("registration failed")
+            return gerenciador.obter_caminhos_arquivos()
+
+        paths = measure('register', register)
+        excel_data = measure('extraction', lambda: processor.load_excel_files(paths))
+        consolidated, unified_data = measure('consolidation', lambda: processor.consolidate_all_years(excel_data))
+        if consolidated.empty:
+            raise RuntimeError("no data extracted from the synthetic workbook")
+        monthly_df = measure('monthly', lambda: processor.get_monthly_data(excel_data))
+
+        results = {
+            'unified_data': unified_data,
+            'consolidated': processor.calculate_growth_metrics(consolidated),
+            'summary': {},
+            'anomalies': [],
+        }
+        session = SimpleNamespace(
+            user={'username': 'benchmark', 'email': ''},
+            extracted_data=unified_data,
+            processed_data=build_processed_data(results),
+            monthly_data=monthly_df,
+            uploaded_files=[os.path.basename(source)],
+            selected_years=sorted(unified_data),
+            selected_months=[],
+        )
+        measure('auto_save', lambda: db.auto_save_state(session))
+
+        def monthly_persist():
+            published, data_version = db.load_shared_financial_data_versioned()
+            return build_monthly_artifact(db, published, data_version)
+
+        if measure('monthly_persist', monthly_persist) is None:
+            raise RuntimeError("monthly frame could not be derived from the saved data")
+
+        reloaded = SimpleNamespace()
+        if not measure('auto_load', lambda: db.auto_load_state(reloaded)):
+            raise RuntimeError("auto_load_state found no saved data")
+
+        # A new server process: nothing derived in memory yet
+        store.clear()
+
+        def reload():
+            extracted = reloaded.extracted_data
+            version = session_data_version(reloaded)
+            processed = store.get_or_compute('processed_data', version,
+                                             lambda: convert_extracted_to_processed(extracted))
+            monthly = get_monthly_artifact(db, extracted, version, requested_by='benchmark')
+            if not processed or monthly is None:
+                raise RuntimeError("reload did not find the derived data")
+            return monthly
+
+        monthly = measure('reload', reload)
+        return {'rows_per_sheet': rows, 'years': len(unified_data), 'monthly_rows': len(monthly),
+                'workbook_kb': os.path.getsize(source) // 1024}
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def time_stages(items: int, repeat: int) -> Dict[str, Any]:
+    """Best wall-clock ms per stage over ``repeat`` runs"""
+    best: Dict[str, float] = {}
+    info: Dict[str, Any] = {}
+
+    def measure(stage, fn):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best[stage] = min(best.get(stage, float('inf')), elapsed)
+        return result
+
+    for _ in range(repeat):
+        info = _run_path(items, measure)
+    return {'time_ms': {stage: round(best[stage], 1) for stage in STAGES}, **info}
+
+
+def memory_stages(items: int) -> Dict[str, float]:
+    """Peak MB allocated by each stage above what was live when it started"""
+    peaks: Dict[str, float] = {}
+
+    def measure(stage, fn):
+        gc.collect()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks[stage] = round((peak - start) / MB, 2)
+        return result
+
+    tracemalloc.start()
+    try:
+        _run_path(items, measure)
+    finally:
+        tracemalloc.stop()
+    return {stage: peaks[stage] for stage in STAGES}
+
+
+def run_benchmark(sizes: List[int], repeat: int) -> Dict[str, Any]:
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}",
+        'repeat': repeat,
+        'sizes': {},
+    }
+    # Imports and first-use initialisation are not part of any stage
+    _run_path(min(sizes), lambda stage, fn: fn())
+    for items in sizes:
+        result = time_stages(items, repeat)
+        result['peak_mb'] = memory_stages(items)
+        report['sizes'][str(items)] = result
+    return report
+
+
+def _regressed(current: float, baseline: Optional[float], tolerance: float, floor: float) -> bool:
+    if baseline is None:
+        return False
+    return current > baseline * (1 + tolerance) and current - baseline > floor
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            memory_tolerance: float) -> List[str]:
+    """Regression messages of ``report`` against ``baseline`` (empty when none)"""
+    regressions = []
+    for size, result in report['sizes'].items():
+        base = baseline.get('sizes', {}).get(size)
+        if base is None:
+            continue
+        for stage in STAGES:
+            current_ms = result['time_ms'][stage]
+            base_ms = base.get('time_ms', {}).get(stage)
+            if _regressed(current_ms, base_ms, tolerance, TIME_FLOOR_MS):
+                regressions.append(f"items={size} {stage}: {current_ms:,.1f} ms vs baseline {base_ms:,.1f} ms "
+                                   f"(+{(current_ms / base_ms - 1) * 100:.0f}%)")
+            current_mb = result['peak_mb'][stage]
+            base_mb = base.get('peak_mb', {}).get(stage)
+            if _regressed(current_mb, base_mb, memory_tolerance, MEMORY_FLOOR_MB):
+                regressions.append(f"items={size} {stage}: {current_mb:,.2f} MB vs baseline {base_mb:,.2f} MB "
+                                   f"(+{(current_mb / base_mb - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _delta(current: float, baseline: Optional[float]) -> str:
+    if not baseline:
+        return '-'
+    return f"{(current / baseline - 1) * 100:+.0f}%"
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"Python {report['python']} on {report['machine']}, best of {report['repeat']} run(s)")
+    for size, result in report['sizes'].items():
+        base = (baseline or {}).get('sizes', {}).get(size, {})
+        print(f"\n=== items={size}: {result['years']} years, {result['rows_per_sheet']} rows per sheet, "
+              f"{result['workbook_kb']:,} KB, {result['monthly_rows']} monthly rows")
+        print(f"{'stage':<16} {'ms':>10} {'base ms':>10} {'Δ':>6} {'peak MB':>9} {'base MB':>9} {'Δ':>6}")
+        for stage in STAGES:
+            current_ms = result['time_ms'][stage]
+            current_mb = result['peak_mb'][stage]
+            base_ms = base.get('time_ms', {}).get(stage)
+            base_mb = base.get('peak_mb', {}).get(stage)
+            print(f"{stage:<16} {current_ms:>10,.1f} {'-' if base_ms is None else f'{base_ms:,.1f}':>10} "
+                  f"{_delta(current_ms, base_ms):>6} {current_mb:>9,.2f} "
+                  f"{'-' if base_mb is None else f'{base_mb:,.2f}':>9} {_delta(current_mb, base_mb):>6}")
+        total_ms = sum(result['time_ms'].values())
+        print(f"{'total':<16} {total_ms:>10,.1f}")
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated line items per section of the synthetic workbooks")
+    parser.add_argument('--repeat', type=int, default=3, help="timing runs per size (best is kept)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown per stage as a fraction of the baseline")
+    parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_MEMORY_TOLERANCE,
+                        help="allowed peak memory growth per stage as a fraction of the baseline")
+    parser.add_argument('--update-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_ROOT)
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    baseline = load_baseline(args.baseline)
+
+    try:
+        report = run_benchmark(sizes, max(1, args.repeat))
+    except Exception as e:
+        print(f"❌ Pipeline failed: {e}")
+        sys.exit(1)
+
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    regressions = compare(report, baseline, args.tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond the tolerance:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == '__main__':
+    main()
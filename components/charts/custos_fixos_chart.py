@@ -5,8 +5,10 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 from typing import Optional
+from utils.tracing import traced
 
 
+@traced()
 def create_custos_fixos_chart(
     display_df: pd.DataFrame,
     view_type: str = "Anual", 
@@ -4,8 +4,10 @@ Gráfico de Custos Variáveis (Variable Costs Chart)
 import plotly.graph_objects as go
 import pandas as pd
 from typing import Optional, List
+from utils.tracing import traced
 
 
+@traced()
 def create_custos_variaveis_chart(
     display_df: pd.DataFrame,
     view_type: str = "Anual",
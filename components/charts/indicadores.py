@@ -4,6 +4,7 @@ Indicadores KPI (Key Performance Indicators)
 import streamlit as st
 import pandas as pd
 from typing import Optional, Dict, Any
+from utils.tracing import traced
 
 
 def format_currency(value: float) -> str:
@@ -16,6 +17,7 @@ def format_percentage(value: float) -> str:
     return f"{value:.1f}%"
 
 
+@traced()
 def create_kpi_indicators(
     current_data: pd.DataFrame,
     previous_data: Optional[pd.DataFrame] = None,
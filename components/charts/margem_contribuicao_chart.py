@@ -4,8 +4,10 @@ Gráfico de Margem de Contribuição (Contribution Margin Chart)
 import plotly.graph_objects as go
 import pandas as pd
 from typing import Optional
+from utils.tracing import traced
 
 
+@traced()
 def create_margem_contribuicao_chart(
     display_df: pd.DataFrame,
     view_type: str = "Anual",
@@ -6,6 +6,9 @@ import plotly.graph_objects as go
 import pandas as pd
 from typing import Optional, Tuple
 
+from visualizations.figure_cache import cached_figure
+from utils.tracing import traced
+
 
 def prepare_x_axis(df: pd.DataFrame, view_type: str) -> Tuple[str, str]:
     """Prepare x-axis column and title based on view type"""
@@ -19,6 +22,8 @@ def prepare_x_axis(df: pd.DataFrame, view_type: str) -> Tuple[str, str]:
         return 'year', 'Ano'
 
 
+@cached_figure
+@traced()
 def create_receita_chart(
     display_df: pd.DataFrame, 
     view_type: str = "Anual",
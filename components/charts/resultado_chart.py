@@ -5,7 +5,12 @@ import plotly.graph_objects as go
 import pandas as pd
 from typing import Optional
 
+from visualizations.figure_cache import cached_figure
+from utils.tracing import traced
 
+
+@cached_figure
+@traced()
 def create_resultado_chart(
     display_df: pd.DataFrame,
     view_type: str = "Anual",
@@ -1,10 +1,28 @@
 # Core module for Marine Seguros Financial Analytics
-from .financial_processor import FinancialProcessor
-from .database_manager import DatabaseManager
-from .gerenciador_arquivos import GerenciadorArquivos
+# Submodules are imported on first attribute access so that importing a single
+# module (e.g. core.database_manager on the login page) stays cheap.
+from utils.lazy_import import lazy_exports
 
-__all__ = [
-    'FinancialProcessor',
-    'DatabaseManager',
-    'GerenciadorArquivos',
-]
\ No newline at end of file
+_EXPORTS = {
+    'FinancialProcessor': '.financial_processor',
+    'DatabaseManager': '.database_manager',
+    'GerenciadorArquivos': '.gerenciador_arquivos',
+    'ArtifactStore': '.artifact_store',
+    'get_artifact_store': '.artifact_store',
+    'compute_data_version': '.artifact_store',
+    'frame_fingerprint': '.artifact_store',
+    'PeriodCube': '.period_cube',
+    'get_period_cube': '.period_cube',
+    'run_analysis_pipeline': '.analysis_pipeline',
+    'publish_analysis': '.analysis_pipeline',
+    'JobRunner': '.jobs',
+    'get_job_runner': '.jobs',
+    'get_monthly_artifact': '.monthly_artifact',
+    'build_monthly_artifact': '.monthly_artifact',
+    'generate_insights_report': '.insights_report',
+    'run_insights_report': '.insights_report',
+}
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = list(_EXPORTS)
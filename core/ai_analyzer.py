@@ -2,8 +2,9 @@
 This module is responsible for interacting with the Generative AI model 
 to get insights from the financial data.
 """
-import google.generativeai as genai
 import pandas as pd
+from ai.models.registry import get_model_client
+from ai.utils.context_builder import build_line_item_context
 
 class AIAnalyzer:
     """
@@ -19,8 +20,7 @@ class AIAnalyzer:
         """
         self.api_key = api_key
         self.language = language
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = get_model_client(self.api_key, 'gemini-1.5-flash')
 
     def _get_prompt_language(self):
         """
@@ -30,21 +30,24 @@ class AIAnalyzer:
             return "Please provide the analysis in English."
         return "Por favor, forneça a análise em português do Brasil."
 
-    def generate_micro_analysis_insights(self, df: pd.DataFrame):
+    def build_micro_analysis_prompt(self, df: pd.DataFrame, value_column: str = 'Valor Anual',
+                                    group_column: str = 'Categoria Principal') -> str:
         """
-        Generates insights from the micro-level data.
+        Builds the micro-level analysis prompt.
 
         Args:
             df (pd.DataFrame): The DataFrame containing the detailed line items.
+            value_column (str): Column with the item values, used to rank items.
+            group_column (str): Column used to aggregate the items left out of the budget.
 
         Returns:
-            str: The AI-generated insights.
+            str: The prompt sent to the model.
         """
-        if df.empty:
-            return "Não há dados para analisar."
-
-        # Convert DataFrame to a more readable format for the AI
-        data_string = df.to_string()
+        # Ranked items within the token budget; smaller items aggregated per category
+        if value_column in df.columns:
+            data_string = build_line_item_context(df, value_column, group_column)
+        else:
+            data_string = df.to_string()
 
         prompt = f"""
         {self._get_prompt_language()}
@@ -52,7 +55,7 @@ class AIAnalyzer:
         Contexto: Você é um analista financeiro especialista em contabilidade e análise de resultados.
         Sua tarefa é analisar os dados de despesas detalhadas de uma empresa e fornecer insights valiosos.
 
-        Os dados a seguir representam uma lista de despesas e custos, com suas respectivas categorias, subcategorias e valores anuais.
+        Os dados a seguir representam uma lista de despesas e custos, com suas respectivas categorias, subcategorias e valores anuais, ordenados por valor. Os itens menores aparecem agregados por categoria.
 
         Dados:
         {data_string}
@@ -64,10 +67,77 @@ class AIAnalyzer:
 
         Apresente a resposta de forma clara e organizada.
         """
+        return prompt
+
+    def build_category_analysis_prompt(self, df: pd.DataFrame, category: str,
+                                       value_column: str = 'Valor Anual',
+                                       group_column: str = 'Subcategoria') -> str:
+        """
+        Builds the deep-dive prompt for the line items of a single category.
+
+        Args:
+            df (pd.DataFrame): The line items of the category.
+            category (str): Name of the category, used in the prompt.
+            value_column (str): Column with the item values, used to rank items.
+            group_column (str): Column used to aggregate the items left out of the budget.
+
+        Returns:
+            str: The prompt sent to the model.
+        """
+        if value_column in df.columns:
+            data_string = build_line_item_context(df, value_column, group_column)
+        else:
+            data_string = df.to_string()
+
+        prompt = f"""
+        {self._get_prompt_language()}
+
+        Contexto: Você é um analista financeiro especialista em contabilidade e análise de resultados.
+        Sua tarefa é analisar em profundidade as despesas da categoria "{category}" de uma empresa.
+
+        Os dados a seguir listam os itens desta categoria, com subcategorias, descrições e valores anuais, ordenados por valor. Os itens menores aparecem agregados por subcategoria.
+
+        Dados:
+        {data_string}
+
+        Por favor, forneça de forma concisa:
+        1.  **Composição:** Quais subcategorias e itens concentram o valor da categoria.
+        2.  **Evolução:** Variações relevantes entre os anos, quando houver mais de um ano.
+        3.  **Ações:** 1 a 2 oportunidades concretas de redução ou controle de custos nesta categoria.
+        """
+        return prompt
+
+    def generate_micro_analysis_insights(self, df: pd.DataFrame, data_version: str = None):
+        """
+        Generates insights from the micro-level data.
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing the detailed line items.
+            data_version (str): Version of the source data, part of the response cache key.
+
+        Returns:
+            str: The AI-generated insights.
+        """
+        if df.empty:
+            return "Não há dados para analisar."
+
+        prompt = self.build_micro_analysis_prompt(df)
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(prompt, data_version=data_version)
             return response.text
         except Exception as e:
             return f"Ocorreu um erro ao gerar os insights: {e}"
 
+    def stream_micro_analysis_insights(self, df: pd.DataFrame, data_version: str = None):
+        """
+        Streams insights from the micro-level data as they are generated.
+
+        Args:
+            df (pd.DataFrame): The DataFrame containing the detailed line items.
+            data_version (str): Version of the source data, part of the response cache key.
+
+        Returns:
+            StreamingResponse: Iterable of text chunks (see ai.models.client).
+        """
+        return self.model.stream_content(self.build_micro_analysis_prompt(df), data_version=data_version)
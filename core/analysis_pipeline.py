@@ -0,0 +1,115 @@
+"""
+Financial analysis pipeline
+The "Analisar Dados Financeiros" flow as plain functions (no Streamlit
+state), so it can run in the UI thread, a background job or a script:
+``run_analysis_pipeline`` processes the files and ``publish_analysis``
+shares the results with every session.
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from core.financial_processor import FinancialProcessor
+from utils.tracing import traced
+
+
+# (stage, percent at the start of the stage)
+PIPELINE_STAGES = [
+    ('extraction', 0),
+    ('consolidation', 40),
+    ('growth_metrics', 60),
+    ('monthly', 65),
+    ('anomalies', 80),
+    ('publish', 85),
+]
+_STAGE_PERCENT = dict(PIPELINE_STAGES)
+
+
+class PipelineError(Exception):
+    """Raised when the pipeline cannot produce usable data"""
+
+
+@traced()
+def run_analysis_pipeline(file_paths: List[str], show_anomalies: bool = True,
+                          progress: Optional[Callable[[str, float, str], None]] = None) -> Dict:
+    """Run extraction → consolidation → growth → monthly → anomalies
+
+    Args:
+        file_paths: Excel files to process
+        show_anomalies: Whether to run anomaly detection
+        progress: Optional callback(stage, percent, message)
+
+    Returns:
+        Dict with unified_data, consolidated, summary, anomalies and monthly_data
+    """
+    def report(stage, message):
+        if progress:
+            progress(stage, _STAGE_PERCENT[stage], message)
+
+    processor = FinancialProcessor()
+
+    report('extraction', f"Lendo {len(file_paths)} arquivo(s) Excel...")
+    excel_data = processor.load_excel_files(file_paths)
+
+    report('consolidation', "Consolidando anos...")
+    consolidated_df, unified_data = processor.consolidate_all_years(excel_data)
+    if consolidated_df.empty:
+        raise PipelineError("Não foi possível extrair dados dos arquivos Excel.")
+
+    report('growth_metrics', "Calculando métricas de crescimento...")
+    consolidated_df = processor.calculate_growth_metrics(consolidated_df)
+    summary = processor.get_financial_summary(consolidated_df)
+
+    report('monthly', "Gerando dados mensais...")
+    monthly_df = processor.get_monthly_data(excel_data)
+
+    report('anomalies', "Detectando anomalias...")
+    anomalies = processor.detect_anomalies(consolidated_df) if show_anomalies else []
+
+    return {
+        'unified_data': unified_data,
+        'consolidated': consolidated_df,
+        'summary': summary,
+        'anomalies': anomalies,
+        'monthly_data': monthly_df,
+    }
+
+
+def build_processed_data(results: Dict) -> Dict:
+    """processed_data dict as stored in session state / analysis cache"""
+    return {
+        'raw_data': results['unified_data'],
+        'consolidated': results['consolidated'],
+        'summary': results['summary'],
+        'anomalies': results['anomalies']
+    }
+
+
+@traced()
+def publish_analysis(db, results: Dict, username: str = 'System', email: str = '',
+                     file_names: Optional[List[str]] = None,
+                     progress: Optional[Callable[[str, float, str], None]] = None) -> Dict:
+    """Publish pipeline results atomically and persist the monthly frame of the new data version
+
+    Adds ``published_data`` and ``data_version`` to ``results`` (and replaces
+    ``monthly_data`` with the persisted frame) and returns it.
+    """
+    from core.monthly_artifact import build_monthly_artifact
+
+    cache_data = {
+        'processed_data': build_processed_data(results),
+        'monthly_data': results['monthly_data']
+    }
+    if not db.publish_analysis_results(results['unified_data'], cache_data, username, email, file_names):
+        raise PipelineError("Erro ao salvar no banco de dados")
+
+    # Persist the monthly frame for the data version every session will load,
+    # so dashboards read it instead of deriving it during render
+    if progress:
+        progress('publish', 95, "Gerando dados mensais compartilhados...")
+    published_data, data_version = db.load_shared_financial_data_versioned()
+    monthly_df = build_monthly_artifact(db, published_data, data_version)
+    if monthly_df is not None:
+        results['monthly_data'] = monthly_df
+    results['published_data'] = published_data
+    results['data_version'] = data_version
+    return results
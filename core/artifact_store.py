@@ -0,0 +1,292 @@
+"""
+Process-wide store for derived analytics artifacts
+
+Artifacts (consolidated frame, monthly frame, group hierarchy output...) are
+keyed by (artifact name, input data version, parameters). The first session
+that needs an artifact computes it; every other session reuses the same result.
+Entries are treated as immutable and evicted in LRU order once the configured
+byte budget is exceeded.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.tracing import span
+
+
+DEFAULT_MAX_BYTES = int(os.environ.get('ARTIFACT_STORE_MAX_MB', '256')) * 1024 * 1024
+
+
+def _canonical(obj: Any) -> Any:
+    """Convert an object into a JSON-friendly structure with deterministic ordering"""
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple, set)):
+        items = [_canonical(v) for v in obj]
+        return sorted(items, key=str) if isinstance(obj, set) else items
+    if isinstance(obj, pd.DataFrame):
+        return {'__dataframe__': obj.to_dict('split')}
+    if isinstance(obj, pd.Series):
+        return {'__series__': obj.to_dict()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, float) and obj != obj:
+        return 'NaN'
+    return obj
+
+
+def compute_data_version(data: Any) -> Optional[str]:
+    """Return a short content hash identifying a version of the input data"""
+    if data is None:
+        return None
+    try:
+        payload = json.dumps(_canonical(data), sort_keys=True, default=str)
+    except Exception as e:
+        print(f"Error computing data version: {e}")
+        return None
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def session_data_version(session_state) -> Optional[str]:
+    """Data version of ``session_state.extracted_data`` without rehashing it on every rerun
+
+    ``data_version_source`` is the exact dict ``data_version`` describes:
+    auto_load_state sets both from the version stored with the shared data,
+    and any other extracted_data is hashed once and remembered the same way.
+    """
+    extracted = getattr(session_state, 'extracted_data', None)
+    if not extracted:
+        return None
+    if (getattr(session_state, 'data_version_source', None) is not extracted
+            or not getattr(session_state, 'data_version', None)):
+        session_state.data_version = compute_data_version(extracted)
+        session_state.data_version_source = extracted
+    return session_state.data_version
+
+
+def frame_fingerprint(df: Optional[pd.DataFrame]) -> Optional[str]:
+    """Cheap content hash for a DataFrame (values, index and column names)"""
+    if df is None:
+        return None
+    try:
+        hasher = hashlib.sha1()
+        hasher.update(str(list(df.columns)).encode('utf-8'))
+        hasher.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        return hasher.hexdigest()[:16]
+    except Exception:
+        return compute_data_version(df)
+
+
+def params_key(params: Any) -> str:
+    """Normalize artifact parameters into a hashable string"""
+    if params is None:
+        return ''
+    return json.dumps(_canonical(params), sort_keys=True, default=str)
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Estimate the memory footprint of an object in bytes"""
+    if _seen is None:
+        _seen = set()
+    obj_id = id(obj)
+    if obj_id in _seen:
+        return 0
+    _seen.add(obj_id)
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key, _seen) + estimate_size(value, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item, _seen)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        size += estimate_size(vars(obj), _seen)
+    elif hasattr(obj, '__slots__') and not isinstance(obj, type):
+        for slot in obj.__slots__:
+            size += estimate_size(getattr(obj, slot, None), _seen)
+    return size
+
+
+def _detach(value: Any) -> Any:
+    """Hand out a copy-safe view of a stored artifact
+
+    DataFrames are copied (cheap compared to recomputing them) so callers that
+    add columns cannot corrupt the shared entry. Dicts are shallow-copied with
+    the same treatment applied to their DataFrame values.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: (v.copy() if isinstance(v, (pd.DataFrame, pd.Series)) else v) for k, v in value.items()}
+    return value
+
+
+class ArtifactStore:
+    """Thread-safe LRU cache of derived artifacts bounded by byte size"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple[str, Optional[str], str], Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(name: str, data_version: Optional[str], params: Any = None) -> Tuple[str, Optional[str], str]:
+        """Build the cache key for an artifact"""
+        return (name, data_version, params_key(params))
+
+    def get(self, name: str, data_version: Optional[str], params: Any = None, default: Any = None) -> Any:
+        """Return a stored artifact or ``default`` when it is not cached"""
+        key = self.make_key(name, data_version, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _detach(entry[0])
+
+    def put(self, name: str, data_version: Optional[str], value: Any, params: Any = None) -> None:
+        """Store an artifact, evicting least recently used entries if needed"""
+        key = self.make_key(name, data_version, params)
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                # Too large to cache at all; caller keeps its own copy
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+
+    def get_or_compute(self, name: str, data_version: Optional[str], compute_fn: Callable[[], Any],
+                       params: Any = None) -> Any:
+        """Return a cached artifact, computing and storing it on first use
+
+        Concurrent requests for the same key wait for the first computation
+        instead of repeating it. Results that are ``None`` are not cached.
+        """
+        if data_version is None:
+            return compute_fn()
+
+        key = self.make_key(name, data_version, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _detach(entry[0])
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _detach(entry[0])
+                self.misses += 1
+
+            try:
+                with span(f"artifact.{name}"):
+                    value = compute_fn()
+                if value is not None:
+                    self.put(name, data_version, value, params)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return _detach(value)
+
+    def invalidate(self, name: Optional[str] = None, data_version: Optional[str] = None) -> int:
+        """Drop entries matching the given name and/or data version"""
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if (name is None or key[0] == name) and (data_version is None or key[1] == data_version)
+            ]
+            for key in keys:
+                self.current_bytes -= self._entries.pop(key)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def shared_object_ids(self) -> set:
+        """ids of the objects callers receive by reference rather than as a copy
+
+        That is every stored value ``_detach`` returns as is, and the values
+        (other than DataFrames) of stored dicts, which their shallow copies share.
+        """
+        with self._lock:
+            values = [entry[0] for entry in self._entries.values()]
+        # Copies, and scalars that may be interned and so shared with anything
+        unshared = (pd.DataFrame, pd.Series, str, bytes, int, float, type(None))
+        ids = set()
+        for value in values:
+            if isinstance(value, dict):
+                ids.update(id(v) for v in value.values() if not isinstance(v, unshared))
+            elif not isinstance(value, unshared):
+                ids.add(id(value))
+        return ids
+
+    def stats(self) -> Dict[str, Any]:
+        """Return usage statistics for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _evict(self) -> None:
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+
+_artifact_store: Optional[ArtifactStore] = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Return the process-wide artifact store shared by all sessions"""
+    global _artifact_store
+    if _artifact_store is None:
+        with _artifact_store_lock:
+            if _artifact_store is None:
+                _artifact_store = ArtifactStore()
+    return _artifact_store
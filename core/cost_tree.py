@@ -0,0 +1,109 @@
+"""
+Cost drill-down tree
+Prebuilt hierarchy main category → subcategory → item → sub-item with
+per-node totals by year and month, so drill-down, breadcrumbs and detail
+tables are lookups over a node's children instead of re-aggregations.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+MONTHS = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN',
+          'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+
+LEVELS = ['root', 'main_category', 'subcategory', 'item', 'sub_item']
+
+
+class CostTreeNode:
+    """Node with totals by year/month and ordered children"""
+
+    __slots__ = ('key', 'name', 'level', 'source', 'years', 'months', 'total',
+                 'item_count', 'children', '_level_data')
+
+    def __init__(self, key: str, name: str, level: str, source: Optional[str] = None):
+        self.key = key
+        self.name = name
+        self.level = level
+        self.source = source
+        self.years: Dict = {}
+        self.months: Dict = {}
+        self.total = 0
+        self.item_count = 0
+        self.children: 'OrderedDict[str, CostTreeNode]' = OrderedDict()
+        self._level_data = None
+
+    def child(self, key: str, name: str, level: str, source: Optional[str] = None) -> 'CostTreeNode':
+        node = self.children.get(key)
+        if node is None:
+            node = CostTreeNode(key, name, level, source)
+            self.children[key] = node
+        return node
+
+    def add(self, year, value: float, monthly: Optional[Dict[str, float]] = None) -> None:
+        self.years[year] = self.years.get(year, 0) + value
+        self.total += value
+        if monthly:
+            year_months = self.months.setdefault(year, {})
+            for month, month_value in monthly.items():
+                year_months[month] = year_months.get(month, 0) + month_value
+
+    def find(self, path: List[str]) -> Optional['CostTreeNode']:
+        """Follow a path of child keys; None if any step is missing"""
+        node = self
+        for key in path:
+            node = node.children.get(key)
+            if node is None:
+                return None
+        return node
+
+    def level_data(self) -> Dict[str, Dict]:
+        """Children as {key: {name, years, months, total, item_count, source}}"""
+        if self._level_data is None:
+            self._level_data = {
+                key: {
+                    'name': child.name,
+                    'years': child.years,
+                    'months': child.months,
+                    'total': child.total,
+                    'item_count': child.item_count,
+                    'source': child.source,
+                    'has_children': bool(child.children)
+                }
+                for key, child in self.children.items()
+            }
+        return self._level_data
+
+
+def build_cost_tree(categorized_data: Dict) -> CostTreeNode:
+    """Build the tree from {year: {'categories': {main: {name, subcategories: {sub: {name, items}}}}}}
+
+    Items carrying a 'parent_label' (line items split by provider) become
+    children of a single item node named after the parent line item.
+    """
+    root = CostTreeNode('root', 'Custos', 'root')
+
+    for year, year_data in categorized_data.items():
+        for main_key, cat_data in year_data.get('categories', {}).items():
+            main_node = root.child(main_key, cat_data['name'], 'main_category')
+            for sub_key, sub_data in cat_data.get('subcategories', {}).items():
+                sub_node = main_node.child(sub_key, sub_data['name'], 'subcategory')
+                for item in sub_data.get('items', []):
+                    value = item['value']
+                    monthly = item.get('monthly')
+                    parent_label = item.get('parent_label')
+
+                    if parent_label:
+                        item_node = sub_node.child(parent_label, parent_label, 'item', item['source_category'])
+                        provider = item.get('provider') or item['label']
+                        leaf = item_node.child(provider, provider, 'sub_item', item['source_category'])
+                        path_nodes = (root, main_node, sub_node, item_node, leaf)
+                    else:
+                        leaf = sub_node.child(item['label'], item['label'], 'item', item['source_category'])
+                        path_nodes = (root, main_node, sub_node, leaf)
+
+                    for node in path_nodes:
+                        node.add(year, value, monthly)
+                        node.item_count += 1
+
+    return root
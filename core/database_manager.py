@@ -1,11 +1,16 @@
 import sqlite3
+from io import StringIO
 import json
 import os
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import streamlit as st
 from pathlib import Path
-import pandas as pd
+
+from utils.lazy_import import lazy_module
+from utils.tracing import traced
+
+pd = lazy_module('pandas')
 
 class DatabaseManager:
     """SQLite-based persistence for dashboard data"""
@@ -102,6 +107,85 @@ class DatabaseManager:
                 )
             """)
             
+            # Table for background jobs (analysis pipeline runs)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    job_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    percent REAL DEFAULT 0,
+                    message TEXT,
+                    timings TEXT,
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_by TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """)
+            
+            # Content version of shared_financial_data, computed once per write:
+            # writers bump the revision and clear the version, the first reader
+            # of the new data stores it again
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS shared_data_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    revision INTEGER NOT NULL,
+                    version TEXT
+                )
+            """)
+            
+            # Table for derived artifacts persisted per data version (e.g. monthly frame)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS derived_artifacts (
+                    name TEXT NOT NULL,
+                    data_version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (name, data_version)
+                )
+            """)
+            
+            # Table for cached AI model responses
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ai_response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    data_version TEXT,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    hits INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_hit_at TIMESTAMP
+                )
+            """)
+            
+            # Table for chat messages spilled out of the in-memory session history
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (session_id, seq)
+                )
+            """)
+            
+            # Table for combined AI insights reports, tagged with the data version
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS insights_reports (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_version TEXT,
+                    report TEXT NOT NULL,
+                    created_by TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
             conn.commit()
     
     def save_shared_financial_data(self, year: str, data: Dict[str, Any], username: str = None) -> bool:
@@ -118,6 +202,7 @@ class DatabaseManager:
                     (year, data, uploaded_by, updated_at) 
                     VALUES (?, ?, ?, CURRENT_TIMESTAMP)
                 """, (str(year), data_json, username))
+                self._invalidate_data_version(cursor)
                 conn.commit()
                 return True
         except Exception as e:
@@ -298,6 +383,7 @@ class DatabaseManager:
         
         return True
     
+    @traced()
     def load_shared_financial_data(self) -> Dict[str, Any]:
         """Load all shared financial data accessible by all users"""
         try:
@@ -307,27 +393,85 @@ class DatabaseManager:
                     SELECT year, data FROM shared_financial_data 
                     ORDER BY year
                 """)
-                
-                financial_data = {}
-                for row in cursor.fetchall():
-                    year = row[0]
-                    data = json.loads(row[1])
-                    
-                    # Ensure year is an integer if it's a valid year
-                    try:
-                        year_int = int(year)
-                        if 2000 <= year_int <= 2100:
-                            financial_data[year_int] = data
-                        else:
-                            financial_data[year] = data
-                    except ValueError:
-                        financial_data[year] = data
-                
-                return financial_data
+                return self._rows_to_financial_data(cursor.fetchall())
         except Exception as e:
             print(f"Error loading shared financial data: {e}")
             return {}
     
+    def load_shared_financial_data_versioned(self) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Shared financial data and its content version, read in one transaction
+        
+        The version is hashed only by the first reader after a write and stored
+        for everyone else, so reruns do not hash the whole data set again.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                cursor.execute("SELECT revision, version FROM shared_data_version WHERE id = 1")
+                state = cursor.fetchone()
+                cursor.execute("""
+                    SELECT year, data FROM shared_financial_data 
+                    ORDER BY year
+                """)
+                rows = cursor.fetchall()
+                conn.commit()
+            financial_data = self._rows_to_financial_data(rows)
+        except Exception as e:
+            print(f"Error loading shared financial data: {e}")
+            return {}, None
+        
+        revision, version = state or (0, None)
+        if financial_data and not version:
+            from core.artifact_store import compute_data_version
+            version = compute_data_version(financial_data)
+            self._store_data_version(revision if state else None, version)
+        return financial_data, version
+    
+    def _rows_to_financial_data(self, rows) -> Dict[str, Any]:
+        financial_data = {}
+        for row in rows:
+            year = row[0]
+            data = json.loads(row[1])
+            
+            # Ensure year is an integer if it's a valid year
+            try:
+                year_int = int(year)
+                if 2000 <= year_int <= 2100:
+                    financial_data[year_int] = data
+                else:
+                    financial_data[year] = data
+            except ValueError:
+                financial_data[year] = data
+        return financial_data
+    
+    def _invalidate_data_version(self, cursor) -> None:
+        """Mark the shared data as changed (call inside the writing transaction)"""
+        cursor.execute("""
+            INSERT INTO shared_data_version (id, revision, version) VALUES (1, 1, NULL)
+            ON CONFLICT(id) DO UPDATE SET revision = revision + 1, version = NULL
+        """)
+    
+    def _store_data_version(self, revision: Optional[int], version: Optional[str]) -> None:
+        """Record the version computed for ``revision`` unless a write happened since"""
+        if not version:
+            return
+        try:
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                if revision is None:
+                    cursor.execute("""
+                        INSERT OR IGNORE INTO shared_data_version (id, revision, version) VALUES (1, 0, ?)
+                    """, (version,))
+                else:
+                    cursor.execute("""
+                        UPDATE shared_data_version SET version = ?
+                        WHERE id = 1 AND revision = ? AND version IS NULL
+                    """, (version, revision))
+                conn.commit()
+        except Exception as e:
+            print(f"Error storing data version: {e}")
+    
     def save_upload_history(self, username: str, email: str, files: List[str], upload_type: str = "financial_data") -> bool:
         """Save upload history for tracking who uploaded what"""
         try:
@@ -623,6 +767,7 @@ class DatabaseManager:
                 cursor.execute("DELETE FROM user_preferences")
                 cursor.execute("DELETE FROM shared_financial_data")
                 cursor.execute("DELETE FROM upload_history")
+                self._invalidate_data_version(cursor)
                 
                 conn.commit()
                 return True
@@ -665,6 +810,7 @@ class DatabaseManager:
             st.error(f"Error getting data stats: {str(e)}")
             return {}
     
+    @traced()
     def auto_save_state(self, session_state) -> None:
         """Automatically save all relevant session state data to shared storage"""
         try:
@@ -748,16 +894,20 @@ class DatabaseManager:
             import traceback
             traceback.print_exc()
     
+    @traced()
     def auto_load_state(self, session_state) -> bool:
         """Automatically load all saved data into session state"""
         try:
             data_loaded = False
             
             # Load shared financial data - ALWAYS overwrite if data exists in DB
-            financial_data = self.load_shared_financial_data()
+            financial_data, data_version = self.load_shared_financial_data_versioned()
             if financial_data:
                 # Force overwrite even if session_state has empty dict
                 session_state.extracted_data = financial_data
+                # The version describes exactly this dict (see session_data_version)
+                session_state.data_version = data_version
+                session_state.data_version_source = financial_data
                 data_loaded = True
                 pass  # Loaded shared financial data
             
@@ -915,4 +1065,354 @@ class DatabaseManager:
                 return cursor.rowcount > 0
         except Exception as e:
             print(f"Error deleting file {file_id} from database: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def publish_analysis_results(self, extracted_data: Dict[str, Any], cache_data: Dict[str, Any],
+                                 username: str = None, email: str = '', files: List[str] = None) -> bool:
+        """Publish a finished analysis to shared storage in a single transaction
+        
+        Readers either see the previous data set or the complete new one, never
+        a mix of years from different runs.
+        """
+        try:
+            year_rows = [
+                (str(year), json.dumps(self._serialize_for_json(data), ensure_ascii=False), username)
+                for year, data in extracted_data.items()
+            ]
+            cache_json = json.dumps(self._serialize_for_json(cache_data), ensure_ascii=False) if cache_data else None
+            
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO shared_financial_data 
+                    (year, data, uploaded_by, updated_at) 
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                """, year_rows)
+                
+                cursor.execute("DELETE FROM filter_state")
+                cursor.execute("DELETE FROM analysis_cache")
+                if cache_json:
+                    cursor.execute("""
+                        INSERT INTO analysis_cache (id, analysis_data, updated_at)
+                        VALUES (1, ?, CURRENT_TIMESTAMP)
+                    """, (cache_json,))
+                
+                if files and year_rows:
+                    cursor.execute("""
+                        INSERT INTO upload_history 
+                        (username, email, files, upload_type) 
+                        VALUES (?, ?, ?, ?)
+                    """, (username or 'System', email, json.dumps(files, ensure_ascii=False), "financial_data"))
+                self._invalidate_data_version(cursor)
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error publishing analysis results: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+    
+    def create_job(self, job_id: str, job_type: str, created_by: str = None, params: Dict[str, Any] = None) -> bool:
+        """Create a job record in 'queued' status"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO jobs (id, job_type, status, percent, params, created_by)
+                    VALUES (?, ?, 'queued', 0, ?, ?)
+                """, (job_id, job_type, json.dumps(self._serialize_for_json(params or {}), ensure_ascii=False), created_by))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error creating job {job_id}: {e}")
+            return False
+    
+    def update_job(self, job_id: str, **fields) -> bool:
+        """Update job fields (status, stage, percent, message, timings, result, error, started_at, finished_at)"""
+        allowed = {'status', 'stage', 'percent', 'message', 'timings', 'result', 'error', 'started_at', 'finished_at'}
+        updates = {k: v for k, v in fields.items() if k in allowed}
+        if not updates:
+            return False
+        try:
+            for key in ('timings', 'result'):
+                if key in updates and not isinstance(updates[key], str):
+                    updates[key] = json.dumps(self._serialize_for_json(updates[key]), ensure_ascii=False)
+            assignments = ", ".join(f"{key} = ?" for key in updates)
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*updates.values(), job_id))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Error updating job {job_id}: {e}")
+            return False
+    
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        job = dict(row)
+        for key in ('timings', 'params', 'result'):
+            if job.get(key):
+                try:
+                    job[key] = json.loads(job[key])
+                except (TypeError, ValueError):
+                    pass
+            else:
+                job[key] = {}
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job record by id"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+                row = cursor.fetchone()
+                return self._row_to_job(row) if row else None
+        except Exception as e:
+            print(f"Error getting job {job_id}: {e}")
+            return None
+    
+    def get_latest_job(self, job_type: str) -> Optional[Dict[str, Any]]:
+        """Get the most recently created job of a given type"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT * FROM jobs WHERE job_type = ?
+                    ORDER BY created_at DESC, rowid DESC LIMIT 1
+                """, (job_type,))
+                row = cursor.fetchone()
+                return self._row_to_job(row) if row else None
+        except Exception as e:
+            print(f"Error getting latest {job_type} job: {e}")
+            return None
+    
+    def save_derived_artifact(self, name: str, data_version: str, frame: 'pd.DataFrame',
+                              keep_versions: int = 3) -> bool:
+        """Persist a derived DataFrame for a data version, keeping the newest few versions"""
+        try:
+            payload = frame.to_json(orient='split', date_format='iso')
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT OR REPLACE INTO derived_artifacts (name, data_version, payload, created_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                """, (name, data_version, payload))
+                cursor.execute("""
+                    DELETE FROM derived_artifacts
+                    WHERE name = ? AND data_version NOT IN (
+                        SELECT data_version FROM derived_artifacts
+                        WHERE name = ? ORDER BY created_at DESC, rowid DESC LIMIT ?
+                    )
+                """, (name, name, keep_versions))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error saving derived artifact {name}: {e}")
+            return False
+    
+    def load_derived_artifact(self, name: str, data_version: str) -> Optional['pd.DataFrame']:
+        """Load a derived DataFrame persisted for exactly this data version"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT payload FROM derived_artifacts WHERE name = ? AND data_version = ?
+                """, (name, data_version))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                return pd.read_json(StringIO(row[0]), orient='split')
+        except Exception as e:
+            print(f"Error loading derived artifact {name}: {e}")
+            return None
+    
+    def get_ai_response(self, cache_key: str, max_age_seconds: float) -> Optional[str]:
+        """Return a cached AI response younger than max_age_seconds and count the hit"""
+        try:
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT response FROM ai_response_cache
+                    WHERE cache_key = ? AND created_at >= datetime('now', ?)
+                """, (cache_key, f"-{int(max_age_seconds)} seconds"))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                cursor.execute("""
+                    UPDATE ai_response_cache SET hits = hits + 1, last_hit_at = CURRENT_TIMESTAMP
+                    WHERE cache_key = ?
+                """, (cache_key,))
+                conn.commit()
+                return row[0]
+        except Exception as e:
+            print(f"Error reading AI response cache: {e}")
+            return None
+    
+    def save_ai_response(self, cache_key: str, model: str, data_version: Optional[str], response: str,
+                         max_entries: int, max_bytes: int, max_age_seconds: float) -> bool:
+        """Store an AI response, then drop expired entries and the least recently used beyond the caps"""
+        try:
+            size_bytes = len(response.encode('utf-8'))
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT OR REPLACE INTO ai_response_cache
+                    (cache_key, model, data_version, response, size_bytes, hits, created_at, last_hit_at)
+                    VALUES (?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                """, (cache_key, model, data_version, response, size_bytes))
+                cursor.execute("""
+                    DELETE FROM ai_response_cache WHERE created_at < datetime('now', ?)
+                """, (f"-{int(max_age_seconds)} seconds",))
+                
+                # Enforce entry and size caps, keeping the most recently used
+                cursor.execute("""
+                    SELECT cache_key, size_bytes FROM ai_response_cache
+                    ORDER BY last_hit_at DESC, rowid DESC
+                """)
+                kept_entries, kept_bytes, evicted = 0, 0, []
+                for key, entry_bytes in cursor.fetchall():
+                    if kept_entries < max_entries and kept_bytes + entry_bytes <= max_bytes:
+                        kept_entries += 1
+                        kept_bytes += entry_bytes
+                    else:
+                        evicted.append((key,))
+                if evicted:
+                    cursor.executemany("DELETE FROM ai_response_cache WHERE cache_key = ?", evicted)
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error saving AI response cache: {e}")
+            return False
+    
+    def get_ai_response_cache_stats(self) -> Dict[str, Any]:
+        """Entry count, total size and recorded hits of the AI response cache"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hits), 0)
+                    FROM ai_response_cache
+                """)
+                entries, size_bytes, hits = cursor.fetchone()
+                return {'entries': entries, 'size_bytes': size_bytes, 'hits': hits}
+        except Exception as e:
+            print(f"Error getting AI response cache stats: {e}")
+            return {'entries': 0, 'size_bytes': 0, 'hits': 0}
+    
+    def clear_ai_response_cache(self) -> bool:
+        """Remove every cached AI response"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("DELETE FROM ai_response_cache")
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error clearing AI response cache: {e}")
+            return False
+    
+    def save_insights_report(self, report: Dict[str, Any], data_version: Optional[str] = None,
+                             created_by: str = None, keep_reports: int = 10) -> Optional[int]:
+        """Persist an AI insights report, keeping only the newest few"""
+        try:
+            report_json = json.dumps(report, ensure_ascii=False, default=str)
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO insights_reports (data_version, report, created_by, created_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                """, (data_version, report_json, created_by))
+                report_id = cursor.lastrowid
+                cursor.execute("""
+                    DELETE FROM insights_reports WHERE id NOT IN (
+                        SELECT id FROM insights_reports ORDER BY id DESC LIMIT ?
+                    )
+                """, (keep_reports,))
+                conn.commit()
+                return report_id
+        except Exception as e:
+            print(f"Error saving insights report: {e}")
+            return None
+    
+    def get_latest_insights_report(self, data_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recent AI insights report, optionally only for one data version"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                if data_version is None:
+                    cursor.execute("""
+                        SELECT id, data_version, report, created_by, created_at
+                        FROM insights_reports ORDER BY id DESC LIMIT 1
+                    """)
+                else:
+                    cursor.execute("""
+                        SELECT id, data_version, report, created_by, created_at
+                        FROM insights_reports WHERE data_version = ? ORDER BY id DESC LIMIT 1
+                    """, (data_version,))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                report = json.loads(row[2])
+                report.update({
+                    'id': row[0],
+                    'data_version': row[1],
+                    'created_by': row[3],
+                    'created_at': row[4],
+                })
+                return report
+        except Exception as e:
+            print(f"Error loading insights report: {e}")
+            return None
+    
+    def save_chat_messages(self, session_id: str, messages: List[Dict[str, Any]],
+                           retention_days: int = 7) -> bool:
+        """Store chat messages (each with a 'seq') and drop those older than the retention"""
+        try:
+            rows = [
+                (session_id, message['seq'], message['role'],
+                 json.dumps(message, ensure_ascii=False, default=str))
+                for message in messages
+            ]
+            with sqlite3.connect(self.db_path, timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO chat_messages (session_id, seq, role, payload, created_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """, rows)
+                cursor.execute("""
+                    DELETE FROM chat_messages WHERE created_at < datetime('now', ?)
+                """, (f"-{int(retention_days)} days",))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error saving chat messages: {e}")
+            return False
+    
+    def load_chat_messages(self, session_id: str, before_seq: Optional[int] = None,
+                           limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Stored chat messages of a session, oldest first; the newest ``limit`` before ``before_seq``"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT payload FROM chat_messages
+                    WHERE session_id = ? AND (? IS NULL OR seq < ?)
+                    ORDER BY seq DESC LIMIT ?
+                """, (session_id, before_seq, before_seq, -1 if limit is None else limit))
+                return [json.loads(row[0]) for row in reversed(cursor.fetchall())]
+        except Exception as e:
+            print(f"Error loading chat messages: {e}")
+            return []
+    
+    def delete_chat_messages(self, session_id: str) -> bool:
+        """Remove the stored chat messages of a session"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error deleting chat messages: {e}")
+            return False
@@ -1,17 +1,47 @@
 import pandas as pd
-import numpy as np
 import os
 from datetime import datetime
 from typing import Dict, List, Tuple
+import copy
 import warnings
 warnings.filterwarnings('ignore')
+from core.artifact_store import get_artifact_store
 from core.unified_extractor import UnifiedFinancialExtractor
+from core.metrics_engine import MetricsEngine, growth_rates, safe_ratio
+
+
+EXTRACTION_ARTIFACT = 'extraction'
+
+
+def extraction_version(file_path: str):
+    """Cache version of a file's extraction (None when the file does not exist)"""
+    if not os.path.exists(file_path):
+        return None
+    return f"{os.path.abspath(file_path)}:{os.path.getmtime(file_path)}"
+
+
+def extract_file(file_path: str, extractor: UnifiedFinancialExtractor = None) -> Dict:
+    """UnifiedFinancialExtractor output for one file, cached per file and mtime
+
+    Consolidation and the monthly frame both need it, so each workbook is
+    parsed once. Callers get their own copy: consolidation adds keys to the
+    year dicts.
+    """
+    extractor = extractor or UnifiedFinancialExtractor()
+    data = get_artifact_store().get_or_compute(
+        EXTRACTION_ARTIFACT,
+        extraction_version(file_path),
+        lambda: extractor.extract_from_excel(file_path)
+    )
+    return copy.deepcopy(data)
+
 
 class FinancialProcessor:
     def __init__(self):
         self.months = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 
                       'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
         self.financial_data = {}
+        self.metrics_engine = MetricsEngine()
         
     def load_excel_files(self, files: List[str]) -> Dict:
         """Load and process multiple Excel files"""
@@ -108,7 +138,7 @@ class FinancialProcessor:
         extractor = UnifiedFinancialExtractor()
         all_data = {}
         for file in excel_data.keys():
-            file_data = extractor.extract_from_excel(file)
+            file_data = extract_file(file, extractor)
             if file_data:
                 all_data.update(file_data)
 
@@ -181,7 +211,7 @@ class FinancialProcessor:
         all_data = {}
         for file_path in excel_data.keys():
             if os.path.exists(file_path):
-                file_data = extractor.extract_from_excel(file_path)
+                file_data = extract_file(file_path, extractor)
                 if file_data:
                     all_data.update(file_data)
 
@@ -259,39 +289,16 @@ class FinancialProcessor:
         
         df = df.sort_values('year').copy()
         
-        # Calculate YoY growth for key metrics with proper handling
+        # Calculate YoY growth for key metrics (vectorized, same capping rules)
         growth_columns = ['revenue', 'variable_costs', 'net_profit']
         
         for col in growth_columns:
             if col in df.columns:
-                # Create growth column with safer calculation
-                df[f'{col}_growth'] = 0.0
-                
-                for i in range(1, len(df)):
-                    prev_val = df[col].iloc[i-1]
-                    curr_val = df[col].iloc[i]
-                    
-                    # Handle edge cases
-                    if pd.isna(prev_val) or pd.isna(curr_val):
-                        df.loc[df.index[i], f'{col}_growth'] = np.nan
-                    elif abs(prev_val) < 0.01:  # Previous value is essentially zero
-                        if abs(curr_val) < 0.01:
-                            df.loc[df.index[i], f'{col}_growth'] = 0
-                        else:
-                            # Cap extreme growth at 1000% when coming from near-zero
-                            df.loc[df.index[i], f'{col}_growth'] = min(1000, abs(curr_val) * 100)
-                    else:
-                        # Normal percentage calculation
-                        growth = ((curr_val - prev_val) / abs(prev_val)) * 100
-                        # Cap growth between -100% and 1000%
-                        df.loc[df.index[i], f'{col}_growth'] = max(-100, min(1000, growth))
+                df[f'{col}_growth'] = growth_rates(df[col].to_numpy())
         
         # Recalculate profit margin to ensure consistency
         if 'revenue' in df.columns and 'net_profit' in df.columns:
-            df['profit_margin'] = df.apply(
-                lambda row: (row['net_profit'] / row['revenue'] * 100) if row['revenue'] > 0 else 0,
-                axis=1
-            )
+            df['profit_margin'] = safe_ratio(df['net_profit'], df['revenue'])
         
         # Calculate operational efficiency
         if 'operational_expenses' in df.columns and 'revenue' in df.columns:
@@ -308,54 +315,24 @@ class FinancialProcessor:
         }
         
         # Calculate summary statistics for key metrics
-        for metric in ['revenue', 'net_profit', 'profit_margin']:
-            if metric in df.columns:
-                summary['metrics'][metric] = {
-                    'total': df[metric].sum(),
-                    'average': df[metric].mean(),
-                    'min': df[metric].min(),
-                    'max': df[metric].max(),
-                    'std': df[metric].std(),
-                    'cagr': self.calculate_cagr(df, metric)
-                }
+        metrics = [m for m in ['revenue', 'net_profit', 'profit_margin'] if m in df.columns]
+        cagr = self.metrics_engine.cagr(df, metrics) if metrics else {}
+        for metric in metrics:
+            summary['metrics'][metric] = {
+                'total': df[metric].sum(),
+                'average': df[metric].mean(),
+                'min': df[metric].min(),
+                'max': df[metric].max(),
+                'std': df[metric].std(),
+                'cagr': cagr[metric]
+            }
         
         return summary
     
     def calculate_cagr(self, df: pd.DataFrame, metric: str) -> float:
         """Calculate Compound Annual Growth Rate"""
-        if metric not in df.columns or len(df) < 2:
-            return 0
-        
-        df_sorted = df.sort_values('year')
-        start_value = df_sorted[metric].iloc[0]
-        end_value = df_sorted[metric].iloc[-1]
-        years = df_sorted['year'].iloc[-1] - df_sorted['year'].iloc[0]
-        
-        if start_value > 0 and years > 0:
-            cagr = (pow(end_value / start_value, 1/years) - 1) * 100
-            return round(cagr, 2)
-        return 0
+        return self.metrics_engine.cagr(df, [metric]).get(metric, 0)
     
     def detect_anomalies(self, df: pd.DataFrame) -> List[Dict]:
         """Detect anomalies in financial data"""
-        anomalies = []
-        
-        # Check for extreme growth rates
-        growth_columns = [col for col in df.columns if '_growth' in col]
-        
-        for col in growth_columns:
-            if col in df.columns:
-                mean_growth = df[col].mean()
-                std_growth = df[col].std()
-                
-                for idx, row in df.iterrows():
-                    if pd.notna(row[col]):
-                        if abs(row[col] - mean_growth) > 2 * std_growth:
-                            anomalies.append({
-                                'year': row['year'],
-                                'metric': col,
-                                'value': row[col],
-                                'type': 'Extreme growth rate'
-                            })
-        
-        return anomalies
\ No newline at end of file
+        return self.metrics_engine.detect_anomalies(df)
\ No newline at end of file
@@ -78,47 +78,67 @@ class GerenciadorArquivos:
     def enviar_arquivo(self, arquivo_enviado) -> bool:
         """Enviar e registrar novo arquivo Excel"""
         try:
-            # Gerar ID único
-            arquivo_id = f"arquivo_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
             # Salvar arquivo
             caminho_destino = self.caminho_armazenamento / arquivo_enviado.name
             with open(caminho_destino, 'wb') as f:
                 f.write(arquivo_enviado.getbuffer())
             
-            # Extrair informações
-            anos = self._extrair_anos_do_arquivo(str(caminho_destino))
-            tamanho = os.path.getsize(caminho_destino)
-            
-            # Verificar se arquivo já existe no registro
-            for arquivo in self.registro["arquivos"]:
-                if arquivo["nome"] == arquivo_enviado.name:
-                    # Atualizar arquivo existente
-                    arquivo["data_envio"] = datetime.now().strftime("%d/%m/%Y %H:%M")
-                    arquivo["tamanho"] = f"{tamanho // 1024}KB"
-                    arquivo["anos_incluidos"] = anos
-                    self._salvar_registro()
-                    return True
-            
-            # Adicionar ao registro
-            metadata = {
-                "id": arquivo_id,
-                "nome": arquivo_enviado.name,
-                "data_envio": datetime.now().strftime("%d/%m/%Y %H:%M"),
-                "tamanho": f"{tamanho // 1024}KB",
-                "anos_incluidos": anos,
-                "caminho": str(caminho_destino)
-            }
+            self._registrar(caminho_destino)
+            return True
             
-            self.registro["arquivos"].append(metadata)
-            self._salvar_registro()
+        except Exception as e:
+            st.error(f"Erro ao enviar arquivo: {str(e)}")
+            return False
+    
+    def registrar_arquivo(self, caminho_arquivo: str) -> bool:
+        """Registrar arquivo Excel do disco (copiado para o armazenamento), sem upload"""
+        try:
+            origem = Path(caminho_arquivo)
+            caminho_destino = self.caminho_armazenamento / origem.name
+            if origem.resolve() != caminho_destino.resolve():
+                shutil.copy2(origem, caminho_destino)
             
+            self._registrar(caminho_destino)
             return True
             
         except Exception as e:
-            st.error(f"Erro ao enviar arquivo: {str(e)}")
+            st.error(f"Erro ao registrar arquivo: {str(e)}")
             return False
     
+    def _registrar(self, caminho_destino: Path) -> None:
+        """Adicionar ou atualizar a entrada de um arquivo já salvo no armazenamento"""
+        # Gerar ID único (vários arquivos podem ser registrados no mesmo segundo)
+        arquivo_id = f"arquivo_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if any(arquivo["id"] == arquivo_id for arquivo in self.registro["arquivos"]):
+            arquivo_id = f"{arquivo_id}_{caminho_destino.stem}"
+        
+        # Extrair informações
+        anos = self._extrair_anos_do_arquivo(str(caminho_destino))
+        tamanho = os.path.getsize(caminho_destino)
+        
+        # Verificar se arquivo já existe no registro
+        for arquivo in self.registro["arquivos"]:
+            if arquivo["nome"] == caminho_destino.name:
+                # Atualizar arquivo existente
+                arquivo["data_envio"] = datetime.now().strftime("%d/%m/%Y %H:%M")
+                arquivo["tamanho"] = f"{tamanho // 1024}KB"
+                arquivo["anos_incluidos"] = anos
+                self._salvar_registro()
+                return
+        
+        # Adicionar ao registro
+        metadata = {
+            "id": arquivo_id,
+            "nome": caminho_destino.name,
+            "data_envio": datetime.now().strftime("%d/%m/%Y %H:%M"),
+            "tamanho": f"{tamanho // 1024}KB",
+            "anos_incluidos": anos,
+            "caminho": str(caminho_destino)
+        }
+        
+        self.registro["arquivos"].append(metadata)
+        self._salvar_registro()
+    
     def obter_anos_disponiveis(self) -> List[int]:
         """Obter todos os anos disponíveis em todos os arquivos"""
         anos = set()
@@ -4,54 +4,109 @@ Processes financial data to identify and aggregate expense groups
 """
 
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 import re
+from functools import lru_cache
+
+from core.artifact_store import get_artifact_store
+from utils.tracing import traced
+
+
+# Define known groups and their patterns
+GROUP_PATTERNS = {
+    'repasse_comissao': {
+        'pattern': r'REPASSE\s*COMISS[ÃA]O',
+        'display_name': 'Repasse de Comissão',
+        'is_parent': True
+    },
+    'funcionarios': {
+        'pattern': r'FUNCION[ÁA]RIOS?',
+        'display_name': 'Funcionários',
+        'is_parent': True,
+        'sub_patterns': [
+            r'SAL[ÁA]RIO',
+            r'VALE[\s-]?ALIMENTA[ÇC][ÃA]O',
+            r'VALE[\s-]?TRANSPORTE',
+            r'PLANO[\s-]?SA[ÚU]DE',
+            r'BENEF[ÍI]CIO',
+            r'F[ÉE]RIAS',
+            r'13[º°]?\s*SAL[ÁA]RIO',
+            r'FGTS',
+            r'INSS'
+        ]
+    },
+    'telefones': {
+        'pattern': r'TELEFONE|CELULAR|TELECOM',
+        'display_name': 'Telefones',
+        'combine_items': True
+    },
+    'marketing': {
+        'pattern': r'MARKETING|PUBLICIDADE|PROPAGANDA',
+        'display_name': 'Marketing',
+        'is_parent': True
+    },
+    'impostos': {
+        'pattern': r'IMPOSTO|TRIBUTO|TAXA',
+        'display_name': 'Impostos e Taxas',
+        'is_parent': True
+    }
+}
+
+# Compiled once for the whole process
+_COMPILED_PATTERNS = {
+    group_key: re.compile(config['pattern'], re.IGNORECASE)
+    for group_key, config in GROUP_PATTERNS.items()
+}
+_COMPILED_SUB_PATTERNS = {
+    group_key: [re.compile(p, re.IGNORECASE) for p in config['sub_patterns']]
+    for group_key, config in GROUP_PATTERNS.items()
+    if 'sub_patterns' in config
+}
+
+# label -> (parent group, sub-item groups, combinable groups)
+LabelClass = Tuple[Optional[str], Tuple[str, ...], Tuple[str, ...]]
+# Distinct labels seen across all uploads; bounded so the cache cannot grow
+# for the life of the process
+LABEL_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def classify_label(label: str) -> LabelClass:
+    """Classify a line item label against all group patterns (memoized)
+    
+    Returns the first parent group whose pattern matches, the groups whose
+    sub-patterns match, and the combinable groups whose pattern matches - the
+    same decisions the three passes of _process_line_items make.
+    """
+    parent_group = None
+    combine_groups = []
+    for group_key, config in GROUP_PATTERNS.items():
+        if _COMPILED_PATTERNS[group_key].search(label):
+            if config.get('is_parent') and parent_group is None:
+                parent_group = group_key
+            if config.get('combine_items'):
+                combine_groups.append(group_key)
+    sub_groups = tuple(
+        group_key for group_key, patterns in _COMPILED_SUB_PATTERNS.items()
+        if any(p.search(label) for p in patterns)
+    )
+    
+    return (parent_group, sub_groups, tuple(combine_groups))
 
 
 class GroupHierarchyProcessor:
     """Processes financial data to identify hierarchical groups and aggregate sub-items"""
     
+    EXPENSE_CATEGORIES = [
+        'variable_costs', 'fixed_costs', 'non_operational_costs',
+        'taxes', 'commissions', 'administrative_expenses',
+        'marketing_expenses', 'financial_expenses'
+    ]
+    
     def __init__(self):
-        # Define known groups and their patterns
-        self.group_patterns = {
-            'repasse_comissao': {
-                'pattern': r'REPASSE\s*COMISS[ÃA]O',
-                'display_name': 'Repasse de Comissão',
-                'is_parent': True
-            },
-            'funcionarios': {
-                'pattern': r'FUNCION[ÁA]RIOS?',
-                'display_name': 'Funcionários',
-                'is_parent': True,
-                'sub_patterns': [
-                    r'SAL[ÁA]RIO',
-                    r'VALE[\s-]?ALIMENTA[ÇC][ÃA]O',
-                    r'VALE[\s-]?TRANSPORTE',
-                    r'PLANO[\s-]?SA[ÚU]DE',
-                    r'BENEF[ÍI]CIO',
-                    r'F[ÉE]RIAS',
-                    r'13[º°]?\s*SAL[ÁA]RIO',
-                    r'FGTS',
-                    r'INSS'
-                ]
-            },
-            'telefones': {
-                'pattern': r'TELEFONE|CELULAR|TELECOM',
-                'display_name': 'Telefones',
-                'combine_items': True
-            },
-            'marketing': {
-                'pattern': r'MARKETING|PUBLICIDADE|PROPAGANDA',
-                'display_name': 'Marketing',
-                'is_parent': True
-            },
-            'impostos': {
-                'pattern': r'IMPOSTO|TRIBUTO|TAXA',
-                'display_name': 'Impostos e Taxas',
-                'is_parent': True
-            }
-        }
+        self.group_patterns = GROUP_PATTERNS
         
+    @traced()
     def process_data(self, data: Dict[int, Dict]) -> Dict[int, Dict]:
         """
         Process financial data to create group hierarchies
@@ -64,24 +119,39 @@ class GroupHierarchyProcessor:
         """
         processed_data = {}
         
+        # Classify every distinct label once, up front
+        self.classify_labels(self._collect_labels(data))
+        
         for year, year_data in data.items():
             processed_data[year] = self._process_year_data(year, year_data)
             
         return processed_data
     
+    def _collect_labels(self, data: Dict[int, Dict]) -> set:
+        labels = set()
+        for year_data in data.values():
+            if not isinstance(year_data, dict):
+                continue
+            for category in self.EXPENSE_CATEGORIES:
+                category_data = year_data.get(category)
+                if isinstance(category_data, dict) and isinstance(category_data.get('line_items'), dict):
+                    for item_data in category_data['line_items'].values():
+                        if isinstance(item_data, dict):
+                            labels.add(item_data.get('label', ''))
+        return labels
+    
+    @staticmethod
+    def classify_labels(labels) -> Dict[str, LabelClass]:
+        """Batch classification of labels (each distinct label is matched once)"""
+        return {label: classify_label(label) for label in labels}
+    
     def _process_year_data(self, year: int, year_data: Dict) -> Dict:
         """Process data for a single year"""
         processed = year_data.copy()
         processed['groups'] = {}
         
         # Process each expense category
-        expense_categories = [
-            'variable_costs', 'fixed_costs', 'non_operational_costs',
-            'taxes', 'commissions', 'administrative_expenses',
-            'marketing_expenses', 'financial_expenses'
-        ]
-        
-        for category in expense_categories:
+        for category in self.EXPENSE_CATEGORIES:
             if category in year_data and isinstance(year_data[category], dict):
                 category_data = year_data[category]
                 if 'line_items' in category_data:
@@ -96,42 +166,35 @@ class GroupHierarchyProcessor:
             
         groups = {}
         processed_items = set()
+        classified = [
+            (item_key, item_data, classify_label(item_data.get('label', '')))
+            for item_key, item_data in line_items.items()
+        ]
         
         # First pass: identify parent groups
-        for item_key, item_data in line_items.items():
-            label = item_data.get('label', '')
-            
-            for group_key, group_config in self.group_patterns.items():
-                if re.search(group_config['pattern'], label, re.IGNORECASE):
-                    if group_config.get('is_parent'):
-                        # This is a parent group
-                        if group_key not in groups:
-                            groups[group_key] = {
-                                'display_name': group_config['display_name'],
-                                'parent_item': item_data,
-                                'sub_items': {},
-                                'total_annual': item_data.get('annual', 0),
-                                'total_monthly': item_data.get('monthly', {})
-                            }
-                        processed_items.add(item_key)
-                        break
+        for item_key, item_data, (parent_group, _, _) in classified:
+            if parent_group is not None:
+                # This is a parent group
+                if parent_group not in groups:
+                    groups[parent_group] = {
+                        'display_name': self.group_patterns[parent_group]['display_name'],
+                        'parent_item': item_data,
+                        'sub_items': {},
+                        'total_annual': item_data.get('annual', 0),
+                        'total_monthly': item_data.get('monthly', {})
+                    }
+                processed_items.add(item_key)
         
         # Second pass: identify sub-items
-        for item_key, item_data in line_items.items():
+        for item_key, item_data, (_, sub_groups, _) in classified:
             if item_key in processed_items:
                 continue
-                
-            label = item_data.get('label', '')
             
             # Check if this item belongs to a group
-            for group_key, group_config in self.group_patterns.items():
-                if group_key in groups and 'sub_patterns' in group_config:
-                    # Check sub-patterns
-                    for sub_pattern in group_config['sub_patterns']:
-                        if re.search(sub_pattern, label, re.IGNORECASE):
-                            groups[group_key]['sub_items'][item_key] = item_data
-                            processed_items.add(item_key)
-                            break
+            for group_key in sub_groups:
+                if group_key in groups:
+                    groups[group_key]['sub_items'][item_key] = item_data
+                    processed_items.add(item_key)
         
         # Third pass: combine similar items (like telefones)
         for group_key, group_config in self.group_patterns.items():
@@ -140,12 +203,11 @@ class GroupHierarchyProcessor:
                 combined_annual = 0
                 combined_monthly = {}
                 
-                for item_key, item_data in line_items.items():
+                for item_key, item_data, (_, _, combine_groups) in classified:
                     if item_key in processed_items:
                         continue
                         
-                    label = item_data.get('label', '')
-                    if re.search(group_config['pattern'], label, re.IGNORECASE):
+                    if group_key in combine_groups:
                         combined_items[item_key] = item_data
                         combined_annual += item_data.get('annual', 0)
                         
@@ -202,16 +264,46 @@ class GroupHierarchyProcessor:
     
     def create_group_comparison_df(self, major_groups: Dict[str, Dict]) -> pd.DataFrame:
         """Create a DataFrame for group comparison visualization"""
-        rows = []
+        columns = {'Grupo': [], 'Ano': [], 'Valor': [], 'Categoria': [], 'Itens': []}
         
         for group_name, group_data in major_groups.items():
-            for year, year_values in group_data['years'].items():
-                rows.append({
-                    'Grupo': group_name,
-                    'Ano': year,
-                    'Valor': year_values['annual'],
-                    'Categoria': group_data['category'],
-                    'Itens': year_values['item_count']
-                })
-        
-        return pd.DataFrame(rows)
\ No newline at end of file
+            years = group_data['years']
+            columns['Grupo'].extend([group_name] * len(years))
+            columns['Ano'].extend(years.keys())
+            columns['Valor'].extend(v['annual'] for v in years.values())
+            columns['Categoria'].extend([group_data['category']] * len(years))
+            columns['Itens'].extend(v['item_count'] for v in years.values())
+        
+        if not columns['Grupo']:
+            return pd.DataFrame()
+        return pd.DataFrame(columns)
+    
+    def create_group_matrix(self, group_df: pd.DataFrame) -> pd.DataFrame:
+        """Group × year matrix of annual values"""
+        if group_df.empty:
+            return pd.DataFrame()
+        return group_df.pivot_table(index='Grupo', columns='Ano', values='Valor', aggfunc='sum', fill_value=0)
+    
+    @traced()
+    def build_artifacts(self, data: Dict[int, Dict], data_version: Optional[str]) -> Dict[str, Any]:
+        """processed data, major groups, comparison frame and group matrix, cached per data version"""
+        def build():
+            processed = self.process_data(data)
+            major_groups = self.get_major_groups(processed)
+            group_df = self.create_group_comparison_df(major_groups) if major_groups else pd.DataFrame()
+            return {
+                'processed': processed,
+                'major_groups': major_groups,
+                'group_df': group_df,
+                'group_matrix': self.create_group_matrix(group_df)
+            }
+        
+        return get_artifact_store().get_or_compute('group_hierarchy', data_version, build)
+
+
+_processor = GroupHierarchyProcessor()
+
+
+def get_group_processor() -> GroupHierarchyProcessor:
+    """Shared processor instance (it holds no per-session state)"""
+    return _processor
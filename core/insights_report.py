@@ -0,0 +1,111 @@
+"""
+AI insights report
+Builds the macro, micro and per-category deep-dive prompts from the same
+cached contexts, sends them to the model concurrently (at most
+AI_INSIGHTS_MAX_WORKERS at a time, on top of the shared client's own limit)
+and merges the answers into one report that is persisted with the data
+version it was generated from.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from utils.tracing import traced
+
+
+INSIGHTS_MAX_WORKERS = int(os.environ.get('AI_INSIGHTS_MAX_WORKERS', '3'))
+DEEP_DIVE_CATEGORIES = int(os.environ.get('AI_INSIGHTS_DEEP_DIVES', '3'))
+
+
+def build_report_sections(analyzer, macro_prompt: Optional[str], line_items: Optional[pd.DataFrame],
+                          deep_dives: int = DEEP_DIVE_CATEGORIES,
+                          value_column: str = 'Valor Anual',
+                          group_column: str = 'Categoria Principal') -> List[Dict[str, str]]:
+    """Report sections ({key, title, prompt}): macro, micro and the largest categories"""
+    sections = []
+    if macro_prompt:
+        sections.append({'key': 'macro', 'title': '📊 Análise Macro', 'prompt': macro_prompt})
+
+    if line_items is not None and not line_items.empty:
+        sections.append({
+            'key': 'micro',
+            'title': '🔬 Análise de Despesas',
+            'prompt': analyzer.build_micro_analysis_prompt(line_items, value_column, group_column),
+        })
+        if group_column in line_items.columns and value_column in line_items.columns:
+            totals = (
+                line_items[value_column].abs()
+                .groupby(line_items[group_column]).sum()
+                .sort_values(ascending=False)
+            )
+            for category in totals.index[:deep_dives]:
+                subset = line_items[line_items[group_column] == category].drop(columns=[group_column])
+                sections.append({
+                    'key': f'category:{category}',
+                    'title': f'🔎 {category}',
+                    'prompt': analyzer.build_category_analysis_prompt(subset, str(category), value_column),
+                })
+    return sections
+
+
+def _run_section(client, section: Dict[str, str], data_version: Optional[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        response = client.generate_content(section['prompt'], data_version=data_version)
+        text, error, cached = response.text, None, response.cached
+    except Exception as e:
+        print(f"Error generating insights section {section['key']}: {e}")
+        text, error, cached = '', str(e), False
+    return {
+        'key': section['key'],
+        'title': section['title'],
+        'text': text,
+        'error': error,
+        'cached': cached,
+        'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+@traced()
+def run_insights_report(client, sections: List[Dict[str, str]], data_version: Optional[str] = None,
+                        max_workers: int = INSIGHTS_MAX_WORKERS) -> Dict[str, Any]:
+    """Run every section prompt concurrently and merge the answers in section order
+
+    A failing section is reported with its error instead of failing the report.
+    """
+    started = time.perf_counter()
+    results: Dict[str, Dict[str, Any]] = {}
+    if sections:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sections))),
+                                thread_name_prefix='insights') as executor:
+            futures = {
+                executor.submit(_run_section, client, section, data_version): section['key']
+                for section in sections
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+    merged = [results[section['key']] for section in sections]
+    return {
+        'data_version': data_version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'total_ms': round((time.perf_counter() - started) * 1000, 1),
+        # What the same sections would have taken one after another
+        'sequential_ms': round(sum(section['latency_ms'] for section in merged), 1),
+        'sections': merged,
+    }
+
+
+def generate_insights_report(db, analyzer, macro_prompt: Optional[str], line_items: Optional[pd.DataFrame],
+                             data_version: Optional[str] = None, created_by: str = None,
+                             max_workers: int = INSIGHTS_MAX_WORKERS) -> Dict[str, Any]:
+    """Build, run and persist the combined report; returns it with its database id"""
+    sections = build_report_sections(analyzer, macro_prompt, line_items)
+    report = run_insights_report(analyzer.model, sections, data_version, max_workers)
+    report['id'] = db.save_insights_report(report, data_version, created_by)
+    return report
@@ -0,0 +1,168 @@
+"""
+Background job runner
+Runs long tasks (the analysis pipeline) in worker threads and persists a
+job record (status, stage, percent, timings) through DatabaseManager so any
+session - or the same session after a page refresh - can poll progress.
+"""
+
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# Finished in-memory results kept for the session that started the job
+MAX_KEPT_RESULTS = 4
+
+
+class JobContext:
+    """Handle passed to a job target for reporting progress"""
+
+    def __init__(self, runner: 'JobRunner', job_id: str):
+        self.runner = runner
+        self.job_id = job_id
+        self.timings: Dict[str, float] = {}
+        self._stage: Optional[str] = None
+        self._stage_started = 0.0
+
+    def progress(self, stage: str, percent: float, message: str = None) -> None:
+        """Enter a new stage (closing the timing of the previous one)"""
+        self._close_stage()
+        self._stage = stage
+        self._stage_started = time.perf_counter()
+        self.runner.db.update_job(
+            self.job_id,
+            stage=stage,
+            percent=float(percent),
+            message=message,
+            timings=self.timings
+        )
+
+    def _close_stage(self) -> None:
+        if self._stage is not None:
+            self.timings[self._stage] = round(time.perf_counter() - self._stage_started, 3)
+            self._stage = None
+
+
+class JobRunner:
+    """Starts jobs in daemon threads and tracks them in the jobs table"""
+
+    def __init__(self, db):
+        self.db = db
+        self._threads: Dict[str, threading.Thread] = {}
+        self._results: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, target: Callable[[JobContext], Any],
+               created_by: str = None, params: Dict[str, Any] = None) -> str:
+        """Start a job, or return the id of the one of this type already running"""
+        with self._lock:
+            for job_id in self._threads:
+                job = self.db.get_job(job_id)
+                if job and job['job_type'] == job_type and job['status'] in ACTIVE_STATUSES:
+                    return job_id
+
+            job_id = uuid.uuid4().hex[:12]
+            self.db.create_job(job_id, job_type, created_by, params)
+            thread = threading.Thread(
+                target=self._run, args=(job_id, target), name=f"job-{job_type}-{job_id}", daemon=True
+            )
+            self._threads[job_id] = thread
+            thread.start()
+            return job_id
+
+    def _run(self, job_id: str, target: Callable[[JobContext], Any]) -> None:
+        ctx = JobContext(self, job_id)
+        started = time.perf_counter()
+        self.db.update_job(job_id, status=JOB_RUNNING, started_at=datetime.now().isoformat())
+        try:
+            result = target(ctx)
+            ctx._close_stage()
+            ctx.timings['total'] = round(time.perf_counter() - started, 3)
+            with self._lock:
+                self._results[job_id] = result
+                while len(self._results) > MAX_KEPT_RESULTS:
+                    self._results.popitem(last=False)
+            self.db.update_job(
+                job_id,
+                status=JOB_COMPLETED,
+                percent=100.0,
+                message="Concluído",
+                timings=ctx.timings,
+                result=self._summarize(result),
+                finished_at=datetime.now().isoformat()
+            )
+        except Exception as e:
+            traceback.print_exc()
+            ctx._close_stage()
+            ctx.timings['total'] = round(time.perf_counter() - started, 3)
+            self.db.update_job(
+                job_id,
+                status=JOB_FAILED,
+                error=str(e),
+                timings=ctx.timings,
+                finished_at=datetime.now().isoformat()
+            )
+        finally:
+            with self._lock:
+                self._threads.pop(job_id, None)
+
+    @staticmethod
+    def _summarize(result: Any) -> Dict[str, Any]:
+        """Small JSON-friendly summary stored in the job record"""
+        if isinstance(result, dict) and isinstance(result.get('summary'), dict):
+            return result['summary']
+        return {}
+
+    def is_active(self, job_id: str) -> bool:
+        """True while the job's worker thread is registered in this process"""
+        return job_id in self._threads
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job record, marking orphaned jobs (process restarted) as failed"""
+        job = self.db.get_job(job_id)
+        return self._check_orphaned(job)
+
+    def get_latest_job(self, job_type: str) -> Optional[Dict[str, Any]]:
+        return self._check_orphaned(self.db.get_latest_job(job_type))
+
+    def _check_orphaned(self, job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if job and job['status'] in ACTIVE_STATUSES and not self.is_active(job['id']):
+            # Re-read: the worker may have finished between the read and the check
+            latest = self.db.get_job(job['id'])
+            if latest and latest['status'] not in ACTIVE_STATUSES:
+                return latest
+            job['status'] = JOB_FAILED
+            job['error'] = "Processamento interrompido (servidor reiniciado)"
+            self.db.update_job(job['id'], status=JOB_FAILED, error=job['error'],
+                               finished_at=datetime.now().isoformat())
+        return job
+
+    def pop_result(self, job_id: str) -> Any:
+        """Take the in-memory result of a finished job (None if not held here)"""
+        with self._lock:
+            return self._results.pop(job_id, None)
+
+
+_job_runner: Optional[JobRunner] = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner(db) -> JobRunner:
+    """Return the process-wide job runner"""
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                _job_runner = JobRunner(db)
+    return _job_runner
@@ -0,0 +1,236 @@
+"""
+Vectorized metrics engine
+Computes growth (with the legacy capping rules), CAGR, margins, efficiency
+ratios and anomalies for any list of metrics in one pass, at annual,
+quarterly, semester or monthly granularity.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+
+MONTHS = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN',
+          'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+
+# Sort keys and number of periods per year for each granularity
+GRANULARITIES = {
+    'annual': {'keys': ['year'], 'periods_per_year': 1},
+    'semester': {'keys': ['year', 'semester'], 'periods_per_year': 2},
+    'quarterly': {'keys': ['year', 'quarter'], 'periods_per_year': 4},
+    'monthly': {'keys': ['year', 'month_num'], 'periods_per_year': 12},
+}
+
+DEFAULT_GROWTH_METRICS = ['revenue', 'variable_costs', 'net_profit']
+
+# Columns that are ratios and must be recomputed (not summed) after aggregation
+RATIO_COLUMNS = ['profit_margin', 'gross_margin', 'operational_efficiency']
+
+# Growth caps used across the app
+GROWTH_FLOOR = -100
+GROWTH_CAP = 1000
+NEAR_ZERO = 0.01
+
+
+def growth_rates(values) -> np.ndarray:
+    """Period-over-period growth in percent, matching the legacy loop exactly
+
+    - first period is 0
+    - NaN on either side gives NaN
+    - previous ~0: 0 if current ~0, else min(1000, |current| * 100)
+    - otherwise (curr - prev) / |prev| * 100 clipped to [-100, 1000]
+    """
+    curr = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+    result = np.zeros(len(curr), dtype=float)
+    if len(curr) < 2:
+        return result
+
+    prev = curr[:-1]
+    cur = curr[1:]
+    abs_prev = np.abs(prev)
+    abs_cur = np.abs(cur)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normal = np.clip((cur - prev) / abs_prev * 100, GROWTH_FLOOR, GROWTH_CAP)
+    from_zero = np.where(abs_cur < NEAR_ZERO, 0.0, np.minimum(GROWTH_CAP, abs_cur * 100))
+
+    growth = np.where(abs_prev < NEAR_ZERO, from_zero, normal)
+    growth[np.isnan(prev) | np.isnan(cur)] = np.nan
+    result[1:] = growth
+    return result
+
+
+def safe_ratio(numerator, denominator, positive_only: bool = True) -> np.ndarray:
+    """numerator / denominator * 100, 0 where the denominator is not positive"""
+    num = pd.to_numeric(pd.Series(numerator), errors='coerce').to_numpy(dtype=float)
+    den = pd.to_numeric(pd.Series(denominator), errors='coerce').to_numpy(dtype=float)
+    if not positive_only:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return num / den * 100
+    valid = den > 0
+    out = np.zeros(len(num), dtype=float)
+    np.divide(num, den, out=out, where=valid)
+    out[valid] *= 100
+    return out
+
+
+class MetricsEngine:
+    """Vectorized replacement for the row-by-row metric loops"""
+
+    def add_period_keys(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add month_num/quarter/semester columns derived from 'month' when missing"""
+        df = df.copy()
+        if 'month' in df.columns and 'month_num' not in df.columns:
+            month_map = {m: i + 1 for i, m in enumerate(MONTHS)}
+            df['month_num'] = df['month'].map(month_map)
+        if 'month_num' in df.columns:
+            if 'quarter' not in df.columns:
+                df['quarter'] = (df['month_num'] - 1) // 3 + 1
+            if 'semester' not in df.columns:
+                df['semester'] = (df['month_num'] - 1) // 6 + 1
+        return df
+
+    def detect_granularity(self, df: pd.DataFrame) -> str:
+        """Guess the granularity of a frame from its columns"""
+        if 'month' in df.columns or 'month_num' in df.columns:
+            return 'monthly'
+        if 'quarter' in df.columns:
+            return 'quarterly'
+        if 'semester' in df.columns:
+            return 'semester'
+        return 'annual'
+
+    def aggregate(self, df: pd.DataFrame, granularity: str = 'annual') -> pd.DataFrame:
+        """Roll a finer-grained frame up to the requested granularity
+
+        Flow columns are summed; ratio columns are recomputed afterwards.
+        """
+        if df.empty or granularity not in GRANULARITIES:
+            return df
+
+        df = self.add_period_keys(df)
+        keys = GRANULARITIES[granularity]['keys']
+        if not all(k in df.columns for k in keys):
+            return df
+
+        period_cols = {'year', 'month', 'month_num', 'quarter', 'semester', 'date', 'period'}
+        value_cols = [
+            c for c in df.select_dtypes(include='number').columns
+            if c not in period_cols and c not in RATIO_COLUMNS and not c.endswith('_growth')
+        ]
+        result = df.groupby(keys, as_index=False, sort=True)[value_cols].sum()
+        return self.add_ratios(result)
+
+    def add_ratios(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Recompute margins and efficiency ratios from their components"""
+        if 'revenue' not in df.columns:
+            return df
+        if 'net_profit' in df.columns:
+            df['profit_margin'] = safe_ratio(df['net_profit'], df['revenue'])
+        if 'gross_profit' in df.columns:
+            df['gross_margin'] = safe_ratio(df['gross_profit'], df['revenue'])
+        if 'operational_expenses' in df.columns:
+            df['operational_efficiency'] = safe_ratio(
+                df['operational_expenses'], df['revenue'], positive_only=False
+            )
+        return df
+
+    def add_growth(self, df: pd.DataFrame, metrics: Optional[List[str]] = None,
+                   granularity: str = 'annual') -> pd.DataFrame:
+        """Sort by period and add `<metric>_growth` columns"""
+        metrics = metrics or DEFAULT_GROWTH_METRICS
+        keys = [k for k in GRANULARITIES.get(granularity, GRANULARITIES['annual'])['keys'] if k in df.columns]
+        if keys:
+            df = df.sort_values(keys)
+        df = df.copy()
+        for metric in metrics:
+            if metric in df.columns:
+                df[f'{metric}_growth'] = growth_rates(df[metric].to_numpy())
+        return df
+
+    def cagr(self, df: pd.DataFrame, metrics: List[str], granularity: str = 'annual') -> Dict[str, float]:
+        """Compound annual growth rate for several metrics at once
+
+        Elapsed time is measured in years; sub-annual frames convert their
+        period count using the periods-per-year of the granularity.
+        """
+        result = {metric: 0 for metric in metrics}
+        present = [m for m in metrics if m in df.columns]
+        if not present or len(df) < 2 or 'year' not in df.columns:
+            return result
+
+        config = GRANULARITIES.get(granularity, GRANULARITIES['annual'])
+        keys = [k for k in config['keys'] if k in df.columns]
+        df_sorted = df.sort_values(keys)
+
+        if granularity == 'annual' or len(keys) < 2:
+            years = df_sorted['year'].iloc[-1] - df_sorted['year'].iloc[0]
+        else:
+            per_year = config['periods_per_year']
+            first = df_sorted.iloc[0]
+            last = df_sorted.iloc[-1]
+            elapsed = (last['year'] - first['year']) * per_year + (last[keys[1]] - first[keys[1]])
+            years = elapsed / per_year
+        if years <= 0:
+            return result
+
+        # One sort for all metrics; the per-metric power stays scalar so the
+        # rounding matches the legacy calculation bit for bit
+        start_values = df_sorted[present].iloc[0]
+        end_values = df_sorted[present].iloc[-1]
+        for metric in present:
+            start_value = start_values[metric]
+            end_value = end_values[metric]
+            if not start_value > 0:
+                continue
+            with np.errstate(divide='ignore', invalid='ignore'):
+                value = (np.power(np.float64(end_value) / start_value, 1 / years) - 1) * 100
+            # Negative end values have no real root; report 0 like other undefined cases
+            if np.isfinite(value):
+                result[metric] = round(value, 2)
+        return result
+
+    def detect_anomalies(self, df: pd.DataFrame) -> List[Dict]:
+        """Flag growth values more than 2 standard deviations from the mean"""
+        anomalies = []
+        growth_columns = [col for col in df.columns if '_growth' in col]
+        years = df['year'].to_numpy() if 'year' in df.columns else np.full(len(df), None)
+
+        for col in growth_columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            mean_growth = values.mean()
+            std_growth = values.std()
+            mask = (values.notna() & ((values - mean_growth).abs() > 2 * std_growth)).to_numpy()
+            for year, value in zip(years[mask], values.to_numpy()[mask]):
+                anomalies.append({
+                    'year': year,
+                    'metric': col,
+                    'value': value,
+                    'type': 'Extreme growth rate'
+                })
+        return anomalies
+
+    def compute(self, df: pd.DataFrame, metrics: Optional[List[str]] = None,
+                granularity: Optional[str] = None) -> Dict:
+        """One-shot computation of growth, ratios, CAGR and anomalies
+
+        Returns a dict with the enriched 'data' frame, 'cagr' per metric and
+        the detected 'anomalies'.
+        """
+        if df is None or df.empty:
+            return {'data': pd.DataFrame(), 'cagr': {}, 'anomalies': []}
+
+        metrics = metrics or DEFAULT_GROWTH_METRICS
+        source_granularity = self.detect_granularity(df)
+        granularity = granularity or source_granularity
+        if granularity != source_granularity:
+            df = self.aggregate(df, granularity)
+        elif granularity != 'annual':
+            df = self.add_period_keys(df)
+
+        data = self.add_ratios(self.add_growth(df, metrics, granularity))
+        return {
+            'data': data,
+            'cagr': self.cagr(data, metrics, granularity),
+            'anomalies': self.detect_anomalies(data)
+        }
@@ -0,0 +1,86 @@
+"""
+Persisted monthly frame
+The monthly DataFrame behind the dashboard's period views is produced at
+processing time and stored per data version (in memory through the artifact
+store and in SQLite through DatabaseManager). Page renders only read it; when
+it is missing a background rebuild is queued instead of parsing Excel files.
+"""
+
+from typing import Any, Dict, Optional
+
+from core.artifact_store import get_artifact_store
+from core.jobs import get_job_runner, JOB_FAILED
+from utils.tracing import traced
+
+
+MONTHLY_ARTIFACT = 'monthly_data'
+MONTHLY_REBUILD_JOB_TYPE = 'monthly_rebuild'
+
+
+@traced()
+def build_monthly_artifact(db, extracted_data: Dict, data_version: str):
+    """Derive the monthly frame from extracted data and persist it for ``data_version``"""
+    from utils.legacy_helpers import generate_monthly_data_from_extracted
+
+    monthly_df = generate_monthly_data_from_extracted(extracted_data)
+    if monthly_df is None or monthly_df.empty:
+        return None
+    db.save_derived_artifact(MONTHLY_ARTIFACT, data_version, monthly_df)
+    get_artifact_store().put(MONTHLY_ARTIFACT, data_version, monthly_df)
+    return monthly_df
+
+
+@traced()
+def get_monthly_artifact(db, extracted_data: Dict, data_version: Optional[str],
+                         requested_by: str = None):
+    """Return the monthly frame for a data version without parsing anything
+
+    Lookup order: shared in-memory store, then the persisted copy. When neither
+    has it, a background rebuild is enqueued (once per data version) and None
+    is returned so the caller can render a degraded view. A rebuild that
+    already failed for this version is not retried automatically.
+    """
+    if not data_version or not extracted_data:
+        return None
+
+    store = get_artifact_store()
+    monthly_df = store.get(MONTHLY_ARTIFACT, data_version)
+    if monthly_df is not None:
+        return monthly_df
+
+    monthly_df = db.load_derived_artifact(MONTHLY_ARTIFACT, data_version)
+    if monthly_df is not None and not monthly_df.empty:
+        store.put(MONTHLY_ARTIFACT, data_version, monthly_df)
+        return monthly_df
+
+    job = get_monthly_rebuild_job(db)
+    failed_here = (
+        job is not None and job['status'] == JOB_FAILED
+        and (job.get('params') or {}).get('data_version') == data_version
+    )
+    if not failed_here:
+        enqueue_monthly_rebuild(db, extracted_data, data_version, requested_by)
+    return None
+
+
+def enqueue_monthly_rebuild(db, extracted_data: Dict, data_version: str,
+                            requested_by: str = None) -> str:
+    """Queue a background job that rebuilds and persists the monthly frame"""
+    def rebuild(ctx) -> Dict[str, Any]:
+        ctx.progress('monthly', 0, "Gerando dados mensais...")
+        monthly_df = build_monthly_artifact(db, extracted_data, data_version)
+        if monthly_df is None:
+            raise RuntimeError("Não foi possível gerar os dados mensais")
+        return {'summary': {'data_version': data_version, 'rows': len(monthly_df)}}
+
+    return get_job_runner(db).submit(
+        MONTHLY_REBUILD_JOB_TYPE,
+        rebuild,
+        created_by=requested_by,
+        params={'data_version': data_version}
+    )
+
+
+def get_monthly_rebuild_job(db) -> Optional[Dict[str, Any]]:
+    """Latest monthly rebuild job record (None if there never was one)"""
+    return get_job_runner(db).get_latest_job(MONTHLY_REBUILD_JOB_TYPE)
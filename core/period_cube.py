@@ -0,0 +1,181 @@
+"""
+Period aggregation cube
+Monthly base facts plus quarter, semester, rolling-3-month, YTD and TTM
+rollups for every metric, built once per data version and sliced by the
+dashboard and micro analysis views instead of re-aggregating on each rerun.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from core.artifact_store import get_artifact_store, frame_fingerprint
+from core.metrics_engine import safe_ratio
+from utils.tracing import traced
+
+
+MONTHS = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN',
+          'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+
+# Index of each grain: (year, <period column>)
+GRAIN_INDEX = {
+    'month': 'month_num',
+    'quarter': 'quarter',
+    'semester': 'semester',
+    'rolling_3m': 'month_num',
+    'ytd': 'month_num',
+    'ttm': 'month_num',
+}
+
+_KEY_COLUMNS = {'year', 'month', 'month_num', 'quarter', 'semester', 'period', 'date', 'month_year'}
+_RATIO_COLUMNS = {'profit_margin', 'gross_margin', 'operational_efficiency'}
+
+
+def monthly_facts_from_data(data: Dict, fields: List[str]) -> pd.DataFrame:
+    """Flatten {year: {field: {'monthly': {...}}}} into one row per (year, month)
+
+    Every year gets all 12 months; missing values are 0.
+    """
+    rows = []
+    for year, year_data in data.items():
+        if not isinstance(year_data, dict):
+            continue
+        monthly_by_field = {
+            field: (year_data[field].get('monthly', {}) or {}) if isinstance(year_data.get(field), dict) else {}
+            for field in fields
+        }
+        for month_idx, month in enumerate(MONTHS):
+            row = {'year': int(year), 'month': month, 'month_num': month_idx + 1}
+            for field in fields:
+                row[field] = monthly_by_field[field].get(month, 0)
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+class PeriodCube:
+    """Immutable set of period rollups indexed by (year, period)"""
+
+    def __init__(self, monthly_df: pd.DataFrame, metrics: Optional[List[str]] = None):
+        base = monthly_df.copy()
+        if 'month_num' not in base.columns and 'month' in base.columns:
+            base['month_num'] = base['month'].map({m: i + 1 for i, m in enumerate(MONTHS)})
+        base = base.dropna(subset=['year', 'month_num'])
+        base['year'] = base['year'].astype(int)
+        base['month_num'] = base['month_num'].astype(int)
+
+        if metrics is None:
+            metrics = [
+                c for c in base.select_dtypes(include='number').columns
+                if c not in _KEY_COLUMNS and c not in _RATIO_COLUMNS and not c.endswith('_growth')
+            ]
+        self.metrics = [m for m in metrics if m in base.columns]
+        base[self.metrics] = base[self.metrics].apply(pd.to_numeric, errors='coerce').fillna(0)
+
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self._build(base)
+
+    @traced()
+    def _build(self, base: pd.DataFrame) -> None:
+        metrics = self.metrics
+        monthly = base.groupby(['year', 'month_num'], sort=True)[metrics].sum()
+        monthly_margin = self._margin(monthly)
+
+        years = monthly.index.get_level_values('year')
+        month_nums = monthly.index.get_level_values('month_num')
+
+        # Base monthly facts
+        month = monthly.copy()
+        month['profit_margin'] = monthly_margin
+        month['month'] = [MONTHS[m - 1] for m in month_nums]
+        month['period'] = [f"{y}-{MONTHS[m - 1]}" for y, m in zip(years, month_nums)]
+        month['month_year'] = [f"{MONTHS[m - 1]} {y}" for y, m in zip(years, month_nums)]
+        self.frames['month'] = month
+
+        # Calendar rollups: quarter and semester
+        for grain, size, prefix in (('quarter', 3, 'Q'), ('semester', 6, 'S')):
+            keys = [years, pd.Index((month_nums - 1) // size + 1, name=grain)]
+            rollup = monthly.groupby(keys, sort=True)[metrics].sum()
+            rollup.index.names = ['year', grain]
+            rollup['profit_margin'] = self._margin(rollup)
+            rollup['profit_margin_avg'] = monthly_margin.groupby(keys, sort=True).mean().to_numpy()
+            rollup['period'] = [f"{y}-{prefix}{p}" for y, p in rollup.index]
+            self.frames[grain] = rollup
+
+        # Window rollups run over a gap-free calendar so windows cross year boundaries
+        calendar = pd.MultiIndex.from_product(
+            [range(years.min(), years.max() + 1), range(1, 13)], names=['year', 'month_num']
+        )
+        present = calendar.isin(monthly.index)
+        full = monthly.reindex(calendar, fill_value=0)
+        full_margin = monthly_margin.reindex(calendar)
+        present_count = pd.Series(present.astype(int), index=calendar)
+
+        for grain, window in (('rolling_3m', 3), ('ttm', 12)):
+            rollup = full.rolling(window, min_periods=1).sum()
+            rollup['profit_margin'] = self._margin(rollup)
+            rollup['profit_margin_avg'] = full_margin.rolling(window, min_periods=1).mean()
+            rollup['months_in_window'] = present_count.rolling(window, min_periods=1).sum().astype(int)
+            rollup['complete'] = rollup['months_in_window'] == window
+            self.frames[grain] = self._label_months(rollup[present])
+
+        ytd = full.groupby(level='year').cumsum()
+        ytd['profit_margin'] = self._margin(ytd)
+        ytd['months_in_window'] = present_count.groupby(level='year').cumsum()
+        self.frames['ytd'] = self._label_months(ytd[present])
+
+    @staticmethod
+    def _margin(frame: pd.DataFrame) -> pd.Series:
+        if 'revenue' not in frame.columns or 'net_profit' not in frame.columns:
+            return pd.Series(0.0, index=frame.index)
+        return pd.Series(safe_ratio(frame['net_profit'], frame['revenue']), index=frame.index)
+
+    @staticmethod
+    def _label_months(frame: pd.DataFrame) -> pd.DataFrame:
+        frame = frame.copy()
+        years = frame.index.get_level_values('year')
+        month_nums = frame.index.get_level_values('month_num')
+        frame['month'] = [MONTHS[m - 1] for m in month_nums]
+        frame['period'] = [f"{y}-{MONTHS[m - 1]}" for y, m in zip(years, month_nums)]
+        return frame
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(self.frames['month'].index.get_level_values('year').unique())
+
+    def slice(self, grain: str, years: Optional[List] = None, periods: Optional[List[int]] = None,
+              columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Return a flat copy of one grain filtered by years and period numbers
+
+        The (year, period) index is returned as regular columns named after
+        the grain (e.g. 'year' and 'quarter').
+        """
+        if grain not in self.frames:
+            raise ValueError(f"Unknown grain: {grain}")
+        frame = self.frames[grain]
+        mask = np.ones(len(frame), dtype=bool)
+        if years is not None:
+            mask &= frame.index.get_level_values('year').isin([int(y) for y in years])
+        if periods is not None:
+            mask &= frame.index.get_level_values(GRAIN_INDEX[grain]).isin(periods)
+        result = frame[mask].reset_index()
+        if columns is not None:
+            result = result[[c for c in columns if c in result.columns]]
+        return result.copy()
+
+
+def get_period_cube(monthly_df: pd.DataFrame, data_version: Optional[str] = None,
+                    metrics: Optional[List[str]] = None) -> Optional[PeriodCube]:
+    """Return the shared PeriodCube for a monthly frame, building it on first use
+
+    None only when there is no monthly data; errors building the cube
+    propagate so callers do not mistake them for missing data.
+    """
+    if monthly_df is None or not isinstance(monthly_df, pd.DataFrame) or monthly_df.empty:
+        return None
+    data_version = data_version or frame_fingerprint(monthly_df)
+    return get_artifact_store().get_or_compute(
+        'period_cube',
+        data_version,
+        lambda: PeriodCube(monthly_df, metrics),
+        params={'metrics': metrics}
+    )
@@ -13,6 +13,7 @@ from core.extractors.marketing_expense_extractor import MarketingExpenseExtracto
 from core.extractors.financial_expense_extractor import FinancialExpenseExtractor
 from core.profit_extractor import ProfitExtractor
 from core.extractors.universal_line_extractor import UniversalLineExtractor
+from utils.tracing import traced
 
 class UnifiedFinancialExtractor:
     def __init__(self):
@@ -28,6 +29,7 @@ class UnifiedFinancialExtractor:
         self.profit_extractor = ProfitExtractor()
         self.universal_line_extractor = UniversalLineExtractor()
 
+    @traced()
     def extract_from_excel(self, file_path: str) -> Dict[int, Dict]:
         extracted_data = {}
         try:
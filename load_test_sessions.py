@@ -0,0 +1,442 @@
+"""
+Load test the dashboard with concurrent simulated sessions.
+
+Every session drives app_refactored.py through ``streamlit.testing.v1.AppTest``:
+it logs in as a test user, reruns the app as a user moving between tabs
+does, changes the dashboard period filters and opens the micro analysis
+views. Data comes from a synthetic workbook run through the real pipeline,
+the test user lives in a temporary auth.db and the model backend is the
+offline stub, so nothing outside the temporary DATA_PATH is touched.
+
+AppTest is not safe to run from several threads of one process (tabs and
+forms of different sessions get mixed up), so each session runs in its own
+worker process against the same DATA_PATH: SQLite sees the same concurrent
+writers as on the server, but process-wide caches are per session here.
+
+Reported for the given concurrency level:
+- rerun latency percentiles per step and overall
+- time spent in SQLite write statements and commits (which includes waiting
+  for the write lock held by other sessions) and "database is locked" errors
+- peak RSS per session process, and the RSS one server process would reach
+  (largest import baseline plus every session's growth above it, an upper
+  bound because shared caches are counted once per session)
+- the slowest spans recorded by utils.tracing
+
+Usage: python load_test_sessions.py [--sessions N] [--iterations N] [--items N]
+                                    [--timeout S] [--json PATH] [--keep-data]
+Exits with status 1 when a session fails (exception in the app or a step that errors).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(PROJECT_ROOT, 'app_refactored.py')
+
+TEST_EMAIL = 'loadtest@example.com'
+TEST_PASSWORD = 'LoadTest#2024'
+
+MB = 1024 * 1024
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'BEGIN', 'CREATE', 'DROP', 'COMMIT')
+
+
+class DBTimings:
+    """Durations of SQLite write statements and commits across all threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.write_ms: List[float] = []
+        self.locked_errors = 0
+
+    def record(self, duration_ms: float) -> None:
+        with self._lock:
+            self.write_ms.append(duration_ms)
+
+    def record_locked(self) -> None:
+        with self._lock:
+            self.locked_errors += 1
+
+
+_db_timings = DBTimings()
+
+
+def _timed(sql: str, call: Callable, *args):
+    is_write = sql.lstrip().upper().startswith(WRITE_STATEMENTS)
+    started = time.perf_counter()
+    try:
+        return call(*args)
+    except sqlite3.OperationalError as e:
+        if 'locked' in str(e):
+            _db_timings.record_locked()
+        raise
+    finally:
+        if is_write:
+            _db_timings.record((time.perf_counter() - started) * 1000)
+
+
+class _TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return _timed(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _timed(sql, super().executemany, sql, seq_of_parameters)
+
+
+class _TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        return _timed('COMMIT', super().commit)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            return _timed('COMMIT', super().__exit__, exc_type, exc, tb)
+        return super().__exit__(exc_type, exc, tb)
+
+
+def install_db_timing() -> None:
+    """Make every sqlite3.connect in this process return a timed connection"""
+    connect = sqlite3.connect
+
+    def timed_connect(*args, **kwargs):
+        kwargs.setdefault('factory', _TimedConnection)
+        return connect(*args, **kwargs)
+
+    sqlite3.connect = timed_connect
+
+
+def seed_data(data_dir: str, items: int) -> Dict[str, Any]:
+    """Synthetic workbook through the real pipeline, published to DATA_PATH, plus the test user"""
+    from auth.auth_manager import AuthManager
+    from core.analysis_pipeline import publish_analysis, run_analysis_pipeline
+    from core.database_manager import DatabaseManager
+    from utils.synthetic_workbook import write_synthetic_workbook
+
+    upload_dir = os.path.join(data_dir, 'arquivos_enviados')
+    os.makedirs(upload_dir, exist_ok=True)
+    path, rows = write_synthetic_workbook(os.path.join(upload_dir, 'sintetico_2018_2025.xlsx'), items=items)
+
+    started = time.perf_counter()
+    results = publish_analysis(DatabaseManager(), run_analysis_pipeline([path]), 'loadtest', TEST_EMAIL,
+                               [os.path.basename(path)])
+    pipeline_ms = (time.perf_counter() - started) * 1000
+
+    auth_manager = AuthManager()
+    with sqlite3.connect(auth_manager.db_path) as conn:
+        conn.execute("""
+            INSERT INTO users (email, username, password_hash, role, email_verified)
+            VALUES (?, ?, ?, 'user', 1)
+        """, (TEST_EMAIL, 'loadtest', auth_manager.hash_password(TEST_PASSWORD)))
+
+    return {'rows_per_sheet': rows, 'years': len(results['published_data']),
+            'data_version': results['data_version'], 'pipeline_ms': round(pipeline_ms, 1)}
+
+
+def _widget(at, kind: str, key: str):
+    """Widget of the current page by key, or None when it is not rendered"""
+    try:
+        return getattr(at, kind)(key=key)
+    except KeyError:
+        return None
+
+
+def _toggle_view_type(at) -> bool:
+    view_type = _widget(at, 'selectbox', 'view_type')
+    if view_type is None:
+        return False
+    view_type.set_value('Mensal' if view_type.value == 'Anual' else 'Anual')
+    return True
+
+
+def _select_years(at) -> bool:
+    years = _widget(at, 'multiselect', 'dashboard_selected_years')
+    if years is None:
+        # Annual view has no year filter
+        return _toggle_view_type(at)
+    years.set_value(years.options[-2:])
+    return True
+
+
+def _micro_view_type(at) -> bool:
+    view_type = _widget(at, 'selectbox', 'micro_view_type')
+    if view_type is None:
+        return False
+    options = list(view_type.options)
+    view_type.set_value(options[(options.index(view_type.value) + 1) % len(options)])
+    return True
+
+
+def _micro_details(at) -> bool:
+    checkboxes = [_widget(at, 'checkbox', key) for key in ('group_yoy', 'show_fixed_costs_analysis')]
+    checkboxes = [checkbox for checkbox in checkboxes if checkbox is not None]
+    for checkbox in checkboxes:
+        checkbox.set_value(not checkbox.value)
+    return bool(checkboxes)
+
+
+# (step name, widget change before the rerun; returns False when its widgets are
+# missing). Tabs switch in the browser without a rerun (every tab is rendered
+# on each run), so moving between tabs is a plain rerun.
+SCENARIO = [
+    ('navigate', lambda at: True),
+    ('filter_view_type', _toggle_view_type),
+    ('filter_years', _select_years),
+    ('micro_view_type', _micro_view_type),
+    ('micro_details', _micro_details),
+]
+
+
+class Session:
+    """One simulated user: login, then the scenario ``iterations`` times"""
+
+    def __init__(self, index: int, iterations: int, timeout: float):
+        self.name = f'session-{index}'
+        self.iterations = iterations
+        self.timeout = timeout
+        self.timings: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+
+    def _run_step(self, at, name: str, prepare: Callable = None) -> None:
+        started = time.perf_counter()
+        try:
+            if prepare is not None and not prepare(at):
+                self.errors.append(f"{name}: widgets not rendered")
+                return
+            at.run()
+        except Exception as e:
+            self.errors.append(f"{name}: {type(e).__name__}: {e}")
+            return
+        finally:
+            self.timings.append({'step': name, 'ms': (time.perf_counter() - started) * 1000})
+        if at.exception:
+            self.errors.append(f"{name}: {at.exception[0].value}")
+
+    @staticmethod
+    def _login(at) -> bool:
+        at.text_input[0].input(TEST_EMAIL)
+        at.text_input[1].input(TEST_PASSWORD)
+        submit = next((button for button in at.button if button.label == 'Entrar'), None)
+        if submit is None:
+            return False
+        submit.click()
+        return True
+
+    def run(self, start_barrier=None) -> None:
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        if start_barrier is not None:
+            start_barrier.wait()
+        self._run_step(at, 'open')
+        self._run_step(at, 'login', self._login)
+        if 'user' not in at.session_state or not at.session_state['user']:
+            self.errors.append("login: not authenticated")
+            return
+
+        for _ in range(self.iterations):
+            for name, prepare in SCENARIO:
+                self._run_step(at, name, prepare)
+
+
+def _session_worker(index: int, iterations: int, timeout: float, start_barrier, results) -> None:
+    """Worker process: import the app modules, run one session and report its measurements"""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    from profile_imports import APP_MODULES
+    for module in APP_MODULES:
+        __import__(module)
+    from utils.session_memory import process_rss_bytes
+    from utils.tracing import get_span_stats
+
+    install_db_timing()
+    session = Session(index, iterations, timeout)
+    rss_baseline = process_rss_bytes() or 0
+    try:
+        session.run(start_barrier)
+    except Exception as e:
+        session.errors.append(f"{type(e).__name__}: {e}")
+    results.put({
+        'name': session.name,
+        'timings': session.timings,
+        'errors': session.errors,
+        'db_write_ms': _db_timings.write_ms,
+        'locked_errors': _db_timings.locked_errors,
+        'rss_baseline': rss_baseline,
+        # ru_maxrss is in KB on Linux
+        'rss_peak': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'spans': get_span_stats(),
+    })
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50_ms': round(_percentile(values, 0.50), 1),
+        'p95_ms': round(_percentile(values, 0.95), 1),
+        'p99_ms': round(_percentile(values, 0.99), 1),
+        'max_ms': round(values[-1], 1),
+        'total_ms': round(sum(values), 1),
+    }
+
+
+def _merge_spans(span_lists: List[List[Dict[str, Any]]], top: int = 10) -> List[Dict[str, Any]]:
+    """Calls summed across sessions, p95 of the worst session"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for spans in span_lists:
+        for stat in spans:
+            entry = merged.setdefault(stat['span'], {'span': stat['span'], 'calls': 0, 'p95_ms': 0.0})
+            entry['calls'] += stat['calls']
+            entry['p95_ms'] = max(entry['p95_ms'], stat['p95_ms'])
+    return sorted(merged.values(), key=lambda stat: -stat['p95_ms'])[:top]
+
+
+def run_load_test(sessions: int, iterations: int, items: int, timeout: float,
+                  data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Seed a temporary DATA_PATH, run the sessions concurrently and return the report"""
+    data_dir = data_dir or tempfile.mkdtemp(prefix='marine_load_')
+    os.environ['DATA_PATH'] = data_dir
+    os.environ.setdefault('AI_MODEL_BACKEND', 'stub')
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+
+    seed = seed_data(data_dir, items)
+
+    context = multiprocessing.get_context('spawn')
+    start_barrier = context.Barrier(sessions)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_session_worker, args=(i, iterations, timeout, start_barrier, results),
+                        name=f'session-{i}')
+        for i in range(sessions)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    reports = []
+    for worker in workers:
+        try:
+            reports.append(results.get(timeout=timeout * (2 + iterations * len(SCENARIO))))
+        except Exception:
+            break
+    for worker in workers:
+        worker.join(timeout=5)
+        if worker.is_alive():
+            worker.terminate()
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    errors = {report['name']: report['errors'] for report in reports if report['errors']}
+    finished = {report['name'] for report in reports}
+    for worker in workers:
+        if worker.name not in finished:
+            errors[worker.name] = [f"worker exited without a report (exit code {worker.exitcode})"]
+
+    timings = [timing for report in reports for timing in report['timings']]
+    steps = ['open', 'login'] + [name for name, _ in SCENARIO]
+    baseline = max((report['rss_baseline'] for report in reports), default=0)
+    growth = sum(max(0, report['rss_peak'] - report['rss_baseline']) for report in reports)
+    return {
+        'sessions': sessions,
+        'iterations': iterations,
+        'data_dir': data_dir,
+        'seed': seed,
+        'wall_ms': round(wall_ms, 1),
+        'reruns': _summary([timing['ms'] for timing in timings]),
+        'steps': {step: _summary([t['ms'] for t in timings if t['step'] == step]) for step in steps},
+        'db_writes': {
+            **_summary([ms for report in reports for ms in report['db_write_ms']]),
+            'locked_errors': sum(report['locked_errors'] for report in reports),
+        },
+        'rss_baseline_mb': round(baseline / MB, 1),
+        'rss_session_peak_mb': round(max((r['rss_peak'] for r in reports), default=0) / MB, 1),
+        'rss_single_process_mb': round((baseline + growth) / MB, 1),
+        'slowest_spans': _merge_spans([report['spans'] for report in reports]),
+        'errors': errors,
+    }
+
+
+def _format_summary(label: str, summary: Dict[str, Any]) -> str:
+    if not summary.get('count'):
+        return f"{label:<22} {'-':>7}"
+    return (f"{label:<22} {summary['count']:>7} {summary['p50_ms']:>9,.0f} {summary['p95_ms']:>9,.0f} "
+            f"{summary['p99_ms']:>9,.0f} {summary['max_ms']:>9,.0f}")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    seed = report['seed']
+    print(f"\n=== {report['sessions']} sessions x {report['iterations']} iterations "
+          f"in {report['wall_ms'] / 1000:,.1f} s")
+    print(f"Data: {seed['years']} years, {seed['rows_per_sheet']} rows per sheet "
+          f"(pipeline + publish {seed['pipeline_ms']:,.0f} ms), DATA_PATH {report['data_dir']}")
+
+    print(f"\n{'rerun latency':<22} {'runs':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for step, summary in report['steps'].items():
+        print(_format_summary(step, summary))
+    print(_format_summary('all reruns', report['reruns']))
+
+    db_writes = report['db_writes']
+    print(f"\n{'sqlite writes/commits':<22} {'stmts':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print(_format_summary('write + lock wait', db_writes))
+    print(f"Total time in writes: {db_writes.get('total_ms', 0):,.0f} ms | "
+          f"'database is locked' errors: {db_writes['locked_errors']}")
+
+    print(f"\nRSS: {report['rss_baseline_mb']:,.1f} MB after imports, "
+          f"{report['rss_session_peak_mb']:,.1f} MB peak of one session process, "
+          f"~{report['rss_single_process_mb']:,.1f} MB for all sessions in one process (upper bound)")
+
+    print("\nSlowest spans by p95 (worst session):")
+    for stat in report['slowest_spans']:
+        print(f"{stat['p95_ms']:>10,.1f} ms p95 {stat['calls']:>6} calls  {stat['span']}")
+
+    for name, errors in report['errors'].items():
+        print(f"❌ {name}: {len(errors)} error(s), first: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=5, help="concurrent sessions")
+    parser.add_argument('--iterations', type=int, default=3, help="scenario repetitions per session")
+    parser.add_argument('--items', type=int, default=10, help="line items per section in the synthetic workbook")
+    parser.add_argument('--timeout', type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument('--json', help="also write the report to this file")
+    parser.add_argument('--keep-data', action='store_true', help="keep the temporary DATA_PATH")
+    args = parser.parse_args()
+
+    report = run_load_test(args.sessions, args.iterations, args.items, args.timeout)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if not args.keep_data:
+        shutil.rmtree(report['data_dir'], ignore_errors=True)
+
+    if report['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
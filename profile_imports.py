@@ -0,0 +1,119 @@
+"""
+Profile module import time with ``python -X importtime`` and check it
+against a budget.
+
+Two phases are measured in fresh interpreters:
+- login: what app_refactored.py imports before the login gate
+- app:   everything imported once the user is logged in
+
+The login phase must also stay free of the heavy modules listed in
+LOGIN_FORBIDDEN (they are loaded lazily on first use).
+
+Usage: python profile_imports.py [--login-budget MS] [--app-budget MS] [--top N]
+Exits with status 1 when a budget is exceeded or a forbidden module is imported.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+LOGIN_MODULES = [
+    'streamlit',
+    'dotenv',
+    'auth',
+    'core.database_manager',
+]
+
+APP_MODULES = LOGIN_MODULES + [
+    'core.artifact_store',
+    'utils.legacy_helpers',
+    'utils.formatters',
+    'ui.tabs.upload_legacy_tab',
+    'ui.tabs.dashboard_legacy_tab',
+    'ui.tabs.micro_analysis',
+    'ui.tabs.ai_insights_legacy_tab',
+    'ui.tabs.ai_chat_legacy_tab',
+    'ui.tabs.auth_management_tab_simple',
+    'ui.tabs.debug_extractors_tab',
+]
+
+# Must not be imported before the login form renders
+# (plotly.graph_objects is not listed: streamlit itself imports it)
+LOGIN_FORBIDDEN = ['google.generativeai', 'pandas', 'plotly.express', 'visualizations.charts']
+
+# Milliseconds; generous defaults for a cold container
+DEFAULT_LOGIN_BUDGET_MS = 1000
+DEFAULT_APP_BUDGET_MS = 3000
+
+
+def measure(modules: List[str]) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Import ``modules`` in a fresh interpreter
+
+    Returns:
+        (wall-clock ms of the imports, {module: (self us, cumulative us)})
+    """
+    project_root = os.path.dirname(os.path.abspath(__file__))
+    code = (
+        "import time; _t = time.perf_counter()\n"
+        + "".join(f"import {name}\n" for name in modules)
+        + "print((time.perf_counter() - _t) * 1000)"
+    )
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=project_root, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return float(proc.stdout.strip().splitlines()[-1]), timings
+
+
+def report(phase: str, modules: List[str], budget_ms: float, top: int,
+           forbidden: List[str] = None) -> bool:
+    elapsed_ms, timings = measure(modules)
+    ok = elapsed_ms <= budget_ms
+
+    print(f"\n=== {phase}: {elapsed_ms:,.0f} ms (budget {budget_ms:,.0f} ms) {'OK' if ok else 'OVER BUDGET'}")
+    print(f"{len(timings)} modules imported")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name in modules:
+        if name in timings:
+            self_us, cumulative_us = timings[name]
+            print(f"{cumulative_us / 1000:>14,.1f} {self_us / 1000:>9,.1f}  {name}")
+
+    print(f"\nTop {top} by self time:")
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda kv: -kv[1][0])[:top]:
+        print(f"{cumulative_us / 1000:>14,.1f} {self_us / 1000:>9,.1f}  {name}")
+
+    for name in forbidden or []:
+        if name in timings:
+            print(f"❌ {name} imported during {phase} ({timings[name][1] / 1000:,.1f} ms)")
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--login-budget', type=float, default=DEFAULT_LOGIN_BUDGET_MS)
+    parser.add_argument('--app-budget', type=float, default=DEFAULT_APP_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    login_ok = report('login', LOGIN_MODULES, args.login_budget, args.top, LOGIN_FORBIDDEN)
+    app_ok = report('app', APP_MODULES, args.app_budget, args.top)
+
+    if not (login_ok and app_ok):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
 """Tab components for the Marine Seguros dashboard"""
 
-from .dashboard_tab import render_dashboard_tab
-from .micro_analysis_tab import render_micro_analysis_tab
+from utils.lazy_import import lazy_exports
 
-__all__ = ['render_dashboard_tab', 'render_micro_analysis_tab']
\ No newline at end of file
+_EXPORTS = {
+    'render_dashboard_tab': '.dashboard_tab',
+    'render_micro_analysis_tab': '.micro_analysis_tab',
+}
+
+__getattr__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = list(_EXPORTS)
@@ -5,8 +5,10 @@ Preserves all original functionality while organizing code
 
 import streamlit as st
 from ai.chat_assistant import AIChatAssistant
+from utils.tracing import traced
 
 
+@traced()
 def render_ai_chat_tab(gemini_api_key):
     """Render the AI chat tab with conversational interface"""
     
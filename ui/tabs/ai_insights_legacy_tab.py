@@ -6,10 +6,14 @@ Preserves all original functionality while organizing code
 
 import streamlit as st
 import pandas as pd
+from contextlib import closing
 from core.ai_analyzer import AIAnalyzer
+from core.insights_report import generate_insights_report
 from utils.legacy_helpers import process_detailed_monthly_data
+from utils.tracing import traced
 
 
+@traced()
 def render_ai_insights_tab(db, gemini_api_key, language):
     """Render the AI insights tab with Gemini AI analysis"""
     
@@ -43,7 +47,7 @@ def render_ai_insights_tab(db, gemini_api_key, language):
             st.session_state.extracted_data = shared_data
             print(f"DEBUG: Loaded {len(shared_data)} years from database")
 
-    tab1, tab2 = st.tabs(["Análise Macro", "Análise Micro"])
+    tab1, tab2, tab3 = st.tabs(["Análise Macro", "Análise Micro", "Relatório Completo"])
 
     with tab1:
         render_macro_analysis(db, ai_analyzer)
@@ -51,6 +55,17 @@ def render_ai_insights_tab(db, gemini_api_key, language):
     with tab2:
         render_micro_analysis(db, ai_analyzer)
 
+    with tab3:
+        render_full_report(db, ai_analyzer)
+
+def _render_latency_caption(response):
+    """Time to first token and total time of a streamed model response"""
+    if response.cached:
+        st.caption("♻️ Resposta reutilizada do cache (mesmos dados e pergunta)")
+    elif response.ttft_ms is not None:
+        st.caption(f"⏱️ Primeira resposta em {response.ttft_ms / 1000:.1f}s | Total: {response.total_ms / 1000:.1f}s")
+
+
 def generate_ai_prompt(df, all_data):
     language_instruction = "Responda em Português."
     analysis_request = "Por favor, analise os seguintes dados financeiros da Marine Seguros e forneça insights detalhados de negócios:"
@@ -342,16 +357,18 @@ def render_macro_analysis(db, ai_analyzer):
                             print(f"Years in data: {df['year'].min()} to {df['year'].max()}")
                             print(prompt)
                             
-                            # Generate insights
-                            response = ai_analyzer.model.generate_content(prompt)
+                            # Stream insights as they are generated
+                            st.markdown("### 📊 Relatório de Análise de Negócios")
+                            response = ai_analyzer.model.stream_content(
+                                prompt, data_version=st.session_state.get('data_version')
+                            )
+                            with closing(response):
+                                st.write_stream(response)
+                            _render_latency_caption(response)
                             
                             # Store in session state
                             st.session_state.gemini_insights = response.text
                             
-                            # Display insights
-                            st.markdown("### 📊 Relatório de Análise de Negócios")
-                            st.markdown(response.text)
-                            
                             # Save to database
                             db.auto_save_state(st.session_state)
                     else:
@@ -367,6 +384,97 @@ def render_macro_analysis(db, ai_analyzer):
         st.info("👆 Por favor, carregue os arquivos e processe os dados na aba 'Upload' primeiro.")
 
 
+def _line_items_frame():
+    """Detailed expense line items of the flexible data, with Portuguese column names"""
+    detailed_data = process_detailed_monthly_data(st.session_state.flexible_data)
+    if not detailed_data or not detailed_data['line_items']:
+        return pd.DataFrame()
+
+    df_line_items = pd.DataFrame(detailed_data['line_items'])
+    
+    # Select relevant columns for analysis
+    analysis_df = df_line_items[[
+        'ano', 'subcategoria_principal_nome', 
+        'subcategoria_nome', 'descricao', 'valor_anual'
+    ]].copy()
+    analysis_df.rename(columns={
+        'ano': 'Ano',
+        'subcategoria_principal_nome': 'Categoria Principal',
+        'subcategoria_nome': 'Subcategoria',
+        'descricao': 'Descrição',
+        'valor_anual': 'Valor Anual'
+    }, inplace=True)
+    return analysis_df
+
+
+def _consolidated_frame():
+    """Annual consolidated data of processed_data (years with revenue only) and its raw data"""
+    processed_data = getattr(st.session_state, 'processed_data', None) or {}
+    consolidated = processed_data.get('consolidated', pd.DataFrame())
+    if consolidated is None or consolidated.empty or 'revenue' not in consolidated.columns:
+        return pd.DataFrame(), {}
+
+    df = consolidated.copy()
+    for col in ['revenue', 'variable_costs', 'fixed_costs', 'net_profit', 'profit_margin']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(
+                df[col].apply(lambda x: x.get('annual', 0) if isinstance(x, dict) else x),
+                errors='coerce'
+            ).fillna(0)
+    return df[df['revenue'] > 0], processed_data.get('raw_data', {})
+
+
+@traced()
+def render_full_report(db, ai_analyzer):
+    """Render the combined report: macro, micro and category deep dives generated in parallel"""
+    st.subheader("🧾 Relatório Completo de Insights")
+    st.caption("Análise macro, análise de despesas e aprofundamento nas maiores categorias, geradas em paralelo.")
+
+    data_version = st.session_state.get('data_version')
+    report = db.get_latest_insights_report(data_version)
+
+    if st.button("🚀 Gerar Relatório Completo", type="primary", key="generate_full_report"):
+        df, all_data = _consolidated_frame()
+        macro_prompt = generate_ai_prompt(df, all_data) if not df.empty else None
+        line_items = pd.DataFrame()
+        if hasattr(st.session_state, 'flexible_data') and st.session_state.flexible_data:
+            try:
+                line_items = _line_items_frame()
+            except Exception as e:
+                st.warning(f"Não foi possível preparar os itens detalhados: {e}")
+
+        if macro_prompt is None and line_items.empty:
+            st.info("👆 Por favor, carregue os arquivos e processe os dados na aba 'Upload' primeiro.")
+            return
+
+        user = st.session_state.get('user') or {}
+        with st.spinner("Gerando as seções do relatório em paralelo..."):
+            report = generate_insights_report(
+                db, ai_analyzer, macro_prompt, line_items,
+                data_version=data_version, created_by=user.get('username')
+            )
+
+    if not report:
+        st.info("Nenhum relatório gerado para os dados atuais.")
+        return
+
+    failed = [section for section in report['sections'] if section['error']]
+    st.caption(
+        f"Gerado em {report['created_at']} | {len(report['sections'])} seções em "
+        f"{report['total_ms'] / 1000:.1f}s (sequencial: {report['sequential_ms'] / 1000:.1f}s)"
+        + (f" | ⚠️ {len(failed)} com erro" if failed else "")
+    )
+    for section in report['sections']:
+        st.markdown(f"### {section['title']}")
+        if section['error']:
+            st.error(f"Erro ao gerar esta seção: {section['error']}")
+        else:
+            st.markdown(section['text'])
+            if section['cached']:
+                st.caption("♻️ Resposta reutilizada do cache (mesmos dados e pergunta)")
+        st.markdown("---")
+
+
 def render_micro_analysis(db, ai_analyzer):
     """Render the micro analysis section"""
     st.subheader("🔬 Análise de Despesas de Nível Micro")
@@ -375,32 +483,20 @@ def render_micro_analysis(db, ai_analyzer):
         if st.button("🕵️ Analisar Despesas Detalhadas", type="primary"):
             with st.spinner("Realizando análise aprofundada das despesas..."):
                 try:
-                    # Process data to get line items
-                    detailed_data = process_detailed_monthly_data(st.session_state.flexible_data)
+                    analysis_df = _line_items_frame()
                     
-                    if detailed_data and detailed_data['line_items']:
-                        df_line_items = pd.DataFrame(detailed_data['line_items'])
-                        
-                        # Select relevant columns for analysis
-                        analysis_df = df_line_items[[
-                            'ano', 'subcategoria_principal_nome', 
-                            'subcategoria_nome', 'descricao', 'valor_anual'
-                        ]].copy()
-                        analysis_df.rename(columns={
-                            'ano': 'Ano',
-                            'subcategoria_principal_nome': 'Categoria Principal',
-                            'subcategoria_nome': 'Subcategoria',
-                            'descricao': 'Descrição',
-                            'valor_anual': 'Valor Anual'
-                        }, inplace=True)
-
-                        # Generate insights
-                        insights = ai_analyzer.generate_micro_analysis_insights(analysis_df)
-                        
-                        # Store and display insights
-                        st.session_state.micro_insights = insights
+                    if not analysis_df.empty:
+                        # Stream insights as they are generated
                         st.markdown("### 📝 Relatório de Análise de Nível Micro")
-                        st.markdown(insights)
+                        response = ai_analyzer.stream_micro_analysis_insights(
+                            analysis_df, data_version=st.session_state.get('data_version')
+                        )
+                        with closing(response):
+                            st.write_stream(response)
+                        _render_latency_caption(response)
+                        
+                        # Store insights
+                        st.session_state.micro_insights = response.text
                         
                         # Save to database
                         db.auto_save_state(st.session_state)
@@ -4,14 +4,122 @@ Debug tool to verify if extractors are working correctly
 
 import streamlit as st
 import pandas as pd
+import plotly.graph_objects as go
 from core.unified_extractor import UnifiedFinancialExtractor
 from utils import format_currency
 import json
 import tempfile
 import os
+from utils.tracing import (
+    get_span_stats, get_traces, reset_traces, set_tracing_enabled, tracing_enabled
+)
+from utils.session_memory import MB, enforce_session_memory, get_process_memory
+
+def render_performance_panel():
+    """Flame-style breakdown of this session's recent rerun traces and p50/p95 per span"""
+    with st.expander("⏱️ Performance traces", expanded=False):
+        # Tracing and the trace buffer are process-wide: only admins change them
+        user = st.session_state.get('user') or {}
+        if user.get('role') == 'admin':
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                enabled = st.checkbox("Enable span tracing (all sessions)", value=tracing_enabled(),
+                                      key="perf_tracing_enabled")
+                if enabled != tracing_enabled():
+                    set_tracing_enabled(enabled)
+            with col2:
+                if st.button("Clear traces", key="perf_clear_traces"):
+                    reset_traces()
+        else:
+            st.caption(f"Span tracing is {'on' if tracing_enabled() else 'off'} for this server "
+                       "(admins can change it).")
+
+        traces = get_traces(st.session_state.get('perf_trace_key'))
+        if not traces:
+            st.info("No traces recorded yet. Interact with the app and come back to this tab.")
+            return
+
+        # Newest first; the current rerun is still open and not listed
+        options = list(range(len(traces) - 1, -1, -1))
+        selected = st.selectbox(
+            "Rerun",
+            options,
+            format_func=lambda i: (
+                f"{traces[i]['started_at']} - {traces[i]['total_ms']:,.0f} ms"
+                + (" (interrupted)" if traces[i]['interrupted'] else "")
+            ),
+            key="perf_trace_select"
+        )
+        trace = traces[selected]
+        spans = trace['spans']
+        if spans:
+            fig = go.Figure(go.Bar(
+                y=[f"depth {s['depth']}" for s in spans],
+                x=[s['duration_ms'] for s in spans],
+                base=[s['start_ms'] for s in spans],
+                orientation='h',
+                text=[s['name'] for s in spans],
+                textposition='inside',
+                insidetextanchor='start',
+                hovertemplate="%{text}<br>start %{base:,.1f} ms<br>%{x:,.1f} ms<extra></extra>",
+                marker_color=['#d62728' if s.get('error') else '#1f77b4' for s in spans]
+            ))
+            fig.update_layout(
+                height=120 + 40 * (max(s['depth'] for s in spans) + 1),
+                xaxis_title="ms since rerun start",
+                yaxis=dict(autorange='reversed'),
+                margin=dict(l=10, r=10, t=30, b=10),
+                title=f"Rerun {trace['started_at']} ({trace['total_ms']:,.0f} ms)"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.caption("No spans recorded in this rerun.")
+
+        st.markdown("**Spans (all reruns and background work)**")
+        stats = get_span_stats()
+        if stats:
+            st.dataframe(pd.DataFrame(stats), use_container_width=True, hide_index=True)
+
+
+def render_memory_panel():
+    """Deep size per session_state key of this session and totals of the process"""
+    with st.expander("🧠 Session memory", expanded=False):
+        report = st.session_state.get('memory_report')
+        if st.button("Measure now", key="memory_measure_now") or report is None:
+            report = enforce_session_memory(force=True)
+
+        process = get_process_memory()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("This session", f"{report['total_bytes'] / MB:,.1f} MB",
+                    help=f"Soft limit {process['session_limit_bytes'] / MB:,.0f} MB")
+        col2.metric(f"All sessions ({process['sessions']})", f"{process['sessions_bytes'] / MB:,.1f} MB",
+                    help=f"Soft limit {process['process_limit_bytes'] / MB:,.0f} MB")
+        col3.metric("Artifact store", f"{process['artifact_store_bytes'] / MB:,.1f} MB")
+        col4.metric("Process RSS", "n/a" if process['rss_bytes'] is None
+                    else f"{process['rss_bytes'] / MB:,.1f} MB")
+
+        st.caption(f"Measured at {report['measured_at']}")
+        if report.get('chat_spilled'):
+            st.warning(f"Over the soft limit: moved {report['chat_spilled']} chat messages to the database")
+
+        rows = [
+            {
+                'key': row['key'],
+                'type': row['type'],
+                'MB': None if row['bytes'] is None else round(row['bytes'] / MB, 3),
+                'note': (f"shared with {row['shared_with']}" if row['shared_with']
+                         else 'not measured' if row['bytes'] is None else ''),
+            }
+            for row in report['keys']
+        ]
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
 
 def render_debug_extractors_tab():
     st.title("🔍 Debug Extractor Results")
+
+    render_performance_panel()
+    render_memory_panel()
     
     # File uploader
     uploaded_file = st.file_uploader("Upload Excel file to debug", type=['xlsx', 'xls'])
@@ -11,10 +11,12 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from utils import format_currency
 from utils.expense_categorizer import classify_expense_subcategory, get_expense_subcategories
+from core.artifact_store import get_artifact_store, session_data_version
+from core.cost_tree import build_cost_tree, MONTHS
 from ..config import COLORS, CHART_PALETTES
 
 
-def render_interactive_cost_breakdown(financial_df, flexible_data, full_width=True):
+def render_interactive_cost_breakdown(financial_df, flexible_data, full_width=True, data_version=None):
     """
     Render interactive cost breakdown with drill-down capabilities
     
@@ -22,6 +24,7 @@ def render_interactive_cost_breakdown(financial_df, flexible_data, full_width=Tr
         financial_df: DataFrame with financial data
         flexible_data: Dictionary with detailed financial data by year
         full_width: Whether to use full width display
+        data_version: Version of flexible_data (computed if not given)
     """
     st.markdown("### 💰 Análise Hierárquica de Custos")
     
@@ -32,15 +35,15 @@ def render_interactive_cost_breakdown(financial_df, flexible_data, full_width=Tr
     # Render breadcrumb navigation
     _render_breadcrumb_navigation()
     
-    # Process and categorize all expenses
-    categorized_data = _categorize_expenses(financial_df, flexible_data)
+    # Categorize all expenses and build the drill-down tree (shared per data version)
+    categorized_data, cost_tree = _get_cost_tree(financial_df, flexible_data, data_version)
     
     if not categorized_data:
         st.warning("Nenhum dado de custo encontrado para análise hierárquica.")
         return
     
     # Get current level data based on navigation path
-    current_level_data = _get_current_level_data(categorized_data, st.session_state.cost_hierarchy_path)
+    current_level_data = _get_current_level_data(cost_tree, st.session_state.cost_hierarchy_path)
     
     # Render summary cards
     _render_summary_cards(current_level_data, flexible_data)
@@ -94,6 +97,37 @@ def _render_breadcrumb_navigation():
         st.markdown("**📍 Custos**")
 
 
+def _get_cost_tree(financial_df, flexible_data, data_version=None):
+    """Return (categorized_data, cost_tree) for the years in financial_df"""
+    if data_version is None:
+        data_version = session_data_version(st.session_state)
+    years = sorted(int(y) for y in financial_df['year'].unique())
+    
+    def build():
+        categorized_data = _categorize_expenses(financial_df, flexible_data)
+        return {'categorized': categorized_data, 'tree': build_cost_tree(categorized_data)}
+    
+    artifact = get_artifact_store().get_or_compute('cost_tree', data_version, build, params={'years': years})
+    return artifact['categorized'], artifact['tree']
+
+
+def _monthly_values(data):
+    """Monthly values of a line item as {MONTH: value}"""
+    monthly = data.get('monthly', {}) if isinstance(data, dict) else {}
+    if not isinstance(monthly, dict):
+        return {}
+    return {month: monthly[month] for month in MONTHS if isinstance(monthly.get(month), (int, float))}
+
+
+def _subtract_monthly(total, parts):
+    """total - sum(parts) per month"""
+    result = dict(total)
+    for part in parts:
+        for month, value in part.items():
+            result[month] = result.get(month, 0) - value
+    return result
+
+
 def _categorize_expenses(financial_df, flexible_data):
     """
     Categorize all expenses using universal data when available
@@ -223,6 +257,7 @@ def _categorize_expenses(financial_df, flexible_data):
             cat_data = year_data[category]
             category_total = cat_data.get('annual', 0) if isinstance(cat_data, dict) else 0
             line_items_total = 0
+            captured_monthly = []
             
             
             if 'line_items' in cat_data and isinstance(cat_data['line_items'], dict):
@@ -255,6 +290,12 @@ def _categorize_expenses(financial_df, flexible_data):
                         parent_value = item_data.get('annual', 0)
                         difference = parent_value - sub_items_total
                         
+                        sub_items_monthly = [
+                            _monthly_values(sub_data)
+                            for sub_data in item_data['sub_items'].values()
+                            if isinstance(sub_data, dict) and sub_data.get('annual', 0) > 0
+                        ]
+                        
                         if difference > 0.01:  # Small tolerance for rounding
                             # Add the difference as "Other" sub-item
                             classification = classify_expense_subcategory(label)
@@ -280,12 +321,16 @@ def _categorize_expenses(financial_df, flexible_data):
                                 }
                             
                             # Add the difference as "Other/Unspecified"
+                            difference_monthly = _subtract_monthly(_monthly_values(item_data), sub_items_monthly)
                             categorized_data[year]['categories'][main_cat]['subcategories'][sub_cat]['items'].append({
                                 'label': f"{label} - Outros/Não Especificado",
                                 'value': difference,
                                 'source_category': category,
-                                'provider': 'Outros'
+                                'provider': 'Outros',
+                                'parent_label': label,
+                                'monthly': difference_monthly
                             })
+                            captured_monthly.append(difference_monthly)
                             
                             # Update totals
                             categorized_data[year]['categories'][main_cat]['subcategories'][sub_cat]['total'] += difference
@@ -325,12 +370,16 @@ def _categorize_expenses(financial_df, flexible_data):
                                     }
                                 
                                 # Add sub-item with provider name
+                                sub_monthly = _monthly_values(sub_data)
                                 categorized_data[year]['categories'][main_cat]['subcategories'][sub_cat]['items'].append({
                                     'label': f"{label} - {sub_label}",
                                     'value': sub_value,
                                     'source_category': category,
-                                    'provider': sub_label
+                                    'provider': sub_label,
+                                    'parent_label': label,
+                                    'monthly': sub_monthly
                                 })
+                                captured_monthly.append(sub_monthly)
                                 
                                 # Update totals
                                 categorized_data[year]['categories'][main_cat]['subcategories'][sub_cat]['total'] += sub_value
@@ -365,11 +414,14 @@ def _categorize_expenses(financial_df, flexible_data):
                             }
                         
                         # Add item
+                        item_monthly = _monthly_values(item_data)
                         categorized_data[year]['categories'][main_cat]['subcategories'][sub_cat]['items'].append({
                             'label': label,
                             'value': value,
-                            'source_category': category
+                            'source_category': category,
+                            'monthly': item_monthly
                         })
+                        captured_monthly.append(item_monthly)
                         
                         # Update totals
                         categorized_data[year]['categories'][main_cat]['subcategories'][sub_cat]['total'] += value
@@ -404,7 +456,8 @@ def _categorize_expenses(financial_df, flexible_data):
                 categorized_data[year]['categories'][main_cat]['subcategories'][sub_cat]['items'].append({
                     'label': f"Outros itens não detalhados - {category.replace('_', ' ').title()}",
                     'value': uncaptured_amount,
-                    'source_category': category
+                    'source_category': category,
+                    'monthly': _subtract_monthly(_monthly_values(cat_data), captured_monthly)
                 })
                 
                 # Update totals
@@ -539,97 +592,16 @@ def _classify_by_source_category(source_category, label):
     }
 
 
-def _get_current_level_data(categorized_data, path):
-    """Get data for the current hierarchy level based on navigation path"""
-    if not path:
-        # Top level - show main categories
-        return _aggregate_main_categories(categorized_data)
-    elif len(path) == 1:
-        # Second level - show subcategories of selected main category
-        return _aggregate_subcategories(categorized_data, path[0])
-    elif len(path) == 2:
-        # Third level - show individual items of selected subcategory
-        return _aggregate_items(categorized_data, path[0], path[1])
-    else:
-        return {}
-
-
-def _aggregate_main_categories(categorized_data):
-    """Aggregate data at main category level"""
-    aggregated = {}
-    
-    for year, year_data in categorized_data.items():
-        for cat_key, cat_data in year_data['categories'].items():
-            if cat_key not in aggregated:
-                aggregated[cat_key] = {
-                    'name': cat_data['name'],
-                    'years': {},
-                    'total': 0,
-                    'item_count': 0
-                }
-            
-            aggregated[cat_key]['years'][year] = cat_data['total']
-            aggregated[cat_key]['total'] += cat_data['total']
-            
-            # Count items
-            for subcat in cat_data['subcategories'].values():
-                aggregated[cat_key]['item_count'] += len(subcat['items'])
-    
-    return aggregated
-
-
-def _aggregate_subcategories(categorized_data, main_category):
-    """Aggregate data at subcategory level for a specific main category"""
-    aggregated = {}
+def _get_current_level_data(cost_tree, path):
+    """Get data for the current hierarchy level based on navigation path
     
-    for year, year_data in categorized_data.items():
-        if main_category in year_data['categories']:
-            cat_data = year_data['categories'][main_category]
-            
-            for subcat_key, subcat_data in cat_data['subcategories'].items():
-                if subcat_key not in aggregated:
-                    aggregated[subcat_key] = {
-                        'name': subcat_data['name'],
-                        'years': {},
-                        'total': 0,
-                        'item_count': len(subcat_data['items'])
-                    }
-                
-                aggregated[subcat_key]['years'][year] = subcat_data['total']
-                aggregated[subcat_key]['total'] += subcat_data['total']
-    
-    return aggregated
-
-
-def _aggregate_items(categorized_data, main_category, subcategory):
-    """Aggregate individual items for a specific subcategory"""
-    aggregated = {}
-    
-    for year, year_data in categorized_data.items():
-        if main_category in year_data['categories']:
-            cat_data = year_data['categories'][main_category]
-            
-            if subcategory in cat_data['subcategories']:
-                subcat_data = cat_data['subcategories'][subcategory]
-                
-                for item in subcat_data['items']:
-                    item_key = item['label']
-                    
-                    if item_key not in aggregated:
-                        aggregated[item_key] = {
-                            'name': item['label'],
-                            'years': {},
-                            'total': 0,
-                            'source': item['source_category']
-                        }
-                    
-                    if year not in aggregated[item_key]['years']:
-                        aggregated[item_key]['years'][year] = 0
-                    
-                    aggregated[item_key]['years'][year] += item['value']
-                    aggregated[item_key]['total'] += item['value']
-    
-    return aggregated
+    Levels: main categories → subcategories → items → sub-items (providers).
+    Each lookup only touches the children of the selected node.
+    """
+    node = cost_tree.find(path)
+    if node is None:
+        return {}
+    return node.level_data()
 
 
 def _render_summary_cards(current_level_data, flexible_data):
@@ -856,7 +828,7 @@ def _render_detail_table(current_level_data):
     )
     
     # Add click instruction if not at bottom level
-    if len(st.session_state.cost_hierarchy_path) < 2:
+    if any(data.get('has_children') for data in current_level_data.values()):
         st.info("💡 Clique em qualquer item no gráfico acima para ver mais detalhes")
 
 
@@ -7,6 +7,13 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 
+# Monthly fields available to the periodic views
+PERIODIC_FIELDS = [
+    'revenue', 'variable_costs', 'fixed_costs', 'non_operational_costs',
+    'taxes', 'commissions', 'administrative_expenses', 'marketing_expenses',
+    'financial_expenses', 'net_profit'
+]
+
 # Import configuration
 from .config import TAB_CONFIGS, TIME_PERIOD_CONFIGS
 
@@ -24,9 +31,13 @@ from .graphs import (
 )
 
 # Import processors
-from core.group_hierarchy_processor import GroupHierarchyProcessor
+from core.group_hierarchy_processor import get_group_processor
+from core.artifact_store import get_artifact_store, session_data_version
+from core.period_cube import PeriodCube, monthly_facts_from_data
+from utils.tracing import traced
 
 
+@traced()
 def render_micro_analysis_tab(flexible_data):
     """
     Main entry point for the micro analysis tab
@@ -43,18 +54,19 @@ def render_micro_analysis_tab(flexible_data):
     # Render filters
     selected_years, view_type, selected_months = _render_filters_section(flexible_data)
     
+    # flexible_data is this session's extracted data (or the unified data it
+    # was published from), so the stored version describes it
+    data_version = session_data_version(st.session_state)
+    
     # Process data based on view type
-    df = _process_data_for_view(flexible_data, selected_years, view_type, selected_months)
+    df = _process_data_for_view(flexible_data, selected_years, view_type, selected_months, data_version)
     
     if df.empty:
         st.warning("Nenhum dado encontrado para os filtros selecionados.")
         return
     
     # Process group data
-    processor = GroupHierarchyProcessor()
-    processed_data = processor.process_data(flexible_data)
-    major_groups = processor.get_major_groups(processed_data)
-    group_df = processor.create_group_comparison_df(major_groups) if major_groups else pd.DataFrame()
+    major_groups, group_df = _get_group_artifacts(flexible_data, data_version)
     
     # Render KPI section
     render_kpi_section(df, view_type)
@@ -73,10 +85,17 @@ def render_micro_analysis_tab(flexible_data):
                 group_df, 
                 major_groups,
                 selected_years,
-                view_type
+                view_type,
+                data_version
             )
 
 
+def _get_group_artifacts(flexible_data, data_version):
+    """Return (major_groups, group_df), shared across sessions per data version"""
+    artifacts = get_group_processor().build_artifacts(flexible_data, data_version)
+    return artifacts['major_groups'], artifacts['group_df']
+
+
 def _render_filters_section(flexible_data):
     """Render the filters section"""
     st.markdown("### 🎛️ Filtros")
@@ -144,14 +163,14 @@ def _render_filters_section(flexible_data):
     return selected_years, view_type, selected_months
 
 
-def _process_data_for_view(flexible_data, selected_years, view_type, selected_months):
+def _process_data_for_view(flexible_data, selected_years, view_type, selected_months, data_version=None):
     """Process data based on the selected view type"""
     time_config = TIME_PERIOD_CONFIGS.get(view_type, TIME_PERIOD_CONFIGS['Anual'])
     
     if view_type == "Anual":
         return _process_annual_data(flexible_data, selected_years)
     else:
-        return _process_periodic_data(flexible_data, selected_years, view_type, selected_months)
+        return _process_periodic_data(flexible_data, selected_years, view_type, selected_months, data_version)
 
 
 def _process_annual_data(flexible_data, selected_years):
@@ -188,109 +207,53 @@ def _process_annual_data(flexible_data, selected_years):
     return pd.DataFrame(flat_data)
 
 
-def _process_periodic_data(flexible_data, selected_years, view_type, selected_months):
-    """Process monthly/quarterly/semester data"""
-    monthly_data = []
-    month_names = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 
-                  'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
-    
-    # Extract monthly data
-    for year, year_data in flexible_data.items():
-        if str(year) in selected_years and isinstance(year_data, dict):
-            for month_idx, month in enumerate(month_names):
-                if view_type == "Mensal" and month not in selected_months:
-                    continue
-                
-                row = {
-                    'year': year,
-                    'month': month,
-                    'month_num': month_idx + 1,
-                    'period': f"{year}-{month}"
-                }
-                
-                # Extract monthly values
-                for field in ['revenue', 'variable_costs', 'fixed_costs', 'non_operational_costs', 
-                             'taxes', 'commissions', 'administrative_expenses', 'marketing_expenses', 
-                             'financial_expenses', 'net_profit']:
-                    if field in year_data and isinstance(year_data[field], dict):
-                        monthly_values = year_data[field].get('monthly', {})
-                        row[field] = monthly_values.get(month, 0)
-                    else:
-                        row[field] = 0
-                
-                # Calculate profit margin
-                if row['revenue'] > 0:
-                    row['profit_margin'] = (row['net_profit'] / row['revenue']) * 100
-                else:
-                    row['profit_margin'] = 0
-                
-                monthly_data.append(row)
-    
-    monthly_df = pd.DataFrame(monthly_data)
-    
-    # Aggregate based on view type
-    if view_type == "Mensal":
-        return monthly_df
-    elif view_type == "Trimestral":
-        return _aggregate_quarterly(monthly_df)
-    elif view_type == "Semestral":
-        return _aggregate_semester(monthly_df)
-    
-    return monthly_df
+def _get_period_cube(flexible_data, data_version):
+    """Period cube over the monthly facts of flexible_data, shared per data version"""
+    return get_artifact_store().get_or_compute(
+        'micro_period_cube',
+        data_version,
+        lambda: PeriodCube(monthly_facts_from_data(flexible_data, PERIODIC_FIELDS), PERIODIC_FIELDS)
+    )
 
 
-def _aggregate_quarterly(monthly_df):
-    """Aggregate monthly data to quarters"""
-    monthly_df['quarter'] = (monthly_df['month_num'] - 1) // 3 + 1
-    
-    df = monthly_df.groupby(['year', 'quarter']).agg({
-        'revenue': 'sum',
-        'variable_costs': 'sum',
-        'fixed_costs': 'sum',
-        'non_operational_costs': 'sum',
-        'taxes': 'sum',
-        'commissions': 'sum',
-        'administrative_expenses': 'sum',
-        'marketing_expenses': 'sum',
-        'financial_expenses': 'sum',
-        'net_profit': 'sum'
-    }).reset_index()
-    
-    df['period'] = df.apply(lambda x: f"{int(x['year'])}-Q{int(x['quarter'])}", axis=1)
-    df['profit_margin'] = (df['net_profit'] / df['revenue'] * 100).fillna(0)
+def _process_periodic_data(flexible_data, selected_years, view_type, selected_months, data_version=None):
+    """Process monthly/quarterly/semester data by slicing the period cube"""
+    if data_version is None:
+        data_version = session_data_version(st.session_state)
     
-    return df
-
-
-def _aggregate_semester(monthly_df):
-    """Aggregate monthly data to semesters"""
-    monthly_df['semester'] = (monthly_df['month_num'] - 1) // 6 + 1
-    
-    df = monthly_df.groupby(['year', 'semester']).agg({
-        'revenue': 'sum',
-        'variable_costs': 'sum',
-        'fixed_costs': 'sum',
-        'non_operational_costs': 'sum',
-        'taxes': 'sum',
-        'commissions': 'sum',
-        'administrative_expenses': 'sum',
-        'marketing_expenses': 'sum',
-        'financial_expenses': 'sum',
-        'net_profit': 'sum'
-    }).reset_index()
-    
-    df['period'] = df.apply(lambda x: f"{int(x['year'])}-S{int(x['semester'])}", axis=1)
-    df['profit_margin'] = (df['net_profit'] / df['revenue'] * 100).fillna(0)
+    cube = _get_period_cube(flexible_data, data_version)
+    columns = PERIODIC_FIELDS + ['profit_margin', 'period']
     
+    if view_type == "Trimestral":
+        df = cube.slice('quarter', years=selected_years, columns=['year', 'quarter'] + columns)
+    elif view_type == "Semestral":
+        df = cube.slice('semester', years=selected_years, columns=['year', 'semester'] + columns)
+    else:
+        month_names = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 
+                      'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+        periods = None
+        if view_type == "Mensal":
+            periods = [month_names.index(m) + 1 for m in selected_months if m in month_names]
+        df = cube.slice('month', years=selected_years, periods=periods,
+                        columns=['year', 'month', 'month_num'] + columns)
+    
+    # The cube keys years as int; rows keep the year keys of flexible_data
+    year_keys = {}
+    for year in flexible_data:
+        try:
+            year_keys[int(year)] = year
+        except (TypeError, ValueError):
+            continue
+    df['year'] = df['year'].map(year_keys)
     return df
 
 
-def _render_tab_content(tab_key, df, flexible_data, group_df, major_groups, selected_years, view_type):
+def _render_tab_content(tab_key, df, flexible_data, group_df, major_groups, selected_years, view_type, data_version=None):
     """Render content for a specific tab"""
     if tab_key == 'overview':
         # Overview tab - Interactive cost breakdown first
         st.markdown("---")
-        render_interactive_cost_breakdown(df, flexible_data, full_width=True)
+        render_interactive_cost_breakdown(df, flexible_data, full_width=True, data_version=data_version)
         
         # Then the regular group evolution
         st.markdown("---")
@@ -4,14 +4,29 @@ Preserves all original functionality while organizing code
 """
 
 import streamlit as st
-from core.financial_processor import FinancialProcessor
+from core.analysis_pipeline import run_analysis_pipeline, build_processed_data, publish_analysis
+from core.jobs import get_job_runner, ACTIVE_STATUSES, JOB_COMPLETED
 from utils.legacy_helpers import (
-    sync_processed_to_extracted,
     get_category_icon,
     get_category_name
 )
+from utils.tracing import traced
 
 
+ANALYSIS_JOB_TYPE = 'financial_analysis'
+
+STAGE_LABELS = {
+    'extraction': "Extraindo arquivos",
+    'consolidation': "Consolidando anos",
+    'growth_metrics': "Métricas de crescimento",
+    'monthly': "Dados mensais",
+    'anomalies': "Detectando anomalias",
+    'publish': "Publicando",
+    'total': "Total"
+}
+
+
+@traced()
 def render_upload_tab(db, use_unified_extractor=True, show_anomalies=True):
     """Render the upload tab with file management and processing"""
     
@@ -180,15 +195,18 @@ def render_upload_tab(db, use_unified_extractor=True, show_anomalies=True):
         # Show warning about shared data update
         st.warning("⚠️ **Atenção**: Processar novos dados atualizará os dados para todos os usuários do sistema.")
 
-        if st.button("Analisar Dados Financeiros", type="primary", use_container_width=True):
-            # Clear old data before processing
-            keys_to_clear = ['processed_data', 'extracted_data', 'monthly_data', 'financial_data', 'gemini_insights', 'unified_data']
-            for key in keys_to_clear:
-                if key in st.session_state:
-                    del st.session_state[key]
-            # Also clear database cache
-            db.clear_session_data()
-            
+        runner = get_job_runner(db)
+        job_id = st.session_state.get('analysis_job_id')
+        if not job_id:
+            # Pick up a run started before a page refresh or by another admin
+            latest_job = runner.get_latest_job(ANALYSIS_JOB_TYPE)
+            if latest_job and latest_job['status'] in ACTIVE_STATUSES:
+                job_id = latest_job['id']
+        
+        job = runner.get_job(job_id) if job_id else None
+        job_running = job is not None and job['status'] in ACTIVE_STATUSES
+
+        if st.button("Analisar Dados Financeiros", type="primary", use_container_width=True, disabled=job_running):
             # Track uploaded files for history - extract file names from arquivos
             uploaded_file_names = []
             for arquivo in arquivos:
@@ -198,86 +216,109 @@ def render_upload_tab(db, use_unified_extractor=True, show_anomalies=True):
                     uploaded_file_names.append(arquivo.name)
             st.session_state.uploaded_files = uploaded_file_names
             
-            with st.spinner("Processando arquivos para todos os usuários..."):
-                processor = FinancialProcessor()
-        
-                # Get file paths
-                file_paths = st.session_state.file_manager.obter_caminhos_arquivos() if hasattr(st.session_state, 'file_manager') else []
-        
-                # Load Excel files
-                excel_data = processor.load_excel_files(file_paths)
-        
-                # Use unified extractor for all data
-                consolidated_df, unified_data = processor.consolidate_all_years(excel_data)
-                
-                # Store unified data for both dashboard and micro analysis
-                st.session_state.unified_data = unified_data
-        
-                # Check if data extraction was successful
-                if consolidated_df.empty:
-                    st.error("❌ Não foi possível extrair dados dos arquivos Excel.")
-                    st.info("Verifique se os arquivos contêm as seguintes informações:")
-                    st.markdown("""
-                    - Sheets com anos (ex: 2018, 2019, 2020, etc.)
-                    - Linha com 'FATURAMENTO' para receitas
-                    - Linha com 'CUSTOS VARIÁVEIS' para custos
-                    - Colunas com meses (JAN, FEV, MAR, etc.)
-                    - Coluna 'ANUAL' para totais anuais
-                    """)
-                else:
-                    consolidated_df = processor.calculate_growth_metrics(consolidated_df)
-            
-                    # Get monthly data
-                    monthly_df = processor.get_monthly_data(excel_data)
+            # Get file paths (materializes DB-stored files, so do it in this thread)
+            file_paths = st.session_state.file_manager.obter_caminhos_arquivos() if hasattr(st.session_state, 'file_manager') else []
+            user = st.session_state.user or {}
             
-                    # Store in session state - use unified data
-                    st.session_state.processed_data = {
-                        'raw_data': unified_data,  # Unified data has both core metrics and line items
-                        'consolidated': consolidated_df,
-                        'summary': processor.get_financial_summary(consolidated_df),
-                        'anomalies': processor.detect_anomalies(consolidated_df) if show_anomalies else []
-                    }
-                    st.session_state.monthly_data = monthly_df
-                    
-                    # Store extracted_data for compatibility
-                    st.session_state.extracted_data = unified_data
-                    
-                    # Store uploaded files info for financial analysis
-                    if hasattr(st.session_state, 'file_manager'):
-                        st.session_state.uploaded_files_info = st.session_state.file_manager.registro.get('arquivos', [])
-            
-                    # Sync to extracted_data format and save to database
-                    sync_processed_to_extracted()
-            
-                    # Save to database
-                    try:
-                        db.auto_save_state(st.session_state)
-                        save_success = True
-                    except Exception as e:
-                        st.error(f"⚠️ Erro ao salvar no banco de dados: {str(e)}")
-                        save_success = False
-                        print(f"DEBUG: Save failed with error: {str(e)}")
-                        import traceback
-                        traceback.print_exc()
-            
-                    # Show unified data results
-                    if unified_data:
-                        # Show summary of detected categories
-                        all_categories = set()
-                        for year_data in unified_data.values():
-                            if 'categories' in year_data:
-                                all_categories.update(year_data['categories'].keys())
-                
-                        st.success(f"✅ Dados processados e compartilhados com sucesso!")
-                        if save_success:
-                            st.success("💾 Dados salvos e disponíveis para todos os usuários!")
-                        st.info(f"📊 {len(consolidated_df)} anos encontrados | "
-                               f"📁 {len(all_categories)} categorias detectadas | "
-                               f"👥 Disponível para todos os usuários")
-                
-                        # Show detected categories
-                        with st.expander("Categorias Detectadas"):
-                            cols = st.columns(3)
-                            for idx, category in enumerate(sorted(all_categories)):
-                                col_idx = idx % 3
-                                cols[col_idx].write(f"{get_category_icon(category)} {get_category_name(category)}")
\ No newline at end of file
+            st.session_state.analysis_job_id = runner.submit(
+                ANALYSIS_JOB_TYPE,
+                lambda ctx: _run_analysis_job(
+                    ctx, db, file_paths, show_anomalies,
+                    user.get('username', 'System'), user.get('email', ''), uploaded_file_names
+                ),
+                created_by=user.get('username'),
+                params={'files': uploaded_file_names, 'show_anomalies': show_anomalies}
+            )
+            st.rerun()
+        
+        if job_running:
+            _render_job_progress(runner, job['id'])
+        elif job is not None and st.session_state.get('analysis_job_id') == job['id']:
+            # Job started by this session has finished - show the outcome once
+            del st.session_state['analysis_job_id']
+            _render_job_outcome(runner, job)
+
+
+def _run_analysis_job(ctx, db, file_paths, show_anomalies, username, email, file_names):
+    """Job target: run the pipeline and publish the results atomically"""
+    results = run_analysis_pipeline(file_paths, show_anomalies, progress=ctx.progress)
+    
+    ctx.progress('publish', 85, "Publicando dados para todos os usuários...")
+    return publish_analysis(db, results, username, email, file_names, progress=ctx.progress)
+
+
+@st.fragment(run_every=1.0)
+def _render_job_progress(runner, job_id):
+    """Poll the job record and show its progress without rerunning the whole app"""
+    job = runner.get_job(job_id)
+    if job is None or job['status'] not in ACTIVE_STATUSES:
+        # Finished: rerun the app so every tab reloads the published data
+        st.rerun()
+        return
+    
+    stage_label = STAGE_LABELS.get(job.get('stage'), "Na fila")
+    message = job.get('message') or ""
+    st.progress(min(int(job.get('percent') or 0), 100), text=f"⏳ {stage_label} — {message}")
+    st.caption(f"Iniciado por {job.get('created_by') or 'System'} | Você pode continuar navegando; os dados serão atualizados ao final.")
+
+
+def _render_job_outcome(runner, job):
+    """Show the result of a finished analysis job for the session that started it"""
+    timings = job.get('timings') or {}
+    
+    if job['status'] != JOB_COMPLETED:
+        st.error(f"❌ {job.get('error') or 'Erro ao processar os dados.'}")
+        if 'extrair dados' in (job.get('error') or ''):
+            st.info("Verifique se os arquivos contêm as seguintes informações:")
+            st.markdown("""
+            - Sheets com anos (ex: 2018, 2019, 2020, etc.)
+            - Linha com 'FATURAMENTO' para receitas
+            - Linha com 'CUSTOS VARIÁVEIS' para custos
+            - Colunas com meses (JAN, FEV, MAR, etc.)
+            - Coluna 'ANUAL' para totais anuais
+            """)
+        return
+    
+    results = runner.pop_result(job['id'])
+    if results is None:
+        st.success("✅ Dados processados e compartilhados com sucesso!")
+        return
+    
+    # Load the fresh results into this session
+    for key in ['processed_data', 'extracted_data', 'monthly_data', 'financial_data', 'gemini_insights', 'unified_data']:
+        if key in st.session_state:
+            del st.session_state[key]
+    unified_data = results['unified_data']
+    st.session_state.unified_data = unified_data
+    st.session_state.processed_data = build_processed_data(results)
+    st.session_state.monthly_data = results['monthly_data']
+    st.session_state.extracted_data = results.get('published_data') or unified_data
+    st.session_state.data_version = results.get('data_version')
+    st.session_state.data_version_source = st.session_state.extracted_data
+    
+    # Store uploaded files info for financial analysis
+    if hasattr(st.session_state, 'file_manager'):
+        st.session_state.uploaded_files_info = st.session_state.file_manager.registro.get('arquivos', [])
+    
+    # Show summary of detected categories
+    all_categories = set()
+    for year_data in unified_data.values():
+        if 'categories' in year_data:
+            all_categories.update(year_data['categories'].keys())
+    
+    st.success(f"✅ Dados processados e compartilhados com sucesso!")
+    st.success("💾 Dados salvos e disponíveis para todos os usuários!")
+    st.info(f"📊 {len(results['consolidated'])} anos encontrados | "
+           f"📁 {len(all_categories)} categorias detectadas | "
+           f"👥 Disponível para todos os usuários")
+    if timings:
+        st.caption("⏱️ " + " | ".join(
+            f"{STAGE_LABELS.get(stage, stage)}: {seconds:.1f}s" for stage, seconds in timings.items()
+        ))
+    
+    # Show detected categories
+    with st.expander("Categorias Detectadas"):
+        cols = st.columns(3)
+        for idx, category in enumerate(sorted(all_categories)):
+            col_idx = idx % 3
+            cols[col_idx].write(f"{get_category_icon(category)} {get_category_name(category)}")
@@ -0,0 +1,86 @@
+"""
+Lazy imports for heavy dependencies
+Modules such as google.generativeai, pandas or the chart libraries cost
+hundreds of milliseconds to import. ``lazy_module`` returns a placeholder
+that performs the real import on first attribute access, and
+``lazy_exports`` gives packages a PEP 562 ``__getattr__`` so importing the
+package does not import every submodule it re-exports.
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+import types
+from typing import Callable, Dict, List
+
+
+# Seconds spent importing each lazily loaded module (first use only)
+_load_timings: Dict[str, float] = {}
+_load_lock = threading.RLock()
+
+
+def _timed_import(name: str) -> types.ModuleType:
+    with _load_lock:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        _load_timings.setdefault(name, round(time.perf_counter() - started, 4))
+        return module
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports the real module on first use"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_target'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_target']
+        if module is None:
+            module = _timed_import(self.__name__)
+            self.__dict__['_lazy_target'] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_lazy_target'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """Return a placeholder for ``name`` that imports it on first attribute access
+
+    Usage:
+        genai = lazy_module('google.generativeai')
+        model = genai.GenerativeModel(name)  # import happens here
+    """
+    return LazyModule(name)
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Callable[[str], object]:
+    """Build a module-level ``__getattr__`` resolving re-exports on demand
+
+    Args:
+        package: The package's ``__name__``
+        exports: {exported name: relative submodule}, e.g. {'AIChatAssistant': '.chat_assistant'}
+    """
+    def __getattr__(attr: str):
+        submodule = exports.get(attr)
+        if submodule is None:
+            raise AttributeError(f"module '{package}' has no attribute '{attr}'")
+        module = _timed_import(importlib.util.resolve_name(submodule, package))
+        return getattr(module, attr)
+
+    return __getattr__
+
+
+def get_lazy_import_timings() -> Dict[str, float]:
+    """Import time (seconds) of every module loaded through this facility"""
+    with _load_lock:
+        return dict(_load_timings)
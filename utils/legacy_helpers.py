@@ -7,10 +7,12 @@ import streamlit as st
 import pandas as pd
 from core.financial_processor import FinancialProcessor
 from core.gerenciador_arquivos import GerenciadorArquivos
+from utils.tracing import traced
 import os
 
 
 # Helper functions for data conversion (must be defined before use)
+@traced()
 def convert_extracted_to_processed(extracted_data):
     """Convert extracted_data format (from database) to processed_data format (for app)"""
     if not extracted_data:
@@ -423,6 +425,7 @@ def get_monthly_layout_config():
     )
 
 
+@traced()
 def process_detailed_monthly_data(flexible_data):
     """Process flexible data to extract detailed monthly line items for analysis"""
     if not flexible_data:
@@ -614,6 +617,7 @@ def initialize_session_state(db, data_loaded):
         # Let auto_load_state handle it to preserve saved filter states
 
 
+@traced()
 def generate_monthly_data_from_extracted(extracted_data):
     """Generate monthly DataFrame from extracted data"""
     try:
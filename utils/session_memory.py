@@ -0,0 +1,181 @@
+"""
+Session memory accounting
+Measures the deep size of every ``st.session_state`` key (objects shared by
+several keys are counted once, against the first key that holds them) and
+keeps the latest total of each session in a process-wide registry for the
+Debug tab. Objects the session holds by reference from the process-wide
+artifact store are shared by every session and counted with the store, not
+against the session.
+
+At the end of a rerun ``enforce_session_memory`` checks the session against
+SESSION_MEMORY_SOFT_LIMIT_MB and the sum of all sessions against
+SESSION_MEMORY_PROCESS_LIMIT_MB. Over a limit the only thing it frees is the
+in-memory chat history (all but the render window), which moves to SQLite.
+Data the app script reassigns on every rerun (processed_data, monthly_data)
+is not evicted: it would be rebuilt at the top of the next rerun.
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core.artifact_store import estimate_size, get_artifact_store
+from utils.tracing import span
+
+
+MB = 1024 * 1024
+SESSION_SOFT_LIMIT_BYTES = int(float(os.environ.get('SESSION_MEMORY_SOFT_LIMIT_MB', '256')) * MB)
+PROCESS_SOFT_LIMIT_BYTES = int(float(os.environ.get('SESSION_MEMORY_PROCESS_LIMIT_MB', '2048')) * MB)
+CHECK_INTERVAL_SECONDS = float(os.environ.get('SESSION_MEMORY_CHECK_SECONDS', '30'))
+# Sessions that have not reported for this long are dropped from the registry
+SESSION_REPORT_TTL_SECONDS = 3600
+
+# Measured first, so data other keys point into is attributed to its source
+PRIMARY_KEYS = ['extracted_data', 'unified_data', 'flexible_data']
+SHARED_WITH_STORE = 'artifact store'
+
+_DATA_TYPES = (dict, list, tuple, set, frozenset, str, bytes, int, float, bool, type(None),
+               pd.DataFrame, pd.Series, pd.Index, np.ndarray, np.generic, datetime, date)
+
+_sessions: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def measure_session(state) -> Dict[str, Any]:
+    """Per-key deep size of a session state, largest first, plus the session total
+
+    Values that are not plain data (managers, model clients, widgets' objects)
+    are listed without a size: they are shared infrastructure, not session data.
+    Objects handed out by reference by the artifact store count as shared, so
+    only this session's own copies (like the DataFrames of processed_data) add up.
+    """
+    keys = [key for key in PRIMARY_KEYS if key in state]
+    keys += sorted((key for key in state.keys() if key not in PRIMARY_KEYS), key=str)
+
+    store_ids = get_artifact_store().shared_object_ids()
+    seen: set = set(store_ids)
+    owners: Dict[int, str] = {value_id: SHARED_WITH_STORE for value_id in store_ids}
+    rows: List[Dict[str, Any]] = []
+    for key in keys:
+        try:
+            value = state[key]
+        except KeyError:
+            continue
+        owner = owners.get(id(value))
+        if owner is not None:
+            rows.append({'key': key, 'type': type(value).__name__, 'bytes': 0, 'shared_with': owner})
+            continue
+        owners[id(value)] = key
+        if not isinstance(value, _DATA_TYPES):
+            rows.append({'key': key, 'type': type(value).__name__, 'bytes': None, 'shared_with': None})
+            continue
+        rows.append({'key': key, 'type': type(value).__name__, 'bytes': estimate_size(value, seen),
+                     'shared_with': None})
+
+    rows.sort(key=lambda row: -(row['bytes'] or 0))
+    return {
+        'total_bytes': sum(row['bytes'] or 0 for row in rows),
+        'keys': rows,
+        'measured_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def _register(session_key: str, report: Dict[str, Any]) -> None:
+    now = time.time()
+    with _lock:
+        _sessions[session_key] = {'total_bytes': report['total_bytes'], 'updated': now,
+                                  'measured_at': report['measured_at']}
+        for key in [key for key, entry in _sessions.items()
+                    if now - entry['updated'] > SESSION_REPORT_TTL_SECONDS]:
+            del _sessions[key]
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux); None where unavailable"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def get_process_memory() -> Dict[str, Any]:
+    """Totals across the sessions of this process, the artifact store and RSS"""
+    with _lock:
+        sessions = {key: dict(entry) for key, entry in _sessions.items()}
+    return {
+        'sessions': len(sessions),
+        'sessions_bytes': sum(entry['total_bytes'] for entry in sessions.values()),
+        'largest_session_bytes': max((entry['total_bytes'] for entry in sessions.values()), default=0),
+        'artifact_store_bytes': get_artifact_store().stats()['bytes'],
+        'rss_bytes': process_rss_bytes(),
+        'session_limit_bytes': SESSION_SOFT_LIMIT_BYTES,
+        'process_limit_bytes': PROCESS_SOFT_LIMIT_BYTES,
+    }
+
+
+def _sessions_total(session_key: str, session_bytes: int) -> int:
+    """Sum of all registered sessions with this one at ``session_bytes``"""
+    with _lock:
+        others = sum(entry['total_bytes'] for key, entry in _sessions.items() if key != session_key)
+    return others + session_bytes
+
+
+def _over_limit(session_key: str, session_bytes: int) -> bool:
+    return (session_bytes > SESSION_SOFT_LIMIT_BYTES
+            or _sessions_total(session_key, session_bytes) > PROCESS_SOFT_LIMIT_BYTES)
+
+
+def _compact_chat_history() -> int:
+    """Spill the chat history beyond the render window to SQLite; returns messages moved"""
+    if not st.session_state.get('chat_history'):
+        return 0
+    try:
+        from ai.chat_history import ChatHistoryStore
+        store = ChatHistoryStore()
+        return store.compact(store.window_size)
+    except Exception as e:
+        print(f"Error compacting chat history: {e}")
+        return 0
+
+
+def enforce_session_memory(force: bool = False) -> Optional[Dict[str, Any]]:
+    """Measure this session and spill its chat history while it is over a soft limit
+
+    Runs at most once every SESSION_MEMORY_CHECK_SECONDS per session unless
+    ``force`` is set. Returns the report (with the chat messages spilled), or
+    None when the check was skipped.
+    """
+    state = st.session_state
+    now = time.time()
+    if not force and now - state.get('memory_checked_at', 0) < CHECK_INTERVAL_SECONDS:
+        return None
+    state.memory_checked_at = now
+    if 'memory_session_key' not in state:
+        state.memory_session_key = uuid.uuid4().hex
+    session_key = state.memory_session_key
+
+    with span('session_memory'):
+        report = measure_session(state)
+        spilled = 0
+        if _over_limit(session_key, report['total_bytes']):
+            spilled = _compact_chat_history()
+
+        if spilled:
+            report = measure_session(state)
+            print(f"Session memory over limit: spilled {spilled} chat messages, "
+                  f"now {report['total_bytes'] / MB:.1f} MB")
+        report['chat_spilled'] = spilled
+        _register(session_key, report)
+    state.memory_report = report
+    return report
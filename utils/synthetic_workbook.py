@@ -0,0 +1,92 @@
+"""
+Synthetic financial workbooks
+Writes Excel files laid out like the real yearly DRE sheets (one sheet per
+year, label column, JAN..DEZ in odd columns with an AV% column after each,
+ANUAL last) so load tests and benchmarks can run the production extractors
+without customer data. ``items`` scales the number of line items per
+section; the same seed always produces the same workbook.
+"""
+
+import random
+from typing import Iterable, List, Tuple
+
+import pandas as pd
+
+
+MONTHS = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN', 'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+DEFAULT_YEARS = range(2018, 2026)
+
+# (section header, item labels it starts with, monthly scale of each item)
+SECTIONS = [
+    ('CUSTOS VARIÁVEIS', ['SIMPLES NACIONAL', 'REPASSE COMISSÃO', 'TAXAS DE CARTÃO', 'FRETES'], 12_000),
+    ('CUSTOS FIXOS', ['SALÁRIOS', 'ALUGUEL', 'CONDOMINIOS', 'ESCRITÓRIO CONTÁBIL', 'ENERGIA ELÉTRICA',
+                      'TELEFONE', 'MARKETING', 'TRÁFEGO PAGO', 'DESPESAS FINANCEIRAS', 'SOFTWARE'], 6_000),
+    ('CUSTOS NÃO OPERACIONAIS', ['REFORMA', 'PATROCINIO', 'MANUTENÇÃO DE INSTALAÇÕES'], 2_500),
+]
+
+
+def _labels(base: List[str], items: int) -> List[str]:
+    """``items`` labels: the base ones first, then numbered extras"""
+    labels = list(base[:items])
+    labels += [f'{base[i % len(base)]} {i // len(base) + 1:02d}' for i in range(len(labels), items)]
+    return labels
+
+
+def _row(label: str, monthly: List[float], revenue: List[float]) -> list:
+    row = [label]
+    for value, base in zip(monthly, revenue):
+        row += [round(value, 2), round(value / base, 4) if base else 0]
+    return row + [round(sum(monthly), 2)]
+
+
+def build_year_sheet(year: int, items: int = 10, seed: int = 0) -> pd.DataFrame:
+    """One yearly sheet with ``items`` line items per cost section"""
+    rng = random.Random(f'{seed}-{year}')
+    growth = 1 + 0.08 * (year - 2018)
+    revenue = [rng.uniform(0.8, 1.2) * 400_000 * growth for _ in MONTHS]
+    rows = [_row('FATURAMENTO', revenue, revenue)]
+
+    section_totals = {}
+    for header, base, scale in SECTIONS:
+        item_rows = []
+        total = [0.0] * len(MONTHS)
+        per_item = scale * growth * 10 / max(items, 1)
+        for label in _labels(base, items):
+            if rng.random() < 0.25:
+                # Parent item broken down into "- " sub-items
+                subs = [[rng.uniform(0.2, 0.6) * per_item for _ in MONTHS] for _ in range(3)]
+                monthly = [sum(values) for values in zip(*subs)]
+                item_rows.append(_row(label, monthly, revenue))
+                item_rows += [_row(f'- {label} {n + 1}', sub, revenue) for n, sub in enumerate(subs)]
+            else:
+                monthly = [rng.uniform(0.5, 1.5) * per_item for _ in MONTHS]
+                item_rows.append(_row(label, monthly, revenue))
+            total = [a + b for a, b in zip(total, monthly)]
+        section_totals[header] = total
+        rows.append(_row(header, total, revenue))
+        rows += item_rows
+        if header == 'CUSTOS VARIÁVEIS':
+            margin = [r - c for r, c in zip(revenue, total)]
+            rows.append(_row('MARGEM DE CONTRIBUIÇÃO', margin, revenue))
+
+    result = [r - sum(totals) for r, *totals in zip(revenue, *section_totals.values())]
+    rows.append(_row('RESULTADO', result, revenue))
+    rows.append(_row('LUCRO LÍQUIDO', result, revenue))
+
+    columns = ['DESCRIÇÃO']
+    for month in MONTHS:
+        columns += [month, 'AV%' if month == 'JAN' else f'AV%.{MONTHS.index(month)}']
+    columns.append('ANUAL')
+    return pd.DataFrame(rows, columns=columns)
+
+
+def write_synthetic_workbook(path: str, years: Iterable[int] = DEFAULT_YEARS, items: int = 10,
+                             seed: int = 0) -> Tuple[str, int]:
+    """Write the workbook to ``path``; returns (path, rows per sheet)"""
+    rows = 0
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for year in years:
+            sheet = build_year_sheet(year, items, seed)
+            sheet.to_excel(writer, sheet_name=str(year), index=False)
+            rows = max(rows, len(sheet))
+    return path, rows
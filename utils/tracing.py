@@ -0,0 +1,241 @@
+"""
+Span tracing for hot paths
+``span('name')`` (context manager) and ``@traced()`` (decorator) time a block
+of code. Spans opened during a Streamlit rerun are collected into that
+rerun's trace (``begin_trace``/``finish_trace`` in the app script); the last
+PERF_TRACE_BUFFER traces of each session are kept in a ring buffer for the
+Debug tab, for the PERF_TRACE_SESSIONS most recently active sessions. Every
+span also feeds per-name duration samples for p50/p95, including spans run
+outside a rerun (background jobs, worker threads).
+
+With PERF_TRACING=0 (or ``set_tracing_enabled(False)``) ``span`` returns a
+shared no-op object and decorated functions call straight through.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+TRACE_BUFFER_SIZE = int(os.environ.get('PERF_TRACE_BUFFER', '50'))
+TRACE_SESSIONS = int(os.environ.get('PERF_TRACE_SESSIONS', '200'))
+# Open traces older than this are closed as interrupted: their session stopped
+# early and never ran again (closed tab, expired session)
+OPEN_TRACE_TTL_S = float(os.environ.get('PERF_OPEN_TRACE_TTL', '600'))
+SPAN_SAMPLES = 500
+
+_enabled = os.environ.get('PERF_TRACING', '1').lower() not in ('0', 'false', 'no')
+_local = threading.local()
+_lock = threading.Lock()
+# Ring buffer of finished traces per session key, least recently active first
+_traces: 'OrderedDict[str, deque]' = OrderedDict()
+_samples: Dict[str, deque] = {}
+# Open trace per session key, so a run that never reached finish_trace
+# (st.rerun, st.stop) is still recorded when the next run of the session starts
+_open_traces: Dict[str, Dict[str, Any]] = {}
+
+
+def tracing_enabled() -> bool:
+    return _enabled
+
+
+def set_tracing_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def _record_sample(name: str, duration_ms: float) -> None:
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            samples = _samples[name] = deque(maxlen=SPAN_SAMPLES)
+        samples.append(duration_ms)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'started', 'record', 'trace')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        trace = self.trace = getattr(_local, 'trace', None)
+        self.started = time.perf_counter()
+        self.record = None
+        if trace is not None:
+            self.record = {
+                'name': self.name,
+                'depth': len(trace['stack']),
+                'start_ms': (self.started - trace['t0']) * 1000,
+                'duration_ms': None,
+            }
+            trace['spans'].append(self.record)
+            trace['stack'].append(self.record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        if self.record is not None:
+            self.record['duration_ms'] = duration_ms
+            if exc_type is not None:
+                self.record['error'] = exc_type.__name__
+            stack = self.trace['stack']
+            if stack and stack[-1] is self.record:
+                stack.pop()
+        _record_sample(self.name, duration_ms)
+        return False
+
+
+def span(name: str):
+    """Time the enclosed block as span ``name`` (no-op while tracing is disabled)"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator timing every call of the function (named after its qualname by default)"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, duration_ms: float) -> None:
+    """Record a duration measured elsewhere (e.g. a stream consumed after its span closed)"""
+    if _enabled and duration_ms is not None:
+        _record_sample(name, duration_ms)
+
+
+def _close_trace(trace: Dict[str, Any], interrupted: bool) -> None:
+    for record in trace['spans']:
+        if record['duration_ms'] is None:
+            record['duration_ms'] = (time.perf_counter() - trace['t0']) * 1000 - record['start_ms']
+    finished = {
+        'name': trace['name'],
+        'key': trace['key'],
+        'started_at': trace['started_at'],
+        'total_ms': round((time.perf_counter() - trace['t0']) * 1000, 1),
+        'interrupted': interrupted,
+        'spans': [
+            {**record, 'start_ms': round(record['start_ms'], 2), 'duration_ms': round(record['duration_ms'], 2)}
+            for record in trace['spans']
+        ],
+    }
+    key = trace['key']
+    with _lock:
+        buffer = _traces.get(key)
+        if buffer is None:
+            buffer = _traces[key] = deque(maxlen=TRACE_BUFFER_SIZE)
+        else:
+            _traces.move_to_end(key)
+        buffer.append(finished)
+        while len(_traces) > TRACE_SESSIONS:
+            _traces.popitem(last=False)
+
+
+def begin_trace(name: str = 'rerun', key: str = '') -> None:
+    """Start collecting the spans of this thread (a Streamlit script run) into a trace
+
+    ``key`` identifies the session: a trace it left open because its run
+    stopped early (``st.rerun``, ``st.stop``) is closed and kept as interrupted.
+    Traces other sessions left open for more than PERF_OPEN_TRACE_TTL seconds
+    are closed the same way.
+    """
+    _local.trace = None
+    now = time.perf_counter()
+    with _lock:
+        stale = [trace for trace_key, trace in _open_traces.items()
+                 if trace_key != key and now - trace['t0'] > OPEN_TRACE_TTL_S]
+        for trace in stale:
+            del _open_traces[trace['key']]
+        previous = _open_traces.pop(key, None)
+    if previous is not None:
+        stale.append(previous)
+    for trace in stale:
+        _close_trace(trace, interrupted=True)
+    if not _enabled:
+        return
+    trace = {
+        'name': name,
+        'key': key,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        't0': time.perf_counter(),
+        'spans': [],
+        'stack': [],
+    }
+    with _lock:
+        _open_traces[key] = trace
+    _local.trace = trace
+
+
+def finish_trace() -> None:
+    """Close the trace of this thread and add it to its session's ring buffer"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return
+    _local.trace = None
+    with _lock:
+        if _open_traces.get(trace['key']) is trace:
+            del _open_traces[trace['key']]
+    _close_trace(trace, interrupted=False)
+
+
+def get_traces(key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Finished rerun traces, oldest first (only the session ``key``'s when given)"""
+    with _lock:
+        if key is not None:
+            return list(_traces.get(key, ()))
+        traces = [trace for buffer in _traces.values() for trace in buffer]
+    return sorted(traces, key=lambda trace: trace['started_at'])
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def get_span_stats() -> List[Dict[str, Any]]:
+    """Calls, p50, p95, max and total time per span name, slowest p95 first"""
+    with _lock:
+        snapshot = {name: sorted(samples) for name, samples in _samples.items()}
+    stats = [
+        {
+            'span': name,
+            'calls': len(values),
+            'p50_ms': round(_percentile(values, 0.5), 2),
+            'p95_ms': round(_percentile(values, 0.95), 2),
+            'max_ms': round(values[-1], 2),
+            'total_ms': round(sum(values), 1),
+        }
+        for name, values in snapshot.items() if values
+    ]
+    return sorted(stats, key=lambda row: -row['p95_ms'])
+
+
+def reset_traces() -> None:
+    with _lock:
+        _traces.clear()
+        _samples.clear()
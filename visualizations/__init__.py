@@ -1,34 +1,28 @@
 """Visualization modules for the Marine Seguros dashboard"""
 
-from .charts import (
-    create_revenue_cost_chart,
-    create_margin_evolution_chart,
-    create_cost_breakdown_chart,
-    create_monthly_trend_chart,
-    create_pareto_chart,
-    create_treemap,
-    create_sankey_diagram
-)
+from utils.lazy_import import lazy_exports
 
-from .micro_charts import (
-    create_expense_pareto_chart,
-    create_expense_treemap,
-    create_expense_sankey,
-    create_growth_analysis_chart,
-    create_monthly_heatmap
-)
+# Chart builders are resolved on first use; charts.py alone is ~3,700 lines
+_EXPORTS = {
+    'create_revenue_cost_chart': '.charts',
+    'create_margin_evolution_chart': '.charts',
+    'create_cost_breakdown_chart': '.charts',
+    'create_monthly_trend_chart': '.charts',
+    'create_pareto_chart': '.charts',
+    'create_treemap': '.charts',
+    'create_sankey_diagram': '.charts',
+    'create_expense_pareto_chart': '.micro_charts',
+    'create_expense_treemap': '.micro_charts',
+    'create_expense_sankey': '.micro_charts',
+    'create_growth_analysis_chart': '.micro_charts',
+    'create_monthly_heatmap': '.micro_charts',
+    'cached_figure': '.figure_cache',
+    'get_figure_cache': '.figure_cache',
+    'optimize_long_series': '.downsampling',
+    'lttb_indices': '.downsampling',
+    'create_client_filtered_chart': '.client_filters',
+}
 
-__all__ = [
-    'create_revenue_cost_chart',
-    'create_margin_evolution_chart',
-    'create_cost_breakdown_chart',
-    'create_monthly_trend_chart',
-    'create_pareto_chart',
-    'create_treemap',
-    'create_sankey_diagram',
-    'create_expense_pareto_chart',
-    'create_expense_treemap',
-    'create_expense_sankey',
-    'create_growth_analysis_chart',
-    'create_monthly_heatmap'
-]
\ No newline at end of file
+__getattr__ = lazy_exports(__name__, _EXPORTS)
+
+__all__ = list(_EXPORTS)
@@ -6,8 +6,11 @@ import pandas as pd
 from utils.formatters import format_currency, format_percentage
 from typing import Dict, List
 import numpy as np
+from visualizations.figure_cache import cached_figure
+from visualizations.downsampling import optimize_long_series
 
 
+@cached_figure
 def create_revenue_cost_chart(df, title="Evolução de Receitas vs Custos"):
     """Create a revenue vs costs comparison chart"""
     fig = go.Figure()
@@ -888,7 +891,7 @@ def create_monthly_trend_chart(monthly_data, title="Tendência Mensal"):
         legend=dict(x=0.01, y=0.99)
     )
     
-    return fig
+    return optimize_long_series(fig)
 
 
 def create_group_evolution_chart(group_df: pd.DataFrame, title: str = "Evolução dos Grupos de Despesas") -> go.Figure:
@@ -2575,6 +2578,7 @@ def create_group_treemap(groups_data: Dict[str, Dict], year: int,
     
     return fig
 
+@cached_figure
 def create_pnl_waterfall_chart(df, title="Demonstrativo de Resultados (Cascata)"):
     """Create a P&L waterfall chart"""
     
@@ -3494,9 +3498,10 @@ def create_group_comparison_chart(group_df: pd.DataFrame, revenue_df: pd.DataFra
         group_df: DataFrame with expense groups
         revenue_df: DataFrame with revenue data by year
     """
-    # Merge with revenue data
+    # Merge with revenue data (summed per year: monthly/quarterly views have
+    # one revenue row per period while the groups are annual)
     merged_df = group_df.merge(
-        revenue_df[['year', 'revenue']], 
+        revenue_df.groupby('year', as_index=False)['revenue'].sum(), 
         left_on='Ano', 
         right_on='year', 
         how='left'
@@ -0,0 +1,165 @@
+"""
+Client-side filtered charts
+Each figure ships the full series once, at every grain (month, quarter,
+semester, year), on a date axis. Plotly updatemenus switch the visible grain
+and zoom the x axis to a year or to the last 12 months entirely in the
+browser, so view changes never rerun the Streamlit script.
+"""
+
+from typing import Dict, List, Optional
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from core.metrics_engine import safe_ratio
+from core.period_cube import get_period_cube
+from visualizations.figure_cache import cached_figure
+
+
+METRIC_LABELS = {
+    'revenue': 'Receita',
+    'variable_costs': 'Custos Variáveis',
+    'fixed_costs': 'Custos Fixos',
+    'operational_costs': 'Custos Operacionais',
+    'non_operational_costs': 'Custos Não Operacionais',
+    'contribution_margin': 'Margem de Contribuição',
+    'net_profit': 'Resultado',
+    'profit_margin': 'Margem de Lucro (%)',
+}
+
+# (label, cube grain, months per period)
+CLIENT_GRAINS = [
+    ('Mensal', 'month', 1),
+    ('Trimestral', 'quarter', 3),
+    ('Semestral', 'semester', 6),
+    ('Anual', 'year', 12),
+]
+
+_MONTH_ABBR = ['JAN', 'FEV', 'MAR', 'ABR', 'MAI', 'JUN',
+               'JUL', 'AGO', 'SET', 'OUT', 'NOV', 'DEZ']
+
+
+def _grain_frame(cube, grain: str, metrics: List[str]) -> pd.DataFrame:
+    """One grain as a flat frame with 'date' (period start) and 'label' columns"""
+    if grain == 'year':
+        sums = [m for m in cube.metrics if m != 'profit_margin']
+        frame = cube.slice('month').groupby('year', as_index=False)[sums].sum()
+        if 'profit_margin' in metrics:
+            frame['profit_margin'] = (
+                safe_ratio(frame['net_profit'], frame['revenue'])
+                if {'net_profit', 'revenue'} <= set(frame.columns) else 0.0
+            )
+        frame['date'] = pd.to_datetime(frame['year'].astype(str) + '-01-01')
+        frame['label'] = frame['year'].astype(str)
+        return frame
+
+    frame = cube.slice(grain)
+    if grain == 'month':
+        start_month = frame['month_num']
+        frame['label'] = [f"{_MONTH_ABBR[m - 1]} {y}" for y, m in zip(frame['year'], frame['month_num'])]
+    elif grain == 'quarter':
+        start_month = (frame['quarter'] - 1) * 3 + 1
+        frame['label'] = frame['period']
+    else:
+        start_month = (frame['semester'] - 1) * 6 + 1
+        frame['label'] = frame['period']
+    frame['date'] = pd.to_datetime(dict(year=frame['year'], month=start_month, day=1))
+    return frame
+
+
+@cached_figure
+def create_client_filtered_chart(monthly_df: pd.DataFrame, metrics: List[str], title: str,
+                                 kind: str = 'line', default_grain: str = 'Mensal') -> Optional[go.Figure]:
+    """
+    Chart with every grain and year embedded, filtered in the browser
+
+    Args:
+        monthly_df: Monthly frame (one row per year/month) with the metric columns
+        metrics: Metric columns to plot (see METRIC_LABELS)
+        title: Chart title
+        kind: 'line' or 'bar'
+        default_grain: Grain visible when the chart is first shown
+
+    Returns:
+        Plotly figure or None if no data
+    """
+    cube = get_period_cube(monthly_df)
+    if cube is None:
+        return None
+    metrics = [m for m in metrics if m in cube.frames['month'].columns]
+    if not metrics:
+        return None
+
+    is_percent = metrics == ['profit_margin']
+    fig = go.Figure()
+    grain_traces: Dict[str, List[int]] = {}
+
+    for grain_label, grain, months in CLIENT_GRAINS:
+        frame = _grain_frame(cube, grain, metrics)
+        grain_traces[grain_label] = []
+        for metric in metrics:
+            trace_args = dict(
+                x=frame['date'],
+                y=frame[metric],
+                name=METRIC_LABELS.get(metric, metric),
+                customdata=frame['label'],
+                legendgroup=metric,
+                xperiod=f"M{months}",
+                xperiodalignment='middle',
+                visible=grain_label == default_grain,
+                hovertemplate='<b>%{customdata}</b><br>' + METRIC_LABELS.get(metric, metric)
+                              + (': %{y:.1f}%' if is_percent else ': R$ %{y:,.0f}') + '<extra></extra>',
+            )
+            if kind == 'bar':
+                fig.add_trace(go.Bar(**trace_args))
+            else:
+                fig.add_trace(go.Scatter(mode='lines+markers', **trace_args))
+            grain_traces[grain_label].append(len(fig.data) - 1)
+
+    trace_count = len(fig.data)
+    grain_buttons = [
+        dict(
+            label=grain_label,
+            method='update',
+            args=[{'visible': [i in grain_traces[grain_label] for i in range(trace_count)]}]
+        )
+        for grain_label, _, _ in CLIENT_GRAINS
+    ]
+
+    years = cube.years
+    last_month = cube.frames['month'].index[-1]
+    last_date = pd.Timestamp(int(last_month[0]), int(last_month[1]), 1) + pd.offsets.MonthEnd(0)
+    range_buttons = [dict(label='Todos', method='relayout', args=[{'xaxis.autorange': True}])]
+    range_buttons.append(dict(
+        label='Últimos 12M',
+        method='relayout',
+        args=[{'xaxis.range': [(last_date - pd.DateOffset(months=12)).strftime('%Y-%m-%d'),
+                               last_date.strftime('%Y-%m-%d')]}]
+    ))
+    range_buttons += [
+        dict(label=str(year), method='relayout', args=[{'xaxis.range': [f'{year}-01-01', f'{year}-12-31']}])
+        for year in reversed(years)
+    ]
+
+    default_index = next((i for i, (label, _, _) in enumerate(CLIENT_GRAINS) if label == default_grain), 0)
+    fig.update_layout(
+        title=title,
+        barmode='group',
+        hovermode='x unified',
+        height=450,
+        margin=dict(t=90, b=50),
+        yaxis_title='%' if is_percent else 'Valores (R$)',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        updatemenus=[
+            dict(type='buttons', direction='right', buttons=grain_buttons, active=default_index,
+                 x=0, xanchor='left', y=1.18, yanchor='top', showactive=True),
+            dict(type='dropdown', buttons=range_buttons, active=0,
+                 x=1, xanchor='right', y=1.18, yanchor='top', showactive=True),
+        ],
+        xaxis=dict(type='date', rangeslider=dict(visible=True, thickness=0.06)),
+    )
+    if not is_percent:
+        fig.update_yaxes(tickformat=',.0f')
+    if kind == 'bar':
+        fig.add_hline(y=0, line_dash='dash', line_color='gray', line_width=1)
+    return fig
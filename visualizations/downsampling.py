@@ -0,0 +1,185 @@
+"""
+Rendering mode for long time series
+Above a point threshold, line traces switch to WebGL (Scattergl), the
+history outside the visible window is reduced with Largest-Triangle-Three-
+Buckets downsampling and per-point text labels (unreadable at that density)
+are dropped. Points inside the visible window keep full resolution.
+"""
+
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+import plotly.graph_objects as go
+
+
+# Traces with more points than this switch to the long-series mode
+WEBGL_POINT_THRESHOLD = int(os.environ.get('CHART_WEBGL_THRESHOLD', '120'))
+# Points kept by LTTB for the overview part of a long trace
+DOWNSAMPLE_TARGET = int(os.environ.get('CHART_DOWNSAMPLE_POINTS', '60'))
+# Trailing points kept at full resolution when the layout has no x range
+FULL_RESOLUTION_POINTS = 12
+
+_POINT_ARRAYS = ('x', 'y', 'customdata', 'text', 'hovertext', 'ids')
+_MARKER_ARRAYS = ('color', 'size', 'symbol', 'opacity')
+
+
+def lttb_indices(y: Sequence[float], n_out: int, x: Optional[Sequence[float]] = None) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    First and last points are always kept; every bucket in between keeps the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i == n_out - 3:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            next_end = edges[i + 2]
+            avg_x = x[end:next_end].mean()
+            avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+
+    return kept
+
+
+def _window_indices(x_values: List, x_range: Optional[Sequence], full_points: int) -> np.ndarray:
+    """Positions of the points visible in the initial x range"""
+    n = len(x_values)
+    if x_range is not None and len(x_range) == 2:
+        try:
+            start = x_values.index(x_range[0])
+            end = x_values.index(x_range[1])
+            return np.arange(min(start, end), max(start, end) + 1)
+        except ValueError:
+            pass
+    return np.arange(max(0, n - full_points), n)
+
+
+def _numeric_x(x_values: List) -> Optional[np.ndarray]:
+    """x as floats for LTTB areas; None for categorical axes (use positions)"""
+    try:
+        values = np.asarray(x_values)
+        if np.issubdtype(values.dtype, np.datetime64):
+            return values.astype('datetime64[ns]').astype(np.int64).astype(float)
+        if np.issubdtype(values.dtype, np.number):
+            return values.astype(float)
+    except Exception:
+        pass
+    return None
+
+
+def _subset_trace(trace_json: dict, keep: np.ndarray, n: int) -> dict:
+    for key in _POINT_ARRAYS:
+        value = trace_json.get(key)
+        if value is not None and not isinstance(value, str) and len(value) == n:
+            trace_json[key] = np.asarray(value, dtype=object)[keep].tolist()
+    marker = trace_json.get('marker')
+    if isinstance(marker, dict):
+        for key in _MARKER_ARRAYS:
+            value = marker.get(key)
+            if value is not None and not isinstance(value, (str, int, float)) and len(value) == n:
+                marker[key] = np.asarray(value, dtype=object)[keep].tolist()
+    return trace_json
+
+
+def _drop_text(trace_json: dict) -> dict:
+    """Remove per-point labels, keeping text referenced by the hover template"""
+    mode = trace_json.get('mode')
+    if mode:
+        trace_json['mode'] = '+'.join(part for part in mode.split('+') if part != 'text') or 'lines'
+    if '%{text}' not in (trace_json.get('hovertemplate') or ''):
+        trace_json.pop('text', None)
+    trace_json.pop('textposition', None)
+    trace_json.pop('textfont', None)
+    return trace_json
+
+
+def optimize_long_series(fig: Optional[go.Figure], threshold: Optional[int] = None,
+                         target: Optional[int] = None,
+                         full_points: int = FULL_RESOLUTION_POINTS) -> Optional[go.Figure]:
+    """Return the figure in long-series mode when any trace exceeds the threshold
+
+    - line/marker scatter traces become Scattergl, downsampled with LTTB
+      outside the visible window (layout x range, or the last
+      ``full_points`` points)
+    - text-only annotation traces are dropped, other text labels removed
+    - bar traces keep every point (summing or skipping bars would misstate
+      values) but lose their per-bar labels
+    - filled shapes are left untouched
+
+    Figures below the threshold are returned unchanged.
+    """
+    if fig is None:
+        return fig
+    threshold = WEBGL_POINT_THRESHOLD if threshold is None else threshold
+    target = DOWNSAMPLE_TARGET if target is None else target
+
+    lengths = [len(t.x) for t in fig.data if getattr(t, 'x', None) is not None]
+    if not lengths or max(lengths) <= threshold:
+        return fig
+
+    x_range = fig.layout.xaxis.range
+    category_order = None
+    traces = []
+
+    for trace in fig.data:
+        trace_json = trace.to_plotly_json()
+        trace_type = trace_json.pop('type', 'scatter')
+        x_values = list(trace_json['x']) if trace_json.get('x') is not None else []
+        n = len(x_values)
+
+        if n <= threshold or trace_json.get('fill'):
+            traces.append(trace)
+            continue
+
+        if trace_type == 'bar':
+            if '%{text}' not in (trace_json.get('hovertemplate') or ''):
+                trace_json.pop('text', None)
+            trace_json['textposition'] = 'none'
+            traces.append(go.Bar(trace_json, skip_invalid=True))
+            continue
+
+        if trace_type not in ('scatter', 'scattergl'):
+            traces.append(trace)
+            continue
+
+        if (trace_json.get('mode') or '') == 'text':
+            continue
+
+        numeric_x = _numeric_x(x_values)
+        if numeric_x is None and category_order is None:
+            category_order = x_values
+
+        keep = np.union1d(
+            lttb_indices(trace_json['y'] if trace_json.get('y') is not None else np.zeros(n), target, numeric_x),
+            _window_indices(x_values, x_range, full_points)
+        )
+        trace_json = _drop_text(_subset_trace(trace_json, keep, n))
+        traces.append(go.Scattergl(trace_json, skip_invalid=True))
+
+    optimized = go.Figure(data=traces, layout=fig.layout)
+    if category_order is not None:
+        # Downsampled traces skip categories; pin the full order on the axis
+        optimized.update_xaxes(categoryorder='array', categoryarray=category_order)
+    return optimized
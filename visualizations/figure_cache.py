@@ -0,0 +1,177 @@
+"""
+Plotly figure cache
+Chart builders decorated with ``cached_figure`` are keyed by a fingerprint of
+their DataFrame inputs plus the remaining parameters. The figure's dict
+spec (``fig.to_dict()``) is kept in a size-bounded LRU, so reruns with
+unchanged data and options skip the builder (and its pandas work).
+
+A hit wraps a copy of the spec in a Figure without validating it again:
+plotly validated every property when the builder created the figure, and
+re-validation (what ``plotly.io.from_json`` does) costs a large part of the
+builder's own time. ``st.plotly_chart`` encodes a Figure without validating
+it, so the only per-rerun work left is that final encode.
+benchmark_figure_cache.py compares both paths with the builders.
+"""
+
+import copy
+import functools
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from core.artifact_store import estimate_size, frame_fingerprint, params_key
+
+
+DEFAULT_MAX_BYTES = int(os.environ.get('FIGURE_CACHE_MAX_MB', '64')) * 1024 * 1024
+
+
+def _arg_key(value: Any) -> str:
+    """Hashable representation of one builder argument"""
+    if isinstance(value, pd.DataFrame):
+        return f"df:{frame_fingerprint(value)}"
+    if isinstance(value, pd.Series):
+        return f"series:{frame_fingerprint(value.to_frame())}"
+    return params_key(value)
+
+
+def figure_from_spec(spec: Dict[str, Any]) -> go.Figure:
+    """Fresh Figure from a stored ``fig.to_dict()`` spec, without re-validating it
+
+    The returned figure also skips validation of later update_layout/add_trace
+    calls; a cache miss returns the builder's validated figure, so invalid
+    caller code still fails there. Falls back to a validated Figure if the
+    installed plotly no longer accepts ``_validate``.
+    """
+    try:
+        return go.Figure(copy.deepcopy(spec), _validate=False)
+    except (TypeError, ValueError):
+        return go.Figure(copy.deepcopy(spec))
+
+
+class FigureCache:
+    """Thread-safe LRU of figure specs bounded by their estimated size"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple, Tuple[Dict[str, Any], int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(name: str, args: tuple, kwargs: Dict[str, Any]) -> Tuple:
+        return (
+            name,
+            tuple(_arg_key(a) for a in args),
+            tuple((k, _arg_key(v)) for k, v in sorted(kwargs.items()))
+        )
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Stored spec for ``key`` (shared: wrap it with figure_from_spec, never mutate it)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple, spec: Dict[str, Any]) -> None:
+        size = estimate_size(spec)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (spec, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_build(self, key: Tuple, build: Callable[[], Optional[go.Figure]]) -> Optional[go.Figure]:
+        """Fresh figure for ``key``, calling ``build`` and storing its spec on a miss
+
+        For figures keyed by something other than their builder's arguments
+        (see ``cached_figure`` for the usual case). Figures that are None are
+        not cached.
+        """
+        spec = self.get(key)
+        if spec is not None:
+            return figure_from_spec(spec)
+
+        fig = build()
+        if fig is not None:
+            try:
+                self.put(key, fig.to_dict())
+            except Exception as e:
+                print(f"Error caching figure {key[0]}: {e}")
+        return fig
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return usage statistics for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_figure_cache: Optional[FigureCache] = None
+_figure_cache_lock = threading.Lock()
+
+
+def get_figure_cache() -> FigureCache:
+    """Return the process-wide figure cache"""
+    global _figure_cache
+    if _figure_cache is None:
+        with _figure_cache_lock:
+            if _figure_cache is None:
+                _figure_cache = FigureCache()
+    return _figure_cache
+
+
+def cached_figure(builder: Callable) -> Callable:
+    """Decorator caching a figure builder's output by input fingerprint
+
+    Every call returns a fresh Figure, so callers may keep mutating the
+    result (update_layout, add_hline...) without touching the cached copy.
+    Builders returning None are not cached.
+    """
+    name = f"{builder.__module__}.{builder.__qualname__}"
+
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs):
+        cache = get_figure_cache()
+        try:
+            key = cache.make_key(name, args, kwargs)
+        except Exception as e:
+            print(f"Error building figure cache key for {name}: {e}")
+            return builder(*args, **kwargs)
+
+        return cache.get_or_build(key, lambda: builder(*args, **kwargs))
+
+    wrapper.uncached = builder
+    return wrapper